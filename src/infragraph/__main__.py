@@ -1,6 +1,8 @@
 import typer
 from infragraph.translators.translator_handler import run_translator
 from infragraph.visualizer.visualize import run_visualizer
+from infragraph.server import DEFAULT_ADDRESS, benchmark_query_graph, serve as run_server
+from infragraph.infrastructure_loader import load_infrastructure_file
  
 app = typer.Typer()
  
@@ -8,7 +10,7 @@ app = typer.Typer()
 def translate(
     tool = typer.Argument(..., help="Translator to use available lstopo, nccl"),
     input_file = typer.Option(None, "--input", "-i", help="Input file Path"),
-    output_file = typer.Option("device.yaml","--output", "-o", help="Output file path"),
+    output_file = typer.Option("device.yaml","--output", "-o", help="Output file path, a .gz, .bz2, .xz or .zst suffix compresses it"),
     device_name = typer.Option(None, "--device-name", help="Name of the device or system being described. Required for the 'nccl' translator; inferred from the XML for 'lstopo' if not provided."),
     dump = typer.Option("yaml", "--dump", help="Dump format (json or yaml)")
 ):
@@ -20,7 +22,7 @@ def visualize(
     input_path: str = typer.Option(
         ...,
         "--input", "-i",
-        help="Path to the InfraGraph infrastructure yaml/json file.",
+        help="Path to the InfraGraph infrastructure yaml/json file, optionally .gz, .bz2, .xz or .zst compressed.",
         exists=True,
         file_okay=True,
         dir_okay=False,
@@ -53,5 +55,56 @@ def visualize(
     )
  
  
+@app.command()
+def serve(
+    address: str = typer.Option(DEFAULT_ADDRESS, "--address", "-a", help="host:port the gRPC server listens on."),
+    workers: int = typer.Option(8, "--workers", "-w", help="Number of threads serving requests."),
+    input_path: str = typer.Option(
+        None,
+        "--input", "-i",
+        help="Optional infrastructure yaml/json file to load before serving.",
+        exists=True,
+        file_okay=True,
+        dir_okay=False,
+        readable=True,
+    ),
+    http_address: str = typer.Option(
+        None, "--http", help="Optional host:port to also serve the graph over HTTP/JSON."
+    ),
+    preload_path: str = typer.Option(
+        None,
+        "--preload", "-p",
+        help="Optional snapshot or infrastructure file loaded in the background while already serving.",
+        exists=True,
+        file_okay=True,
+        dir_okay=False,
+        readable=True,
+    ),
+):
+    """Serve one shared graph over gRPC and optionally HTTP"""
+    infrastructure = load_infrastructure_file(input_path) if input_path else None
+    run_server(
+        address=address,
+        max_workers=workers,
+        infrastructure=infrastructure,
+        http_address=http_address,
+        preload=preload_path,
+    )
+
+
+@app.command()
+def benchmark(
+    address: str = typer.Option(DEFAULT_ADDRESS, "--address", "-a", help="host:port of a running infragraph server."),
+    clients: int = typer.Option(8, "--clients", "-c", help="Number of concurrent clients."),
+    seconds: float = typer.Option(5.0, "--seconds", "-s", help="Benchmark duration in seconds."),
+):
+    """Measure query_graph queries per second against a running server"""
+    result = benchmark_query_graph(address, clients=clients, seconds=seconds)
+    print(
+        f"{result['queries']} queries in {result['seconds']:.2f}s from {clients} clients: "
+        f"{result['qps']:.1f} queries/s, {result['errors']} errors"
+    )
+
+
 if __name__ == "__main__":
     app()
\ No newline at end of file
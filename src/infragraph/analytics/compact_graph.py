@@ -0,0 +1,123 @@
+from array import array
+from typing import Dict, List, Optional, Tuple
+from networkx import Graph
+
+
+# Multipliers converting the short-form bandwidth units written by
+# InfraGraphService._link_edge_attrs into gigabits per second.
+_BANDWIDTH_TO_GBPS: Dict[str, float] = {
+    "Gbps": 1.0,
+    "GBps": 8.0,
+    "GT/s": 1.0,
+}
+
+
+def parse_bandwidth(value: Optional[str]) -> Optional[float]:
+    """Convert an edge bandwidth attribute such as "400 Gbps" into Gbps.
+
+    Returns None if the value is missing or cannot be parsed.
+    """
+    if not value:
+        return None
+    pieces = str(value).split()
+    try:
+        number = float(pieces[0])
+    except ValueError:
+        return None
+    unit = pieces[1] if len(pieces) > 1 else "Gbps"
+    return number * _BANDWIDTH_TO_GBPS.get(unit, 1.0)
+
+
+class CompactGraph:
+    """Integer indexed, read-only CSR view of a networkx infrastructure graph.
+
+    Every node is assigned an index in networkx iteration order and every
+    undirected edge an edge id. Adjacency is stored as three flat arrays:
+
+    - offsets: neighbors of node i are targets[offsets[i]:offsets[i + 1]]
+    - targets: neighbor node index of each arc
+    - arc_edges: undirected edge id of each arc
+
+    Edge level data is kept in per edge arrays (edge_endpoints, bandwidth)
+    so analytics can run on plain integers instead of networkx dictionaries.
+
+    Example:
+        compact = CompactGraph(service.get_networkx_graph())
+        for arc in range(compact.offsets[0], compact.offsets[1]):
+            neighbor = compact.targets[arc]
+    """
+
+    def __init__(self, graph: Graph):
+        self.nodes: List[str] = list(graph.nodes)
+        self.index: Dict[str, int] = {node: idx for idx, node in enumerate(self.nodes)}
+        self.offsets: array = array("l", [0])
+        self.targets: array = array("l")
+        self.arc_edges: array = array("l")
+        self.edge_endpoints: List[Tuple[int, int]] = []
+        self.edge_links: List[Optional[str]] = []
+        # bandwidth in Gbps, 0.0 when the link does not define a bandwidth
+        self.bandwidth: array = array("d")
+
+        # networkx shares one attribute dict between (u, v) and (v, u) so
+        # the dict identity is a cheap key for the undirected edge id
+        edge_ids: Dict[int, int] = {}
+        index = self.index
+        for node in self.nodes:
+            u = index[node]
+            for neighbor, data in graph.adj[node].items():
+                edge_id = edge_ids.get(id(data))
+                if edge_id is None:
+                    edge_id = len(self.edge_endpoints)
+                    edge_ids[id(data)] = edge_id
+                    self.edge_endpoints.append((u, index[neighbor]))
+                    self.edge_links.append(data.get("link"))
+                    self.bandwidth.append(parse_bandwidth(data.get("bandwidth")) or 0.0)
+                self.targets.append(index[neighbor])
+                self.arc_edges.append(edge_id)
+            self.offsets.append(len(self.targets))
+
+    @property
+    def node_count(self) -> int:
+        return len(self.nodes)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.edge_endpoints)
+
+    def degree(self, node: int) -> int:
+        return self.offsets[node + 1] - self.offsets[node]
+
+    def neighbors(self, node: int) -> array:
+        """Return the neighbor indexes of a node index"""
+        return self.targets[self.offsets[node] : self.offsets[node + 1]]
+
+    def node_indexes(self, names: List[str]) -> List[int]:
+        """Map fully qualified node names to node indexes"""
+        index = self.index
+        return [index[name] for name in names]
+
+    def bfs_distances(self, sources: List[int]) -> array:
+        """Multi source breadth first search returning hop counts to every node.
+
+        Unreachable nodes have a distance of -1.
+        """
+        offsets = self.offsets
+        targets = self.targets
+        distances = array("l", [-1]) * self.node_count
+        frontier = []
+        for source in sources:
+            if distances[source] == -1:
+                distances[source] = 0
+                frontier.append(source)
+        hops = 0
+        while frontier:
+            hops += 1
+            next_frontier = []
+            for u in frontier:
+                for arc in range(offsets[u], offsets[u + 1]):
+                    v = targets[arc]
+                    if distances[v] == -1:
+                        distances[v] = hops
+                        next_frontier.append(v)
+            frontier = next_frontier
+        return distances
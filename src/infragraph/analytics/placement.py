@@ -0,0 +1,227 @@
+import heapq
+import math
+import random
+import time
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from infragraph import Annotation, Component
+from infragraph.infragraph_service import InfraGraphService, GraphError
+from infragraph.analytics.distance_oracle import DistanceOracle
+
+# sparse rank pair -> weight mapping or (src, dst, weight) triples
+CommunicationMatrix = Union[Dict[Tuple[int, int], float], Iterable[Tuple[int, int, float]]]
+
+
+class RankPlacement:
+    """Topology aware rank -> xpu placement for a job communication matrix.
+
+    The placement minimizes the communication weighted hop distance
+        sum(weight(r1, r2) * hops(xpu(r1), xpu(r2)))
+    in two phases:
+
+    - greedy graph growing: ranks are ordered so that each next rank is
+      the unplaced rank with the heaviest traffic to the ranks already
+      placed, and assigned to xpus in graph enumeration order. Blueprint
+      fabrics enumerate xpus host by host and rack by rack so ranks that
+      talk to each other land on nearby xpus. This costs
+      O(E log R) for R ranks and E communicating pairs.
+    - simulated annealing: a rank is moved next to one of its peers by
+      swapping it with the occupant of a nearby xpu; swaps are evaluated
+      with exact hop distances from a DistanceOracle and accepted by the
+      Metropolis criterion until the time budget runs out. Building the
+      DistanceOracle counts against the budget. Ranks on xpus without a
+      path between them count as a hop distance of the node count.
+
+    Example:
+        placement = RankPlacement(service)
+        mapping = placement.place({(0, 4): 10.0, (1, 5): 10.0}, rank_count=8)
+        service.annotate_graph(placement.to_annotation(mapping))
+    """
+
+    def __init__(
+        self,
+        service: InfraGraphService,
+        candidates: Optional[List[str]] = None,
+        oracle: Optional[DistanceOracle] = None,
+    ):
+        self._service = service
+        self._candidates = candidates if candidates is not None else service.get_endpoints("type", Component.XPU)
+        self._oracle = oracle
+
+    @property
+    def candidates(self) -> List[str]:
+        """Xpus that ranks can be placed on, in slot order"""
+        return list(self._candidates)
+
+    @property
+    def oracle(self) -> DistanceOracle:
+        if self._oracle is None:
+            self._oracle = DistanceOracle(self._service)
+        return self._oracle
+
+    @staticmethod
+    def _peers(communication: CommunicationMatrix, rank_count: Optional[int]) -> List[Dict[int, float]]:
+        """Normalize a communication matrix into symmetric per rank peer weights"""
+        if isinstance(communication, dict):
+            triples = ((src, dst, weight) for (src, dst), weight in communication.items())
+        else:
+            triples = communication
+        peers: List[Dict[int, float]] = [{} for _ in range(rank_count or 0)]
+        for src, dst, weight in triples:
+            if src == dst or not weight:
+                continue
+            highest = max(src, dst)
+            if highest >= len(peers):
+                if rank_count is not None:
+                    raise GraphError(f"Rank {highest} is out of range for {rank_count} ranks")
+                peers.extend({} for _ in range(highest + 1 - len(peers)))
+            peers[src][dst] = peers[src].get(dst, 0.0) + weight
+            peers[dst][src] = peers[dst].get(src, 0.0) + weight
+        return peers
+
+    @staticmethod
+    def _greedy_order(peers: List[Dict[int, float]]) -> List[int]:
+        """Order ranks by greedy graph growing from the heaviest communicating rank"""
+        rank_count = len(peers)
+        totals = [sum(p.values()) for p in peers]
+        placed = [False] * rank_count
+        attraction = [0.0] * rank_count
+        order: List[int] = []
+        seeds = sorted(range(rank_count), key=lambda r: -totals[r])
+        heap: List[Tuple[float, int]] = []
+        for seed in seeds:
+            if placed[seed]:
+                continue
+            heapq.heappush(heap, (0.0, seed))
+            while heap:
+                negative_weight, rank = heapq.heappop(heap)
+                if placed[rank] or -negative_weight < attraction[rank]:
+                    continue
+                placed[rank] = True
+                order.append(rank)
+                for peer, weight in peers[rank].items():
+                    if not placed[peer]:
+                        attraction[peer] += weight
+                        heapq.heappush(heap, (-attraction[peer], peer))
+        return order
+
+    def cost(self, communication: CommunicationMatrix, mapping: Dict[int, str]) -> float:
+        """Return the communication weighted hop distance of a rank -> xpu mapping.
+
+        The cost is infinite if communicating ranks are on xpus without a
+        path between them.
+        """
+        peers = self._peers(communication, len(mapping))
+        oracle = self.oracle
+        total = 0.0
+        for src, src_peers in enumerate(peers):
+            for dst, weight in src_peers.items():
+                if src < dst:
+                    hops = oracle.distance(mapping[src], mapping[dst])
+                    if hops is None:
+                        return math.inf
+                    total += weight * hops
+        return total
+
+    def place(
+        self,
+        communication: CommunicationMatrix,
+        rank_count: Optional[int] = None,
+        max_seconds: float = 10.0,
+        seed: int = 0,
+    ) -> Dict[int, str]:
+        """Return a rank -> xpu mapping minimizing weighted hop distance.
+
+        max_seconds bounds the whole call including the DistanceOracle
+        build and the simulated annealing refinement, 0 returns the greedy
+        placement without building a DistanceOracle. The oracle build is
+        stopped at the deadline and the greedy placement returned as is,
+        a later call builds the oracle again.
+        """
+        deadline = time.perf_counter() + max_seconds
+        peers = self._peers(communication, rank_count)
+        if len(peers) > len(self._candidates):
+            raise GraphError(f"{len(peers)} ranks do not fit on {len(self._candidates)} xpus")
+        slot_of = [0] * len(peers)
+        for slot, rank in enumerate(self._greedy_order(peers)):
+            slot_of[rank] = slot
+        if max_seconds > 0 and len(peers) > 1:
+            self._anneal(peers, slot_of, deadline, random.Random(seed))
+        return {rank: self._candidates[slot] for rank, slot in enumerate(slot_of)}
+
+    def _anneal(self, peers: List[Dict[int, float]], slot_of: List[int], deadline: float, rng: random.Random):
+        """Refine slot_of in place with peer directed swaps and Metropolis acceptance until deadline"""
+        if self._oracle is None:
+            try:
+                self._oracle = DistanceOracle(self._service, deadline=deadline)
+            except TimeoutError:
+                return
+        oracle = self._oracle
+        started = time.perf_counter()
+        if started >= deadline:
+            return
+        index = oracle.compact_graph.index
+        nodes = [index[name] for name in self._candidates]
+        occupant: List[Optional[int]] = [None] * len(nodes)
+        for rank, slot in enumerate(slot_of):
+            occupant[slot] = rank
+        unreachable = oracle.compact_graph.node_count
+        distance_by_index = oracle.distance_by_index
+
+        def distance(node1: int, node2: int) -> int:
+            hops = distance_by_index(node1, node2)
+            return unreachable if hops is None else hops
+
+        def rank_cost(rank: int, slot: int, exclude: Optional[int]) -> float:
+            node = nodes[slot]
+            return sum(
+                weight * distance(node, nodes[slot_of[peer]])
+                for peer, weight in peers[rank].items()
+                if peer != exclude
+            )
+
+        communicating = [rank for rank in range(len(peers)) if peers[rank]]
+        # peer ranks are drawn every iteration, list them once
+        peer_ranks = [tuple(rank_peers) for rank_peers in peers]
+        if not communicating:
+            return
+        # start hot enough to accept an average single hop regression
+        average = sum(sum(p.values()) for p in peers) / (2 * len(communicating))
+        temperature = start_temperature = max(average, 1e-9)
+        window = 8
+        duration = deadline - started
+        iterations = 0
+        while True:
+            iterations += 1
+            if iterations % 256 == 0:
+                now = time.perf_counter()
+                if now >= deadline:
+                    break
+                # cool geometrically towards a 1000x lower temperature
+                temperature = start_temperature * 1e-3 ** ((now - started) / duration)
+            rank = rng.choice(communicating)
+            peer = rng.choice(peer_ranks[rank])
+            target = min(len(nodes) - 1, max(0, slot_of[peer] + rng.randint(-window, window)))
+            source = slot_of[rank]
+            other = occupant[target]
+            if target == source or other == peer:
+                continue
+            before = rank_cost(rank, source, other)
+            after = rank_cost(rank, target, other)
+            if other is not None:
+                before += rank_cost(other, target, rank)
+                after += rank_cost(other, source, rank)
+            delta = after - before
+            if delta <= 0 or rng.random() < math.exp(-delta / temperature):
+                slot_of[rank] = target
+                occupant[target] = rank
+                occupant[source] = other
+                if other is not None:
+                    slot_of[other] = source
+
+    @staticmethod
+    def to_annotation(mapping: Dict[int, str], attribute: str = "rank") -> Annotation:
+        """Return an Annotation that writes the rank attribute onto each placed xpu"""
+        annotation = Annotation()
+        for rank, xpu in sorted(mapping.items()):
+            annotation.nodes.add(name=xpu).attributes.add(attribute=attribute, value=str(rank))
+        return annotation
@@ -0,0 +1,202 @@
+import json
+from array import array
+from typing import Dict, Iterator, List, Sequence, TextIO, Tuple
+from infragraph import Component
+from infragraph.infragraph_service import InfraGraphService, InfrastructureError
+from infragraph.analytics.compact_graph import CompactGraph
+
+
+class RoutingTableGenerator:
+    """Generate per switch forwarding tables: destination host prefix -> egress ports.
+
+    Switches are the instances of switch devices, given by name (like the
+    visualizer --switches option) or, by default, every device that has
+    port components but no xpu or nic components. Every other top level
+    instance, e.g. "host.3", is a destination host prefix.
+
+    Hosts are endpoints, traffic is only forwarded by switches. A switch
+    forwards traffic for a destination out of every port that starts a
+    shortest path to it (the ECMP next hop set), assuming every port is
+    the same distance from the switch asic.
+
+    Work is shared between destinations of the same rack: hosts attached
+    to the same set of switches form a destination group and one reverse
+    breadth first search is run per group instead of per host. Switches
+    outside the group see the same next hops for every host of the group,
+    the attachment switches themselves forward out of the ports wired to
+    each host.
+
+    Tables are computed one switch at a time by iter_tables, only the
+    table being yielded is held in memory. The hop distances of every
+    destination group are kept for the whole run, one 16 bit integer per
+    node per group, and identical port sets are shared between table
+    entries.
+
+    Example:
+        generator = RoutingTableGenerator(service)
+        for switch, table in generator.iter_tables():
+            print(switch, table["host.0"])
+    """
+
+    def __init__(self, service: InfraGraphService, switches: Sequence[str] = ()):
+        infrastructure = service.infrastructure
+        self._compact = CompactGraph(service.get_networkx_graph())
+        self._switch_devices = set(switches) if switches else self._default_switch_devices(infrastructure)
+        switch_prefixes = []
+        host_prefixes = []
+        for instance in infrastructure.instances:
+            for index in range(instance.count):
+                if instance.device in self._switch_devices:
+                    switch_prefixes.append(f"{instance.name}.{index}")
+                else:
+                    host_prefixes.append(f"{instance.name}.{index}")
+        if not switch_prefixes:
+            raise InfrastructureError(f"Infrastructure has no instances of switch devices {sorted(self._switch_devices)}")
+
+        # owner[n] is the id of the top level instance node n belongs to,
+        # switches are numbered before hosts
+        self._switches: List[str] = switch_prefixes
+        self._hosts: List[str] = host_prefixes
+        owner_ids = {prefix: idx for idx, prefix in enumerate(self._switches + self._hosts)}
+        self._owner = array("l", [owner_ids.get(".".join(node.split(".", 2)[:2]), -1) for node in self._compact.nodes])
+        self._members: List[List[int]] = [[] for _ in owner_ids]
+        for node, owner in enumerate(self._owner):
+            if owner >= 0:
+                self._members[owner].append(node)
+
+    @staticmethod
+    def _default_switch_devices(infrastructure) -> set:
+        switch_devices = set()
+        for device in infrastructure.devices:
+            choices = {component.choice for component in device.components}
+            if Component.PORT in choices and not choices.intersection({Component.XPU, Component.NIC}):
+                switch_devices.add(device.name)
+        return switch_devices
+
+    @property
+    def switches(self) -> List[str]:
+        """Switch instance prefixes, one forwarding table each"""
+        return list(self._switches)
+
+    @property
+    def destinations(self) -> List[str]:
+        """Destination host instance prefixes"""
+        return list(self._hosts)
+
+    def _is_switch(self, owner: int) -> bool:
+        return 0 <= owner < len(self._switches)
+
+    def _destination_groups(self) -> Dict[Tuple[int, ...], List[int]]:
+        """Group host owner ids by the set of switches they are attached to"""
+        compact = self._compact
+        owner = self._owner
+        groups: Dict[Tuple[int, ...], List[int]] = {}
+        for host in range(len(self._switches), len(self._switches) + len(self._hosts)):
+            attached = set()
+            for node in self._members[host]:
+                for neighbor in compact.neighbors(node):
+                    if self._is_switch(owner[neighbor]):
+                        attached.add(owner[neighbor])
+            groups.setdefault(tuple(sorted(attached)), []).append(host)
+        return groups
+
+    def _group_distances(self, hosts: List[int]) -> array:
+        """Reverse breadth first search from every node of a destination group.
+
+        Only switch nodes are expanded, hosts do not forward traffic.
+        """
+        compact = self._compact
+        owner = self._owner
+        distances = array("h", [-1]) * compact.node_count
+        frontier = []
+        for host in hosts:
+            for node in self._members[host]:
+                distances[node] = 0
+                frontier.append(node)
+        hops = 0
+        while frontier:
+            hops += 1
+            next_frontier = []
+            for u in frontier:
+                for v in compact.neighbors(u):
+                    if distances[v] == -1 and self._is_switch(owner[v]):
+                        distances[v] = hops
+                        next_frontier.append(v)
+            frontier = next_frontier
+        return distances
+
+    def _egress_ports(self, switch: int, distances: array) -> Tuple[int, ...]:
+        """Ports of a switch whose external neighbor is closest to the destination"""
+        compact = self._compact
+        owner = self._owner
+        best = -1
+        ports: List[int] = []
+        for port in self._members[switch]:
+            for neighbor in compact.neighbors(port):
+                distance = distances[neighbor]
+                if owner[neighbor] == switch or distance == -1:
+                    continue
+                if best == -1 or distance < best:
+                    best = distance
+                    ports = [port]
+                elif distance == best and ports[-1] != port:
+                    ports.append(port)
+        return tuple(ports)
+
+    def _attachment_table(self, switch: int) -> Dict[int, Tuple[int, ...]]:
+        """Return destination host owner id -> ports of a switch wired to that host"""
+        compact = self._compact
+        owner = self._owner
+        table: Dict[int, Tuple[int, ...]] = {}
+        for port in self._members[switch]:
+            for neighbor in compact.neighbors(port):
+                host = owner[neighbor]
+                if host >= len(self._switches):
+                    ports = table.get(host, ())
+                    if port not in ports:
+                        table[host] = ports + (port,)
+        return table
+
+    def _iter_switch_tables(self) -> Iterator[Dict[int, Tuple[int, ...]]]:
+        """Yield per switch: destination host owner id -> egress port node ids
+
+        The reverse breadth first search of every destination group runs
+        up front, each switch table is computed from those distances when
+        it is yielded.
+        """
+        groups = [(attached, hosts, self._group_distances(hosts)) for attached, hosts in self._destination_groups().items()]
+        interned: Dict[Tuple[int, ...], Tuple[int, ...]] = {}
+        for switch in range(len(self._switches)):
+            # attachment switches forward out of the ports wired to each host
+            table = self._attachment_table(switch)
+            for attached, hosts, distances in groups:
+                if switch in attached:
+                    continue
+                ports = self._egress_ports(switch, distances)
+                if ports:
+                    ports = interned.setdefault(ports, ports)
+                    for host in hosts:
+                        table[host] = ports
+            yield table
+
+    def iter_tables(self) -> Iterator[Tuple[str, Dict[str, List[str]]]]:
+        """Yield (switch prefix, {destination host prefix: [egress port node names]}) per switch"""
+        nodes = self._compact.nodes
+        host_offset = len(self._switches)
+        for switch, table in enumerate(self._iter_switch_tables()):
+            yield self._switches[switch], {
+                self._hosts[host - host_offset]: [nodes[port] for port in sorted(ports)]
+                for host, ports in sorted(table.items())
+            }
+
+    def write_tables(self, fp: TextIO) -> int:
+        """Stream the tables to a text file as one JSON object per switch per line.
+
+        Returns the number of tables written.
+        """
+        count = 0
+        for switch, table in self.iter_tables():
+            fp.write(json.dumps({"switch": switch, "routes": table}))
+            fp.write("\n")
+            count += 1
+        return count
@@ -0,0 +1,235 @@
+"""
+Columnar export and import of the infrastructure graph using Apache Arrow.
+
+The node table has one row per graph node, the edge table one row per
+undirected edge:
+- nodes: id, then one column per node attribute
+- edges: source, target, then one column per edge attribute
+
+Immutable attributes and annotations are all typed columns, ints and
+floats keep their numeric type and everything else is a string. Tables
+are written in record batches to Parquet (.parquet) or Arrow IPC
+(.arrow, .feather, .ipc) files which pandas, polars and DuckDB read
+directly.
+
+Annotation tables can be applied back to a service with
+import_annotations, which uses the bulk annotate_nodes/annotate_edges
+path and ignores the immutable columns.
+
+pyarrow is an optional dependency: pip install infragraph[arrow]
+
+Example:
+    export_nodes(service, "nodes.parquet")
+    export_edges(service, "edges.parquet")
+    import_annotations(service, "nodes.parquet")
+"""
+
+import os
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+from infragraph.infragraph_service import InfraGraphService, GraphError
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+NODE_ID = "id"
+EDGE_SOURCE = "source"
+EDGE_TARGET = "target"
+
+PARQUET = "parquet"
+ARROW = "arrow"
+_EXTENSIONS = {".parquet": PARQUET, ".arrow": ARROW, ".feather": ARROW, ".ipc": ARROW}
+
+
+def _require_pyarrow():
+    if pyarrow is None:
+        raise RuntimeError("pyarrow is not installed. Install it with pip install infragraph[arrow].")
+
+
+def _file_format(path: str, file_format: Optional[str]) -> str:
+    if file_format is not None:
+        return file_format
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in _EXTENSIONS:
+        raise ValueError(f"Cannot infer the table format of {path}, use one of {sorted(_EXTENSIONS)}")
+    return _EXTENSIONS[extension]
+
+
+def _arrow_type(values_types: set):
+    if values_types and values_types <= {int}:
+        return pyarrow.int64()
+    if values_types and values_types <= {int, float}:
+        return pyarrow.float64()
+    return pyarrow.string()
+
+
+class _TableBuilder:
+    """Builds record batches with a schema fixed by one scan of the rows"""
+
+    def __init__(self, key_columns: List[str], rows, annotations: str, immutable: frozenset):
+        self._key_columns = key_columns
+        self._rows = rows
+        self._skip = frozenset() if annotations == "full" else immutable
+        value_types: Dict[str, set] = {}
+        for _, data in rows():
+            for key, value in data.items():
+                if key not in self._skip:
+                    value_types.setdefault(key, set()).add(bool if isinstance(value, bool) else type(value))
+        fields = [pyarrow.field(name, pyarrow.string(), nullable=False) for name in key_columns]
+        for key, types in value_types.items():
+            if key in key_columns:
+                raise GraphError(f"Attribute {key} collides with the {key} column")
+            fields.append(pyarrow.field(key, _arrow_type(types)))
+        self.schema = pyarrow.schema(fields)
+
+    def batches(self, batch_size: int) -> Iterator["pyarrow.RecordBatch"]:
+        attribute_fields = [(f.name, f.type == pyarrow.string()) for f in self.schema][len(self._key_columns) :]
+        keys: List[Tuple[str, ...]] = []
+        columns: Dict[str, List[Any]] = {name: [] for name, _ in attribute_fields}
+        for key, data in self._rows():
+            keys.append(key)
+            for name, is_string in attribute_fields:
+                value = data.get(name)
+                if is_string and value is not None and not isinstance(value, str):
+                    value = str(value)
+                columns[name].append(value)
+            if len(keys) == batch_size:
+                yield self._batch(keys, columns)
+                keys = []
+                columns = {name: [] for name, _ in attribute_fields}
+        if keys:
+            yield self._batch(keys, columns)
+
+    def _batch(self, keys: List[Tuple[str, ...]], columns: Dict[str, List[Any]]):
+        arrays = [pyarrow.array([key[i] for key in keys], pyarrow.string()) for i in range(len(self._key_columns))]
+        for field in self.schema:
+            if field.name in columns:
+                arrays.append(pyarrow.array(columns[field.name], field.type))
+        return pyarrow.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+
+def _node_builder(service: InfraGraphService, annotations: str) -> _TableBuilder:
+    graph = service.get_networkx_graph()
+    return _TableBuilder(
+        [NODE_ID],
+        lambda: (((node,), data) for node, data in graph.nodes(data=True)),
+        annotations,
+        service._IMMUTABLE_ATTRIBUTES,
+    )
+
+
+def _edge_builder(service: InfraGraphService, annotations: str) -> _TableBuilder:
+    graph = service.get_networkx_graph()
+    return _TableBuilder(
+        [EDGE_SOURCE, EDGE_TARGET],
+        lambda: (((ep1, ep2), data) for ep1, ep2, data in graph.edges(data=True)),
+        annotations,
+        service._IMMUTABLE_ATTRIBUTES,
+    )
+
+
+def _write(builder: _TableBuilder, path: str, file_format: Optional[str], batch_size: int) -> int:
+    file_format = _file_format(path, file_format)
+    rows = 0
+    if file_format == PARQUET:
+        writer = pyarrow.parquet.ParquetWriter(path, builder.schema)
+    elif file_format == ARROW:
+        writer = pyarrow.ipc.new_file(path, builder.schema)
+    else:
+        raise ValueError(f"Table format {file_format} is not supported, use {PARQUET} or {ARROW}")
+    with writer:
+        for batch in builder.batches(batch_size):
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    return rows
+
+
+def node_table(service: InfraGraphService, annotations: str = "full") -> "pyarrow.Table":
+    """Return the nodes as an Arrow table, partial leaves out the immutable attributes"""
+    _require_pyarrow()
+    builder = _node_builder(service, annotations)
+    return pyarrow.Table.from_batches(builder.batches(1 << 16), schema=builder.schema)
+
+
+def edge_table(service: InfraGraphService, annotations: str = "full") -> "pyarrow.Table":
+    """Return the edges as an Arrow table, partial leaves out the immutable attributes"""
+    _require_pyarrow()
+    builder = _edge_builder(service, annotations)
+    return pyarrow.Table.from_batches(builder.batches(1 << 16), schema=builder.schema)
+
+
+def export_nodes(
+    service: InfraGraphService,
+    path: str,
+    file_format: Optional[str] = None,
+    annotations: str = "full",
+    batch_size: int = 1 << 16,
+) -> int:
+    """Write the node table in record batches, returns the number of rows written"""
+    _require_pyarrow()
+    return _write(_node_builder(service, annotations), path, file_format, batch_size)
+
+
+def export_edges(
+    service: InfraGraphService,
+    path: str,
+    file_format: Optional[str] = None,
+    annotations: str = "full",
+    batch_size: int = 1 << 16,
+) -> int:
+    """Write the edge table in record batches, returns the number of rows written"""
+    _require_pyarrow()
+    return _write(_edge_builder(service, annotations), path, file_format, batch_size)
+
+
+def _read(path: str, file_format: Optional[str]) -> "pyarrow.Table":
+    file_format = _file_format(path, file_format)
+    if file_format == PARQUET:
+        return pyarrow.parquet.read_table(path)
+    with pyarrow.memory_map(path) as source:
+        return pyarrow.ipc.open_file(source).read_all()
+
+
+def import_annotations(
+    service: InfraGraphService,
+    table: Union[str, "pyarrow.Table"],
+    file_format: Optional[str] = None,
+) -> int:
+    """Apply a node or edge table to the graph as annotations.
+
+    Tables with an id column annotate nodes, tables with source and target
+    columns annotate edges. Every other column except the immutable
+    attributes is an annotation attribute, null cells are skipped. Values
+    are written as strings like annotate_graph does. Returns the number of
+    attribute values written.
+    """
+    _require_pyarrow()
+    if isinstance(table, str):
+        table = _read(table, file_format)
+    names = table.column_names
+    if NODE_ID in names:
+        key_columns = [NODE_ID]
+    elif EDGE_SOURCE in names and EDGE_TARGET in names:
+        key_columns = [EDGE_SOURCE, EDGE_TARGET]
+    else:
+        raise GraphError(f"Table needs an {NODE_ID} column or {EDGE_SOURCE} and {EDGE_TARGET} columns")
+    attributes = [n for n in names if n not in key_columns and n not in service._IMMUTABLE_ATTRIBUTES]
+    written = 0
+    for batch in table.to_batches():
+        keys = [batch.column(name).to_pylist() for name in key_columns]
+        rows = keys[0] if len(keys) == 1 else list(zip(*keys))
+        for attribute in attributes:
+            values = {
+                row: value if isinstance(value, str) else str(value)
+                for row, value in zip(rows, batch.column(attribute).to_pylist())
+                if value is not None
+            }
+            if len(key_columns) == 1:
+                service.annotate_nodes(attribute, values)
+            else:
+                service.annotate_edges(attribute, values)
+            written += len(values)
+    return written
@@ -0,0 +1,93 @@
+"""
+Transparent file compression chosen by file extension.
+
+open_file works like the builtin open but compresses or decompresses the
+stream when the path ends with a compression extension:
+- .gz: gzip
+- .bz2: bzip2
+- .xz: xz
+- .zst: zstandard, an optional dependency: pip install infragraph[zstd]
+
+Compression is streaming, writers and readers never hold the whole
+uncompressed payload. The format of the payload itself is given by the
+extension in front of the compression extension, e.g. fabric.yaml.zst or
+graph.json.gz, see split_compression.
+
+Example:
+    with open_file("graph.json.gz", "wt") as fp:
+        service.write_graph(request, fp)
+"""
+
+import bz2
+import gzip
+import lzma
+import os
+from typing import IO, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+GZIP = "gzip"
+BZIP2 = "bzip2"
+XZ = "xz"
+ZSTD = "zstd"
+COMPRESSION_EXTENSIONS = {".gz": GZIP, ".bz2": BZIP2, ".xz": XZ, ".zst": ZSTD}
+
+# fast levels, the outputs are large and written once per export
+_GZIP_LEVEL = 6
+_ZSTD_LEVEL = 3
+
+
+def split_compression(path: str) -> Tuple[str, Optional[str]]:
+    """Return the path without its compression extension and the compression, None if uncompressed"""
+    root, extension = os.path.splitext(path)
+    compression = COMPRESSION_EXTENSIONS.get(extension.lower())
+    if compression is None:
+        return path, None
+    return root, compression
+
+
+def format_extension(path: str) -> str:
+    """Return the lower case payload extension without the dot, e.g. yaml for fabric.yaml.zst"""
+    return os.path.splitext(split_compression(path)[0])[1].lstrip(".").lower()
+
+
+def compression_extension(path: str) -> str:
+    """Return the compression extension of the path, an empty string if uncompressed"""
+    root, compression = split_compression(path)
+    return path[len(root) :] if compression is not None else ""
+
+
+def open_file(path: str, mode: str = "rt", encoding: Optional[str] = "utf-8") -> IO:
+    """Open a file, compressing or decompressing it according to its extension.
+
+    mode is one of the builtin open modes, text modes default to utf-8.
+    """
+    compression = split_compression(path)[1]
+    if "b" in mode:
+        encoding = None
+    elif "t" not in mode:
+        mode += "t"
+    if compression is None:
+        return open(path, mode.replace("t", ""), encoding=encoding)
+    if compression == GZIP:
+        if "r" in mode:
+            return gzip.open(path, mode, encoding=encoding)
+        return gzip.open(path, mode, compresslevel=_GZIP_LEVEL, encoding=encoding)
+    if compression == BZIP2:
+        return bz2.open(path, mode, encoding=encoding)
+    if compression == XZ:
+        return lzma.open(path, mode, encoding=encoding)
+    if zstandard is None:
+        raise RuntimeError("zstandard is not installed. Install it with pip install infragraph[zstd].")
+    if "r" in mode:
+        return zstandard.open(path, mode, encoding=encoding)
+    return zstandard.open(path, mode, cctx=zstandard.ZstdCompressor(level=_ZSTD_LEVEL), encoding=encoding)
+
+
+def read_text(path: str) -> str:
+    """Return the decompressed text content of a file"""
+    with open_file(path, "rt") as fp:
+        return fp.read()
@@ -0,0 +1,212 @@
+"""
+Canonical content hashes of an Infrastructure and of an annotated graph.
+
+Hashing the serialized yaml changes with key order, formatting and the
+order of list items that carry no meaning. The hashes in this module
+walk the generated objects in a defined order instead:
+- every object is encoded as compact json with sorted keys, unset
+  properties and empty lists are left out
+- devices, instances and links are ordered by name and infrastructure
+  edges by their own hash, so reordering them keeps the hash
+- an instance hash covers the hash of the device it instantiates
+
+The hashes form a Merkle tree. InfrastructureHash keeps the hash of every
+device, instance, link and edge, so replacing one instance or device only
+rehashes that subtree before the root is recombined from the cached
+hashes. GraphHash adds one hash per annotation column, i.e. per node,
+edge or graph attribute outside the immutable attributes.
+
+Example:
+    fingerprint = infrastructure_hash(infrastructure)
+    hashes = InfrastructureHash(infrastructure)
+    hashes.update_instance(instance)
+    fingerprint = hashes.hexdigest()
+"""
+
+import hashlib
+import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from infragraph import Device, Infrastructure, Instance
+from infragraph.infragraph import OpenApiIter, OpenApiObject
+from infragraph.infragraph_service import InfraGraphService
+
+DIGEST_SIZE = 32
+
+NODES = "nodes"
+EDGES = "edges"
+GRAPH = "graph"
+
+_dumps = json.JSONEncoder(sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str).encode
+
+
+def _hash(*parts: bytes) -> bytes:
+    hasher = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    for part in parts:
+        hasher.update(part)
+    return hasher.digest()
+
+
+def canonical(value: Any) -> Any:
+    """Return plain python data of a generated object with only the set properties"""
+    if isinstance(value, OpenApiObject):
+        output = {}
+        for key, item in value._properties.items():
+            item = canonical(item)
+            if item is not None and item != [] and item != {}:
+                output[key] = item
+        return output
+    if isinstance(value, OpenApiIter):
+        return [canonical(item) for item in value._items]
+    return value
+
+
+def canonical_bytes(value: Any) -> bytes:
+    """Return the canonical json encoding of a generated object or plain data"""
+    return _dumps(canonical(value)).encode("utf-8")
+
+
+def _combine(tag: bytes, digests: Iterable[bytes]) -> bytes:
+    hasher = hashlib.blake2b(tag, digest_size=DIGEST_SIZE)
+    for digest in digests:
+        hasher.update(digest)
+    return hasher.digest()
+
+
+class InfrastructureHash:
+    """Merkle hash of an Infrastructure with cached per device, instance, link and edge hashes"""
+
+    def __init__(self, infrastructure: Infrastructure):
+        self._header = canonical_bytes(
+            {"name": infrastructure.name, "description": infrastructure.description}
+        )
+        self.devices: Dict[str, bytes] = {d.name: _hash(b"device", canonical_bytes(d)) for d in infrastructure.devices}
+        self._instance_bytes: Dict[str, Tuple[str, bytes]] = {}
+        self.instances: Dict[str, bytes] = {}
+        for instance in infrastructure.instances:
+            self._set_instance(instance)
+        self.links: Dict[str, bytes] = {l.name: _hash(b"link", canonical_bytes(l)) for l in infrastructure.links}
+        self.edges: List[bytes] = sorted(_hash(b"edge", canonical_bytes(e)) for e in infrastructure.edges)
+        self._edges_digest = _combine(b"edges", self.edges)
+        self._digest: Optional[bytes] = None
+
+    def _set_instance(self, instance: Instance) -> None:
+        encoded = canonical_bytes(instance)
+        self._instance_bytes[instance.name] = (instance.device, encoded)
+        self.instances[instance.name] = _hash(b"instance", encoded, self.devices.get(instance.device, b""))
+
+    def update_device(self, device: Device) -> None:
+        """Rehash a replaced or added device and the instances of it"""
+        self.devices[device.name] = _hash(b"device", canonical_bytes(device))
+        for name, (device_name, encoded) in self._instance_bytes.items():
+            if device_name == device.name:
+                self.instances[name] = _hash(b"instance", encoded, self.devices[device.name])
+        self._digest = None
+
+    def update_instance(self, instance: Instance) -> None:
+        """Rehash a replaced or added instance"""
+        self._set_instance(instance)
+        self._digest = None
+
+    def digest(self) -> bytes:
+        """Return the root hash"""
+        if self._digest is None:
+            self._digest = _combine(
+                b"infrastructure",
+                (
+                    _hash(self._header),
+                    _combine(b"devices", (self.devices[k] for k in sorted(self.devices))),
+                    _combine(b"instances", (self.instances[k] for k in sorted(self.instances))),
+                    _combine(b"links", (self.links[k] for k in sorted(self.links))),
+                    self._edges_digest,
+                ),
+            )
+        return self._digest
+
+    def hexdigest(self) -> str:
+        """Return the root hash as a hex string"""
+        return self.digest().hex()
+
+
+def infrastructure_hash(infrastructure: Infrastructure) -> str:
+    """Return the canonical hex hash of an Infrastructure"""
+    return InfrastructureHash(infrastructure).hexdigest()
+
+
+class GraphHash:
+    """Merkle hash of an annotated graph: the infrastructure hash plus one hash per annotation column.
+
+    A column holds the values of one mutable attribute over all nodes,
+    edges or the graph, sorted by node name or endpoint pair. After an
+    annotation call only the written columns need update_column.
+    """
+
+    def __init__(self, service: InfraGraphService, infrastructure: Optional[InfrastructureHash] = None):
+        self._service = service
+        self.infrastructure = infrastructure or InfrastructureHash(service.infrastructure)
+        self.columns: Dict[Tuple[str, str], bytes] = {}
+        immutable = service._IMMUTABLE_ATTRIBUTES
+        values: Dict[Tuple[str, str], List[Tuple[Any, Any]]] = {}
+        graph = service.get_networkx_graph()
+        for node, data in graph.nodes(data=True):
+            for key, value in data.items():
+                if key not in immutable:
+                    values.setdefault((NODES, key), []).append((node, value))
+        for ep1, ep2, data in graph.edges(data=True):
+            edge = (ep1, ep2) if ep1 <= ep2 else (ep2, ep1)
+            for key, value in data.items():
+                if key not in immutable:
+                    values.setdefault((EDGES, key), []).append((edge, value))
+        for key, value in graph.graph.items():
+            if key not in immutable:
+                values[(GRAPH, key)] = [(None, value)]
+        for column, entries in values.items():
+            self.columns[column] = self._column_digest(column, entries)
+        self._digest: Optional[bytes] = None
+
+    @staticmethod
+    def _column_digest(column: Tuple[str, str], entries: List[Tuple[Any, Any]]) -> bytes:
+        entries.sort(key=lambda entry: entry[0] or "")
+        hasher = hashlib.blake2b(_dumps(column).encode("utf-8"), digest_size=DIGEST_SIZE)
+        for entry in entries:
+            hasher.update(_dumps(entry).encode("utf-8"))
+            hasher.update(b"\n")
+        return hasher.digest()
+
+    def update_column(self, kind: str, attribute: str) -> None:
+        """Rehash one annotation column, kind is NODES, EDGES or GRAPH"""
+        graph = self._service.get_networkx_graph()
+        if kind == NODES:
+            entries = [(node, value) for node, value in graph.nodes(data=attribute) if value is not None]
+        elif kind == EDGES:
+            entries = [
+                ((ep1, ep2) if ep1 <= ep2 else (ep2, ep1), value)
+                for ep1, ep2, value in graph.edges(data=attribute)
+                if value is not None
+            ]
+        elif kind == GRAPH:
+            entries = [(None, graph.graph[attribute])] if attribute in graph.graph else []
+        else:
+            raise ValueError(f"Column kind {kind} is not one of {NODES}, {EDGES}, {GRAPH}")
+        if entries:
+            self.columns[(kind, attribute)] = self._column_digest((kind, attribute), entries)
+        else:
+            self.columns.pop((kind, attribute), None)
+        self._digest = None
+
+    def digest(self) -> bytes:
+        """Return the root hash"""
+        if self._digest is None:
+            self._digest = _combine(
+                b"graph",
+                [self.infrastructure.digest()] + [self.columns[k] for k in sorted(self.columns)],
+            )
+        return self._digest
+
+    def hexdigest(self) -> str:
+        """Return the root hash as a hex string"""
+        return self.digest().hex()
+
+
+def graph_hash(service: InfraGraphService) -> str:
+    """Return the canonical hex hash of the infrastructure and annotations of a service"""
+    return GraphHash(service).hexdigest()
@@ -0,0 +1,177 @@
+"""
+Canonicalizing compression of Infrastructure edges back into slice notation.
+
+Fabric blueprints add one InfrastructureEdge per port pair, e.g.
+    host[12] nic[0] <-> tier_0[1] port[4]
+compress_edges merges consecutive one2one edges of the same link whose
+endpoints advance in a regular pattern back into a single ranged edge:
+    host[0:64] nic[0] <-> tier_0[0:4] port[0:16]
+
+A ranged one2one endpoint expands instance major, for every instance
+index every component index, and the two endpoints are paired in that
+order. A run of edges can be merged when the (instance, component)
+indexes of each endpoint form such a raster:
+    t -> (i0 + (t // m) * si, c0 + (t % m) * sc)
+with the row length m and the strides si, sc fixed for the run.
+
+Only consecutive edges are merged so the expanded edges keep their
+original order and the built graph is identical. Edges that use other
+schemes or nested/ranged endpoints are kept as they are.
+
+Example:
+    infrastructure = ClosFatTreeFabric(switch, server, 3, [])
+    compress_edges(infrastructure)
+    yaml = infrastructure.serialize("yaml")
+"""
+
+import re
+from typing import List, Optional, Tuple
+from infragraph import Infrastructure, InfrastructureEdge
+
+_INDEXED = re.compile(r"^([A-Za-z0-9_-]+)\[(\d+)\]$")
+
+Point = Tuple[int, int]
+
+
+class _Raster:
+    """Incrementally checks that (instance, component) points form a raster"""
+
+    def __init__(self, first: Point):
+        self.first = first
+        self.count = 1
+        self.row: Optional[int] = None
+        self.instance_step: Optional[int] = None
+        self.component_step: Optional[int] = None
+
+    def expected(self, t: int) -> Point:
+        i0, c0 = self.first
+        row = self.row or t + 1
+        return (
+            i0 + (t // row) * (self.instance_step or 0),
+            c0 + (t % row) * (self.component_step or 0),
+        )
+
+    def push(self, point: Point) -> bool:
+        """Extend the raster with the next point, False if it does not fit"""
+        t = self.count
+        i0, c0 = self.first
+        if self.row is None:
+            instance, component = point
+            if instance == i0:
+                step = component - c0
+                if self.component_step is None:
+                    if step <= 0:
+                        return False
+                    self.component_step = step
+                elif component != c0 + t * self.component_step:
+                    return False
+            elif component == c0 and instance > i0:
+                # first row is complete, the raster is now fully determined
+                self.row = t
+                self.instance_step = instance - i0
+                self.component_step = self.component_step or 1
+            else:
+                return False
+        elif point != self.expected(t):
+            return False
+        self.count += 1
+        return True
+
+    def is_rectangular(self, length: int) -> bool:
+        """True if the first length points form complete rows"""
+        return self.row is None or length <= self.row or length % self.row == 0
+
+    def endpoint(self, instance_name: str, component_name: str, length: int) -> Tuple[str, str]:
+        """Slice notation of the first length points"""
+        i0, c0 = self.first
+        row = min(self.row or length, length)
+        rows = length // row
+        return (
+            f"{instance_name}{_slice(i0, rows, self.instance_step or 1)}",
+            f"{component_name}{_slice(c0, row, self.component_step or 1)}",
+        )
+
+
+def _slice(start: int, count: int, step: int) -> str:
+    if count == 1:
+        return f"[{start}]"
+    stop = start + (count - 1) * step + 1
+    if step == 1:
+        return f"[{start}:{stop}]"
+    return f"[{start}:{stop}:{step}]"
+
+
+def _edge_key(edge: InfrastructureEdge):
+    """Return the merge key and the endpoint points of a mergeable edge, None otherwise"""
+    if edge.scheme != InfrastructureEdge.ONE2ONE:
+        return None
+    matches = []
+    for endpoint in (edge.ep1, edge.ep2):
+        instance = _INDEXED.match(endpoint.instance or "")
+        component = _INDEXED.match(endpoint.component or "")
+        if instance is None or component is None:
+            return None
+        matches.append((instance, component))
+    (i1, c1), (i2, c2) = matches
+    key = (edge.link, i1.group(1), c1.group(1), i2.group(1), c2.group(1))
+    points = ((int(i1.group(2)), int(c1.group(2))), (int(i2.group(2)), int(c2.group(2))))
+    return key, points
+
+
+def _merge_run(key, points: List[Tuple[Point, Point]]) -> List[Tuple[str, str, str, str, str]]:
+    """Split a run of same key edges into the fewest consecutive raster edges"""
+    link, instance1, component1, instance2, component2 = key
+    merged = []
+    start = 0
+    while start < len(points):
+        side1 = _Raster(points[start][0])
+        side2 = _Raster(points[start][1])
+        end = start + 1
+        while end < len(points) and side1.push(points[end][0]) and side2.push(points[end][1]):
+            end += 1
+        length = end - start
+        while not (side1.is_rectangular(length) and side2.is_rectangular(length)):
+            length -= 1
+        merged.append(
+            (link, *side1.endpoint(instance1, component1, length), *side2.endpoint(instance2, component2, length))
+        )
+        start += length
+    return merged
+
+
+def compress_edges(infrastructure: Infrastructure) -> int:
+    """Merge runs of per port edges into ranged slice edges in place.
+
+    Returns the number of edges after compression.
+    """
+    edges = list(infrastructure.edges)
+    compressed: List[object] = []
+    run_key = None
+    run: List[Tuple[Point, Point]] = []
+    for edge in edges:
+        keyed = _edge_key(edge)
+        if keyed is not None and keyed[0] == run_key:
+            run.append(keyed[1])
+            continue
+        if run:
+            compressed.extend(_merge_run(run_key, run))
+        if keyed is None:
+            compressed.append(edge)
+            run_key, run = None, []
+        else:
+            run_key, run = keyed[0], [keyed[1]]
+    if run:
+        compressed.extend(_merge_run(run_key, run))
+
+    infrastructure.edges.clear()
+    for item in compressed:
+        if isinstance(item, InfrastructureEdge):
+            infrastructure.edges.append(item)
+            continue
+        link, instance1, component1, instance2, component2 = item
+        edge = infrastructure.edges.add(scheme=InfrastructureEdge.ONE2ONE, link=link)
+        edge.ep1.instance = instance1
+        edge.ep1.component = component1
+        edge.ep2.instance = instance2
+        edge.ep2.component = component2
+    return len(infrastructure.edges)
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# Generated by the protocol buffer compiler.  DO NOT EDIT!
+# NO CHECKED-IN PROTOBUF GENCODE
+# source: infragraph/graph.proto
+# Protobuf Python Version: 6.31.1
+"""Generated protocol buffer code."""
+from google.protobuf import descriptor as _descriptor
+from google.protobuf import descriptor_pool as _descriptor_pool
+from google.protobuf import runtime_version as _runtime_version
+from google.protobuf import symbol_database as _symbol_database
+from google.protobuf.internal import builder as _builder
+_runtime_version.ValidateProtobufRuntimeVersion(
+    _runtime_version.Domain.PUBLIC,
+    6,
+    31,
+    1,
+    '',
+    'infragraph/graph.proto'
+)
+# @@protoc_insertion_point(imports)
+
+_sym_db = _symbol_database.Default()
+
+
+
+
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x16infragraph/graph.proto\x12\x10infragraph.graph\"Q\n\x05Value\x12\x10\n\x06string\x18\x01 \x01(\rH\x00\x12\r\n\x03int\x18\x02 \x01(\x12H\x00\x12\x0f\n\x05\x66loat\x18\x03 \x01(\x01H\x00\x12\x0e\n\x04\x62ool\x18\x04 \x01(\x08H\x00\x42\x06\n\x04kind\"@\n\tAttribute\x12\x0b\n\x03key\x18\x01 \x01(\r\x12&\n\x05value\x18\x02 \x01(\x0b\x32\x17.infragraph.graph.Value\"E\n\x04Node\x12\x0c\n\x04name\x18\x01 \x01(\r\x12/\n\nattributes\x18\x02 \x03(\x0b\x32\x1b.infragraph.graph.Attribute\"Q\n\x04\x45\x64ge\x12\x0b\n\x03\x65p1\x18\x01 \x01(\r\x12\x0b\n\x03\x65p2\x18\x02 \x01(\r\x12/\n\nattributes\x18\x03 \x03(\x0b\x32\x1b.infragraph.graph.Attribute\"\xb9\x01\n\nGraphChunk\x12\x15\n\rstring_offset\x18\x01 \x01(\r\x12\x0f\n\x07strings\x18\x02 \x03(\t\x12\x35\n\x10graph_attributes\x18\x03 \x03(\x0b\x32\x1b.infragraph.graph.Attribute\x12%\n\x05nodes\x18\x04 \x03(\x0b\x32\x16.infragraph.graph.Node\x12%\n\x05\x65\x64ges\x18\x05 \x03(\x0b\x32\x16.infragraph.graph.Edge\"M\n\x11QueryPagesRequest\x12\x15\n\rquery_request\x18\x01 \x01(\x0c\x12\x11\n\tpage_size\x18\x02 \x01(\r\x12\x0e\n\x06\x63ursor\x18\x03 \x01(\t\";\n\tQueryPage\x12\x1e\n\x16query_response_content\x18\x01 \x01(\x0c\x12\x0e\n\x06\x63ursor\x18\x02 \x01(\t\"M\n\x11GraphPagesRequest\x12\x15\n\rgraph_request\x18\x01 \x01(\x0c\x12\x11\n\tpage_size\x18\x02 \x01(\r\x12\x0e\n\x06\x63ursor\x18\x03 \x01(\t\"H\n\tGraphPage\x12+\n\x05\x63hunk\x18\x01 \x01(\x0b\x32\x1c.infragraph.graph.GraphChunk\x12\x0e\n\x06\x63ursor\x18\x02 \x01(\t2\xb1\x01\n\x0bGraphStream\x12P\n\nQueryPages\x12#.infragraph.graph.QueryPagesRequest\x1a\x1b.infragraph.graph.QueryPage0\x01\x12P\n\nGraphPages\x12#.infragraph.graph.GraphPagesRequest\x1a\x1b.infragraph.graph.GraphPage0\x01\x62\x06proto3')
+
+_globals = globals()
+_builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
+_builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'infragraph.graph_pb2', _globals)
+if not _descriptor._USE_C_DESCRIPTORS:
+  DESCRIPTOR._loaded_options = None
+  _globals['_VALUE']._serialized_start=44
+  _globals['_VALUE']._serialized_end=125
+  _globals['_ATTRIBUTE']._serialized_start=127
+  _globals['_ATTRIBUTE']._serialized_end=191
+  _globals['_NODE']._serialized_start=193
+  _globals['_NODE']._serialized_end=262
+  _globals['_EDGE']._serialized_start=264
+  _globals['_EDGE']._serialized_end=345
+  _globals['_GRAPHCHUNK']._serialized_start=348
+  _globals['_GRAPHCHUNK']._serialized_end=533
+  _globals['_QUERYPAGESREQUEST']._serialized_start=535
+  _globals['_QUERYPAGESREQUEST']._serialized_end=612
+  _globals['_QUERYPAGE']._serialized_start=614
+  _globals['_QUERYPAGE']._serialized_end=673
+  _globals['_GRAPHPAGESREQUEST']._serialized_start=675
+  _globals['_GRAPHPAGESREQUEST']._serialized_end=752
+  _globals['_GRAPHPAGE']._serialized_start=754
+  _globals['_GRAPHPAGE']._serialized_end=826
+  _globals['_GRAPHSTREAM']._serialized_start=829
+  _globals['_GRAPHSTREAM']._serialized_end=1006
+# @@protoc_insertion_point(module_scope)
@@ -0,0 +1,143 @@
+# Generated by the gRPC Python protocol compiler plugin. DO NOT EDIT!
+"""Client and server classes corresponding to protobuf-defined services."""
+import grpc
+import warnings
+
+from infragraph import graph_pb2 as infragraph_dot_graph__pb2
+
+GRPC_GENERATED_VERSION = '1.75.0'
+GRPC_VERSION = grpc.__version__
+_version_not_supported = False
+
+try:
+    from grpc._utilities import first_version_is_lower
+    _version_not_supported = first_version_is_lower(GRPC_VERSION, GRPC_GENERATED_VERSION)
+except ImportError:
+    _version_not_supported = True
+
+if _version_not_supported:
+    raise RuntimeError(
+        f'The grpc package installed is at version {GRPC_VERSION},'
+        + f' but the generated code in infragraph/graph_pb2_grpc.py depends on'
+        + f' grpcio>={GRPC_GENERATED_VERSION}.'
+        + f' Please upgrade your grpc module to grpcio>={GRPC_GENERATED_VERSION}'
+        + f' or downgrade your generated code using grpcio-tools<={GRPC_VERSION}.'
+    )
+
+
+class GraphStreamStub(object):
+    """Server streaming variants of query_graph and get_graph.
+    """
+
+    def __init__(self, channel):
+        """Constructor.
+
+        Args:
+            channel: A grpc.Channel.
+        """
+        self.QueryPages = channel.unary_stream(
+                '/infragraph.graph.GraphStream/QueryPages',
+                request_serializer=infragraph_dot_graph__pb2.QueryPagesRequest.SerializeToString,
+                response_deserializer=infragraph_dot_graph__pb2.QueryPage.FromString,
+                _registered_method=True)
+        self.GraphPages = channel.unary_stream(
+                '/infragraph.graph.GraphStream/GraphPages',
+                request_serializer=infragraph_dot_graph__pb2.GraphPagesRequest.SerializeToString,
+                response_deserializer=infragraph_dot_graph__pb2.GraphPage.FromString,
+                _registered_method=True)
+
+
+class GraphStreamServicer(object):
+    """Server streaming variants of query_graph and get_graph.
+    """
+
+    def QueryPages(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GraphPages(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+
+def add_GraphStreamServicer_to_server(servicer, server):
+    rpc_method_handlers = {
+            'QueryPages': grpc.unary_stream_rpc_method_handler(
+                    servicer.QueryPages,
+                    request_deserializer=infragraph_dot_graph__pb2.QueryPagesRequest.FromString,
+                    response_serializer=infragraph_dot_graph__pb2.QueryPage.SerializeToString,
+            ),
+            'GraphPages': grpc.unary_stream_rpc_method_handler(
+                    servicer.GraphPages,
+                    request_deserializer=infragraph_dot_graph__pb2.GraphPagesRequest.FromString,
+                    response_serializer=infragraph_dot_graph__pb2.GraphPage.SerializeToString,
+            ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+            'infragraph.graph.GraphStream', rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+    server.add_registered_method_handlers('infragraph.graph.GraphStream', rpc_method_handlers)
+
+
+ # This class is part of an EXPERIMENTAL API.
+class GraphStream(object):
+    """Server streaming variants of query_graph and get_graph.
+    """
+
+    @staticmethod
+    def QueryPages(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/infragraph.graph.GraphStream/QueryPages',
+            infragraph_dot_graph__pb2.QueryPagesRequest.SerializeToString,
+            infragraph_dot_graph__pb2.QueryPage.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GraphPages(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/infragraph.graph.GraphStream/GraphPages',
+            infragraph_dot_graph__pb2.GraphPagesRequest.SerializeToString,
+            infragraph_dot_graph__pb2.GraphPage.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
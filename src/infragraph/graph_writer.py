@@ -0,0 +1,452 @@
+"""
+Streaming encoders for the networkx representation of an infrastructure graph.
+
+`json_graph.node_link_data` builds a dict holding every node and edge before a
+single byte is written and PyYAML then walks that dict in pure Python. The
+writers in this module walk the networkx graph directly and emit one node or
+edge at a time, so memory stays flat regardless of graph size.
+
+Encodings:
+- json: compact node-link JSON, loadable by `json_graph.node_link_graph(data, edges="edges")`
+- ndjson: one JSON object per line, a `graph` header followed by `node` and `edge` records
+- binary: length prefixed records with an interned string table, see `GraphWriter.write_binary`
+- protobuf: `GraphChunk` messages of graph.proto with an interned string table,
+  see `GraphWriter.iter_protobuf_chunks`
+"""
+
+import json
+import struct
+from itertools import islice
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, Optional, TextIO, Tuple, Union
+import yaml
+from networkx import Graph
+from networkx.readwrite import json_graph
+from infragraph.compression import format_extension, open_file
+
+try:
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:
+    from yaml import SafeLoader as _SafeLoader
+
+
+class GraphWriter:
+    """Write a networkx graph in one of the streaming encodings.
+
+    Attributes named in `exclude` are left out of nodes, edges and graph
+    attributes which lets callers produce the partial annotation view
+    without copying the graph first.
+    """
+
+    JSON = "json"
+    NDJSON = "ndjson"
+    BINARY = "binary"
+    PROTOBUF = "protobuf"
+    ENCODINGS = (JSON, NDJSON, BINARY, PROTOBUF)
+    BYTE_ENCODINGS = (BINARY, PROTOBUF)
+    # file extension, without any compression extension, to encoding
+    EXTENSIONS = {"json": JSON, "ndjson": NDJSON, "ignx": BINARY, "pb": PROTOBUF}
+
+    BINARY_MAGIC = b"IGNX"
+    BINARY_VERSION = 1
+
+    # binary record tags
+    _STRING = 1
+    _GRAPH = 2
+    _NODE = 3
+    _EDGE = 4
+    _END = 0
+
+    # binary value types
+    _VALUE_STRING = ord("s")
+    _VALUE_INT = ord("i")
+    _VALUE_FLOAT = ord("f")
+    _VALUE_BOOL = ord("b")
+    _VALUE_NONE = ord("n")
+
+    def __init__(self, graph: Graph, exclude: Iterable[str] = ()):
+        self._graph = graph
+        self._exclude = frozenset(exclude)
+
+    def _attrs(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        if not self._exclude:
+            return data
+        return {k: v for k, v in data.items() if k not in self._exclude}
+
+    def write(self, fp, encoding: str) -> None:
+        """Write the graph to a text (json, ndjson) or binary (binary, protobuf) file object"""
+        if encoding == self.JSON:
+            self.write_json(fp)
+        elif encoding == self.NDJSON:
+            self.write_ndjson(fp)
+        elif encoding == self.BINARY:
+            self.write_binary(fp)
+        elif encoding == self.PROTOBUF:
+            self.write_protobuf(fp)
+        else:
+            raise ValueError(f"Graph encoding {encoding} is not supported, use one of {self.ENCODINGS}")
+
+    def write_json(self, fp: TextIO) -> None:
+        """Write compact node-link JSON one node and edge at a time"""
+        dumps = json.JSONEncoder(separators=(",", ":"), default=str).encode
+        graph = self._graph
+        fp.write('{"directed":false,"multigraph":false,"graph":')
+        fp.write(dumps(self._attrs(graph.graph)))
+        fp.write(',"nodes":[')
+        separator = ""
+        for node, data in graph.nodes(data=True):
+            fp.write(separator)
+            fp.write(dumps({**self._attrs(data), "id": node}))
+            separator = ","
+        fp.write('],"edges":[')
+        separator = ""
+        for ep1, ep2, data in graph.edges(data=True):
+            fp.write(separator)
+            fp.write(dumps({**self._attrs(data), "source": ep1, "target": ep2}))
+            separator = ","
+        fp.write("]}")
+
+    def write_ndjson(self, fp: TextIO) -> None:
+        """Write newline delimited JSON: one graph header line, then one line per node and edge"""
+        dumps = json.JSONEncoder(separators=(",", ":"), default=str).encode
+        graph = self._graph
+        fp.write(dumps({"graph": self._attrs(graph.graph), "directed": False, "multigraph": False}))
+        fp.write("\n")
+        for node, data in graph.nodes(data=True):
+            fp.write(dumps({"node": {**self._attrs(data), "id": node}}))
+            fp.write("\n")
+        for ep1, ep2, data in graph.edges(data=True):
+            fp.write(dumps({"edge": {**self._attrs(data), "source": ep1, "target": ep2}}))
+            fp.write("\n")
+
+    def write_binary(self, fp: BinaryIO) -> None:
+        """Write the binary encoding.
+
+        Layout: magic b"IGNX", a version byte, then a sequence of records each
+        starting with a tag byte and ending with an END record.
+        - STRING: varint length + utf-8 bytes, assigns the next string id
+        - GRAPH: attributes
+        - NODE: varint node string id + attributes
+        - EDGE: varint ep1 string id + varint ep2 string id + attributes
+        Attributes are a varint count followed by (varint key string id,
+        value type byte, value) entries. Strings are interned, a STRING record
+        is emitted right before the first record that refers to it.
+        """
+        strings: Dict[str, int] = {}
+        buffer = bytearray()
+
+        def string_id(value: str) -> int:
+            sid = strings.get(value)
+            if sid is None:
+                sid = len(strings)
+                strings[value] = sid
+                encoded = value.encode("utf-8")
+                buffer.append(self._STRING)
+                _write_varint(buffer, len(encoded))
+                buffer.extend(encoded)
+            return sid
+
+        def record(tag: int, ids: Tuple[int, ...], data: Dict[str, Any]):
+            # resolve every string first so STRING records precede the record
+            attrs = [(string_id(k), self._binary_value(v, string_id)) for k, v in self._attrs(data).items()]
+            buffer.append(tag)
+            for value in ids:
+                _write_varint(buffer, value)
+            _write_varint(buffer, len(attrs))
+            for key, (value_type, value) in attrs:
+                _write_varint(buffer, key)
+                buffer.append(value_type)
+                buffer.extend(value)
+            if len(buffer) >= 1 << 16:
+                fp.write(bytes(buffer))
+                buffer.clear()
+
+        buffer.extend(self.BINARY_MAGIC)
+        buffer.append(self.BINARY_VERSION)
+        record(self._GRAPH, (), self._graph.graph)
+        for node, data in self._graph.nodes(data=True):
+            record(self._NODE, (string_id(node),), data)
+        for ep1, ep2, data in self._graph.edges(data=True):
+            record(self._EDGE, (string_id(ep1), string_id(ep2)), data)
+        buffer.append(self._END)
+        fp.write(bytes(buffer))
+
+    def iter_protobuf_chunks(self, chunk_size: int = 1 << 16) -> "Iterator[graph_pb2.GraphChunk]":
+        """Yield the graph as GraphChunk messages of at most chunk_size nodes and edges.
+
+        The first chunk carries the graph attributes, nodes come before
+        edges. Each chunk holds only the strings it introduces, starting at
+        string table id string_offset, so chunks must be read in order.
+        """
+        from infragraph import graph_pb2
+
+        strings: Dict[str, int] = {}
+        chunk = graph_pb2.GraphChunk()
+        self._add_protobuf_attrs(chunk, strings, chunk.graph_attributes, self._graph.graph)
+        count = 0
+        for record in self._iter_records():
+            self._add_protobuf_record(chunk, strings, record)
+            count += 1
+            if count == chunk_size:
+                yield chunk
+                chunk = graph_pb2.GraphChunk(string_offset=len(strings))
+                count = 0
+        if count > 0 or chunk.string_offset == 0:
+            yield chunk
+
+    def iter_protobuf_pages(self, page_size: int = 1 << 14, start: int = 0) -> "Iterator[Tuple[int, graph_pb2.GraphChunk]]":
+        """Yield self-contained GraphChunk pages of at most page_size nodes and edges.
+
+        Unlike iter_protobuf_chunks every page has its own string table, so
+        memory does not grow with the graph and reading can resume at any
+        page. Records are numbered nodes first, then edges, each page is
+        yielded with the number of the record after it and start skips
+        records of earlier pages. The first page carries the graph
+        attributes, an empty graph yields one page.
+        """
+        from infragraph import graph_pb2
+
+        records = islice(self._iter_records(), start, None)
+        position = start
+        while True:
+            chunk = graph_pb2.GraphChunk()
+            strings: Dict[str, int] = {}
+            if position == 0:
+                self._add_protobuf_attrs(chunk, strings, chunk.graph_attributes, self._graph.graph)
+            count = 0
+            for record in islice(records, page_size):
+                self._add_protobuf_record(chunk, strings, record)
+                count += 1
+            position += count
+            if count == 0 and position > 0:
+                return
+            yield position, chunk
+            if count < page_size:
+                return
+
+    def _iter_records(self) -> Iterator[Tuple[str, Optional[str], Dict[str, Any]]]:
+        """Yield the nodes as (name, None, data) followed by the edges as (ep1, ep2, data)"""
+        for node, data in self._graph.nodes(data=True):
+            yield node, None, data
+        yield from self._graph.edges(data=True)
+
+    def _add_protobuf_record(self, chunk: "graph_pb2.GraphChunk", strings: Dict[str, int], record) -> None:
+        ep1, ep2, data = record
+        if ep2 is None:
+            node = chunk.nodes.add(name=self._protobuf_string(chunk, strings, ep1))
+            self._add_protobuf_attrs(chunk, strings, node.attributes, data)
+        else:
+            edge = chunk.edges.add(
+                ep1=self._protobuf_string(chunk, strings, ep1), ep2=self._protobuf_string(chunk, strings, ep2)
+            )
+            self._add_protobuf_attrs(chunk, strings, edge.attributes, data)
+
+    def _add_protobuf_attrs(self, chunk: "graph_pb2.GraphChunk", strings: Dict[str, int], attributes, data) -> None:
+        def string_id(value: str) -> int:
+            return self._protobuf_string(chunk, strings, value)
+
+        for key, value in self._attrs(data).items():
+            attribute = attributes.add(key=string_id(key))
+            self._protobuf_value(attribute.value, value, string_id)
+
+    @staticmethod
+    def _protobuf_string(chunk: "graph_pb2.GraphChunk", strings: Dict[str, int], value: str) -> int:
+        """Return the string table id of value, adding it to the strings of chunk if it is new"""
+        sid = strings.get(value)
+        if sid is None:
+            sid = len(strings)
+            strings[value] = sid
+            chunk.strings.append(value)
+        return sid
+
+    def write_protobuf(self, fp: BinaryIO, chunk_size: int = 1 << 16) -> None:
+        """Write the serialized GraphChunk messages back to back.
+
+        Repeated fields of concatenated messages are merged by protobuf, so
+        the output parses as a single GraphChunk holding the whole graph.
+        string_offset is cleared as the merged string table starts at 0.
+        """
+        for chunk in self.iter_protobuf_chunks(chunk_size):
+            chunk.string_offset = 0
+            fp.write(chunk.SerializeToString())
+
+    @staticmethod
+    def _protobuf_value(message: "graph_pb2.Value", value: Any, string_id) -> None:
+        if value is None:
+            message.SetInParent()
+        elif isinstance(value, bool):
+            message.bool = value
+        elif isinstance(value, float):
+            message.float = value
+        elif isinstance(value, int) and -(1 << 63) <= value < (1 << 63):
+            message.int = value
+        else:
+            message.string = string_id(value if isinstance(value, str) else str(value))
+
+    def _binary_value(self, value: Any, string_id) -> Tuple[int, bytes]:
+        if value is None:
+            return self._VALUE_NONE, b""
+        if isinstance(value, bool):
+            return self._VALUE_BOOL, b"\x01" if value else b"\x00"
+        if isinstance(value, float):
+            return self._VALUE_FLOAT, struct.pack("<d", value)
+        encoded = bytearray()
+        if isinstance(value, int) and -(1 << 63) <= value < (1 << 63):
+            # zigzag so small negative numbers stay short
+            _write_varint(encoded, (value << 1) ^ (value >> 63))
+            return self._VALUE_INT, bytes(encoded)
+        _write_varint(encoded, string_id(value if isinstance(value, str) else str(value)))
+        return self._VALUE_STRING, bytes(encoded)
+
+
+def _write_varint(buffer: bytearray, value: int) -> None:
+    while value > 0x7F:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _read_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, offset
+        shift += 7
+
+
+def read_binary_graph(data: bytes) -> Graph:
+    """Rebuild a networkx graph from the output of GraphWriter.write_binary"""
+    if data[:4] != GraphWriter.BINARY_MAGIC:
+        raise ValueError("Data is not an infragraph binary graph")
+    if data[4] != GraphWriter.BINARY_VERSION:
+        raise ValueError(f"Unsupported infragraph binary graph version {data[4]}")
+    graph = Graph()
+    strings = []
+    offset = 5
+
+    def read_attrs(offset: int) -> Tuple[Dict[str, Any], int]:
+        count, offset = _read_varint(data, offset)
+        attrs: Dict[str, Any] = {}
+        for _ in range(count):
+            key, offset = _read_varint(data, offset)
+            value_type = data[offset]
+            offset += 1
+            if value_type == GraphWriter._VALUE_STRING:
+                sid, offset = _read_varint(data, offset)
+                value: Optional[Any] = strings[sid]
+            elif value_type == GraphWriter._VALUE_INT:
+                raw, offset = _read_varint(data, offset)
+                value = (raw >> 1) ^ -(raw & 1)
+            elif value_type == GraphWriter._VALUE_FLOAT:
+                value = struct.unpack_from("<d", data, offset)[0]
+                offset += 8
+            elif value_type == GraphWriter._VALUE_BOOL:
+                value = data[offset] == 1
+                offset += 1
+            else:
+                value = None
+            attrs[strings[key]] = value
+        return attrs, offset
+
+    while True:
+        tag = data[offset]
+        offset += 1
+        if tag == GraphWriter._END:
+            return graph
+        if tag == GraphWriter._STRING:
+            length, offset = _read_varint(data, offset)
+            strings.append(data[offset : offset + length].decode("utf-8"))
+            offset += length
+        elif tag == GraphWriter._GRAPH:
+            attrs, offset = read_attrs(offset)
+            graph.graph.update(attrs)
+        elif tag == GraphWriter._NODE:
+            node, offset = _read_varint(data, offset)
+            attrs, offset = read_attrs(offset)
+            graph.add_node(strings[node], **attrs)
+        elif tag == GraphWriter._EDGE:
+            ep1, offset = _read_varint(data, offset)
+            ep2, offset = _read_varint(data, offset)
+            attrs, offset = read_attrs(offset)
+            graph.add_edge(strings[ep1], strings[ep2], **attrs)
+        else:
+            raise ValueError(f"Unknown record tag {tag} at offset {offset - 1}")
+
+
+def _protobuf_value(value: "graph_pb2.Value", strings) -> Any:
+    kind = value.WhichOneof("kind")
+    if kind == "string":
+        return strings[value.string]
+    if kind is None:
+        return None
+    return getattr(value, kind)
+
+
+def read_protobuf_graph(chunks: "Union[bytes, graph_pb2.GraphChunk, Iterable[Union[bytes, graph_pb2.GraphChunk]]]") -> Graph:
+    """Rebuild a networkx graph from GraphWriter.write_protobuf output or from
+    the GraphChunk messages, serialized or not, of GraphWriter.iter_protobuf_chunks
+    """
+    from infragraph import graph_pb2
+
+    if isinstance(chunks, (bytes, bytearray, memoryview, graph_pb2.GraphChunk)):
+        chunks = [chunks]
+    graph = Graph()
+    strings = []
+    for chunk in chunks:
+        if not isinstance(chunk, graph_pb2.GraphChunk):
+            chunk = graph_pb2.GraphChunk.FromString(bytes(chunk))
+        if chunk.string_offset != len(strings):
+            raise ValueError(f"Graph chunk starts at string {chunk.string_offset}, expected {len(strings)}")
+        strings.extend(chunk.strings)
+        for attribute in chunk.graph_attributes:
+            graph.graph[strings[attribute.key]] = _protobuf_value(attribute.value, strings)
+        for node in chunk.nodes:
+            graph.add_node(
+                strings[node.name],
+                **{strings[a.key]: _protobuf_value(a.value, strings) for a in node.attributes},
+            )
+        for edge in chunk.edges:
+            graph.add_edge(
+                strings[edge.ep1],
+                strings[edge.ep2],
+                **{strings[a.key]: _protobuf_value(a.value, strings) for a in edge.attributes},
+            )
+    return graph
+
+
+def read_graph(path: str) -> Graph:
+    """Rebuild a networkx graph from a file written by write_graph or dump_graph.
+
+    The encoding follows the file extension, .yaml or .yml for the default
+    node-link yaml or one of GraphWriter.EXTENSIONS, optionally followed by
+    a compression extension such as .gz or .zst.
+    """
+    extension = format_extension(path)
+    if extension in ("yaml", "yml"):
+        with open_file(path, "rt") as fp:
+            return json_graph.node_link_graph(yaml.load(fp, Loader=_SafeLoader), edges="edges")
+    encoding = GraphWriter.EXTENSIONS.get(extension)
+    if encoding is None:
+        raise ValueError(f"Cannot infer the graph encoding of {path}")
+    if encoding in GraphWriter.BYTE_ENCODINGS:
+        with open_file(path, "rb") as fp:
+            data = fp.read()
+        return read_binary_graph(data) if encoding == GraphWriter.BINARY else read_protobuf_graph(data)
+    with open_file(path, "rt") as fp:
+        if encoding == GraphWriter.JSON:
+            return json_graph.node_link_graph(json.load(fp), edges="edges")
+        graph = Graph()
+        for line in fp:
+            record = json.loads(line)
+            if "node" in record:
+                data = record["node"]
+                graph.add_node(data.pop("id"), **data)
+            elif "edge" in record:
+                data = record["edge"]
+                graph.add_edge(data.pop("source"), data.pop("target"), **data)
+            else:
+                graph.graph.update(record["graph"])
+        return graph
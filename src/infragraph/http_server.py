@@ -0,0 +1,266 @@
+"""
+HTTP/JSON front-end hosting one shared InfraGraphService.
+
+The server implements the paths of artifacts/openapi.yaml, so tools that
+do not speak gRPC, e.g. curl or the generated HttpApi client, query a warm
+graph instead of rebuilding it per run:
+- POST /set_graph with an Infrastructure, returns a Warning
+- POST /get_graph with a GraphRequest, returns a GraphResponseContent
+- POST /query_graph with a QueryRequest, returns a QueryResponseContent
+- POST /annotate_graph with an Annotation, returns a Warning
+- POST /batch, not part of openapi.yaml, with {"operations": [...]},
+  returns {"results": [...]}, see InfraGraphService.batch. The
+  operations are decoded before the write lock is taken once for the
+  whole batch
+- GET /capabilities/version returns the Version
+- GET /ready returns the preload status, see infragraph.preload, with
+  status 503 until the graph is queryable
+
+While a GraphPreloader is loading the graph the openapi paths respond
+with status 503 as well, so clients never see a partly loaded graph. A
+failed preload stops the gating, GET /ready keeps reporting the error
+and clients can load a graph with /set_graph.
+
+Like the gRPC server, reads run on the snapshot published by the last
+write and writes take the write lock of the service, see server.py.
+
+Connections are HTTP/1.1 and kept alive until the client closes them or
+they stay idle for IDLE_TIMEOUT seconds. Responses of at least
+GZIP_MIN_SIZE bytes are gzip compressed for clients that accept it and
+gzip compressed request bodies are accepted.
+
+query_graph results are paged with the page_size and cursor parameters
+of the url. The cursor of the next page is returned in the X-Next-Cursor
+header, which is missing after the last page, see
+InfraGraphService.iter_query_pages. get_graph takes an encoding
+parameter, the binary and protobuf encodings of GraphWriter are returned
+as application/octet-stream.
+
+Failures are returned as the json representation of an Error with
+status 400 for invalid requests and 500 otherwise.
+
+Example:
+    infragraph serve --input fabric.yaml --http localhost:8080
+    curl --compressed -d '{"node_filters": [...]}' 'localhost:8080/query_graph?page_size=100'
+"""
+
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+from infragraph import Annotation, GraphRequest, Infrastructure
+from infragraph.graph_writer import GraphWriter
+from infragraph.infragraph_service import InfraGraphService, GraphError, InfrastructureError
+from infragraph.preload import GraphPreloader
+
+DEFAULT_HTTP_ADDRESS = "localhost:8080"
+GZIP_MIN_SIZE = 1024
+IDLE_TIMEOUT = 60.0
+
+# errors caused by the request rather than by the server
+_VALIDATION_ERRORS = (ValueError, TypeError, KeyError, GraphError, InfrastructureError)
+
+_JSON = "application/json"
+_OCTET_STREAM = "application/octet-stream"
+
+
+class HttpError(Exception):
+    """Error with the http status code to respond with"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _json(document) -> bytes:
+    return json.dumps(document, separators=(",", ":")).encode("utf-8")
+
+
+def _parameter(parameters: Dict[str, list], name: str) -> Optional[str]:
+    values = parameters.get(name)
+    return values[-1] if values else None
+
+
+class InfraGraphRequestHandler(BaseHTTPRequestHandler):
+    """Serves the openapi paths of the InfraGraphService of an InfraGraphHTTPServer"""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "infragraph"
+    timeout = IDLE_TIMEOUT
+    # headers and body are written separately, without TCP_NODELAY a kept
+    # alive connection waits for the delayed ack of the client every request
+    disable_nagle_algorithm = True
+    server: "InfraGraphHTTPServer"
+
+    def log_message(self, format, *args):
+        if self.server.log_requests:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        self._dispatch({"/capabilities/version": self._get_version, "/ready": self._get_ready})
+
+    def do_POST(self):
+        self._dispatch(
+            {
+                "/set_graph": self._set_graph,
+                "/get_graph": self._get_graph,
+                "/query_graph": self._query_graph,
+                "/annotate_graph": self._annotate_graph,
+                "/batch": self._batch,
+            }
+        )
+
+    def _dispatch(self, routes):
+        url = urlsplit(self.path)
+        try:
+            # the body is read before routing so the connection stays usable
+            body = self._read_body()
+            route = routes.get(url.path)
+            if route is None:
+                raise HttpError(404, f"No {self.command} {url.path} path")
+            preloader = self.server.preloader
+            if preloader is not None and preloader.loading and url.path != "/ready":
+                raise HttpError(503, "The graph is being preloaded")
+            status, content_type, content, headers = route(body, parse_qs(url.query))
+        except HttpError as error:
+            kind = "internal" if error.status >= 500 else "validation"
+            status, content_type, content, headers = self._error(error.status, kind, error)
+        except _VALIDATION_ERRORS as error:
+            status, content_type, content, headers = self._error(400, "validation", error)
+        except Exception as error:
+            status, content_type, content, headers = self._error(500, "internal", error)
+        self._respond(status, content_type, content, headers)
+
+    def _read_body(self) -> bytes:
+        if "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+            self.close_connection = True
+            raise HttpError(411, "Chunked request bodies are not supported, send a Content-Length")
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.headers.get("Content-Encoding", "").lower() == "gzip":
+            body = gzip.decompress(body)
+        return body
+
+    def _error(self, status: int, kind: str, error: Exception):
+        return status, _JSON, _json({"code": status, "kind": kind, "errors": [str(error)]}), {}
+
+    def _respond(self, status: int, content_type: str, content: bytes, headers: Dict[str, str]):
+        accepted = self.headers.get("Accept-Encoding", "")
+        if len(content) >= GZIP_MIN_SIZE and "gzip" in accepted.lower():
+            content = gzip.compress(content, compresslevel=self.server.gzip_level)
+            headers["Content-Encoding"] = "gzip"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _set_graph(self, body: bytes, parameters):
+        payload = Infrastructure().deserialize(body.decode("utf-8"))
+        with self.server.service.lock.write():
+            self.server.service.set_graph(payload)
+        return 200, _JSON, b"{}", {}
+
+    def _annotate_graph(self, body: bytes, parameters):
+        payload = Annotation().deserialize(body.decode("utf-8"))
+        with self.server.service.lock.write():
+            self.server.service.annotate_graph(payload)
+        return 200, _JSON, b"{}", {}
+
+    def _batch(self, body: bytes, parameters):
+        service = self.server.service
+        operations = service.load_batch(body.decode("utf-8"))
+        with service.lock.write():
+            results = service.batch(operations)
+        documents = []
+        for (kind, _), result in zip(operations, results):
+            if kind == "annotate":
+                result = {}
+            elif kind == "query":
+                result = result.serialize("dict")
+            documents.append({kind: result})
+        return 200, _JSON, _json({"results": documents}), {}
+
+    def _get_graph(self, body: bytes, parameters):
+        request = GraphRequest().deserialize(body.decode("utf-8"))
+        encoding = _parameter(parameters, "encoding") or "yaml"
+        if encoding != "yaml" and encoding not in GraphWriter.ENCODINGS:
+            raise ValueError(f"Unknown graph encoding {encoding}")
+        graph = self.server.service.snapshot().get_graph(request, encoding)
+        if isinstance(graph, bytes):
+            return 200, _OCTET_STREAM, graph, {}
+        if request.choice == GraphRequest.INFRAGRAPH:
+            # the infragraph document is json already, embed it as is
+            content = b'{"choice":"infragraph","infragraph":' + graph.encode("utf-8") + b"}"
+        else:
+            content = _json({"choice": "networkx", "networkx": graph})
+        return 200, _JSON, content, {}
+
+    def _query_graph(self, body: bytes, parameters):
+        snapshot = self.server.service.snapshot()
+        page_size = _parameter(parameters, "page_size")
+        cursor = _parameter(parameters, "cursor")
+        if page_size is None and cursor is None:
+            content = snapshot.query_graph(body.decode("utf-8"))
+            return 200, _JSON, _json(content.serialize("dict")), {}
+        page_size = int(page_size or self.server.query_page_size)
+        if page_size <= 0:
+            raise ValueError("page_size must be positive")
+        content, next_cursor = next(snapshot.iter_query_pages(body.decode("utf-8"), page_size, cursor))
+        headers = {} if next_cursor is None else {"X-Next-Cursor": next_cursor}
+        return 200, _JSON, _json(content.serialize("dict")), headers
+
+    def _get_version(self, body: bytes, parameters):
+        return 200, _JSON, _json(self.server.service._version_meta.serialize("dict")), {}
+
+    def _get_ready(self, body: bytes, parameters):
+        preloader = self.server.preloader
+        if preloader is None:
+            return 200, _JSON, _json({"ready": True}), {}
+        status = preloader.status()
+        return 200 if status["ready"] else 503, _JSON, _json(status), {}
+
+
+class InfraGraphHTTPServer(ThreadingHTTPServer):
+    """Threaded HTTP server of one shared InfraGraphService, one thread per connection"""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        service: Optional[InfraGraphService] = None,
+        query_page_size: int = 1024,
+        gzip_level: int = 6,
+        log_requests: bool = False,
+        preloader: Optional[GraphPreloader] = None,
+    ):
+        super().__init__(address, InfraGraphRequestHandler)
+        self.service = service if service is not None else InfraGraphService()
+        self.preloader = preloader
+        self.query_page_size = query_page_size
+        self.gzip_level = gzip_level
+        self.log_requests = log_requests
+
+
+def _split_address(address: str) -> Tuple[str, int]:
+    host, _, port = address.rpartition(":")
+    return host or "localhost", int(port)
+
+
+def create_http_server(
+    service: Optional[InfraGraphService] = None,
+    address: str = DEFAULT_HTTP_ADDRESS,
+    **kwargs,
+) -> Tuple[InfraGraphHTTPServer, int]:
+    """Create an HTTP server and serve it on a daemon thread, returns the server and the bound port.
+
+    A port of 0 in address binds a free port, stop the server with shutdown.
+    """
+    server = InfraGraphHTTPServer(_split_address(address), service, **kwargs)
+    threading.Thread(target=server.serve_forever, name="infragraph-http", daemon=True).start()
+    return server, server.server_address[1]
+
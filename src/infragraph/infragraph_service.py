@@ -7,17 +7,30 @@ Python slice notation is a concise and powerful syntax for extracting a subset o
 
 """
 
+import io
+import hashlib
 import re
+import asyncio
+import threading
 import json
 import yaml
 import warnings
 import networkx
 from networkx import Graph
 from networkx.readwrite import json_graph
-from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
-from itertools import product as iterproduct
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from contextlib import contextmanager
+from itertools import islice, product as iterproduct
+from concurrent.futures import Executor
 from infragraph import *
+from infragraph.compression import format_extension, open_file
+from infragraph.graph_writer import GraphWriter
+from infragraph.infrastructure_loader import load_infrastructure
+from infragraph.locks import WriteLock
+from infragraph.query_cache import QueryCache, QueryCacheEntry, query_attributes, query_key
 
+# old value of a key the undo log of a write restores by deleting it
+_MISSING = object()
 
 class GraphError(Exception):
     """Custom exception for graph-related errors."""
@@ -57,6 +70,30 @@ class InfraGraphService(Api):
         "ns": "ns",
     }
 
+    # state of the live service only: configuration, locks and write
+    # bookkeeping. Snapshots leave it out and read the configuration of the
+    # live service, a failed write does not roll it back.
+    _LIVE_ATTRIBUTES: frozenset[str] = frozenset(
+        {
+            "_lock",
+            "_publish_lock",
+            "_executor",
+            "_query_cache",
+            "_last_version",
+            "_owned",
+            "_carried",
+            "_undo",
+            "_live",
+            "_read_only",
+            "_snapshot",
+            "_handed",
+        }
+    )
+
+    # the change log is compacted when it grows past twice its compacted
+    # length plus this many entries
+    _CHANGE_LOG_SLACK = 1 << 12
+
     def __init__(self):
         super().__init__()
         self._graph: Graph = Graph()
@@ -64,19 +101,287 @@ class InfraGraphService(Api):
         self._graph_node_prefix_map: Dict[str, List[str]] = {}
         self._link_to_edges_map: Dict[str, List[Tuple[str, str]]] = {}
         self._infrastructure: Infrastructure = Infrastructure()
+        # names of the mutable attributes written by annotate_graph, kept in
+        # insertion order so partial exports skip unannotated nodes and edges
+        self._node_annotations: Dict[str, Dict[str, None]] = {}
+        self._edge_annotations: Dict[Tuple[str, str], Dict[str, None]] = {}
+        # the value last written by a link annotation per link and attribute,
+        # later edge annotations may change some edges of the link
+        self._link_annotations: Dict[str, Dict[str, Any]] = {}
+        # every set_graph and annotation call is one write with its own
+        # version, a failed write uses up its version. The change log lists
+        # (version, kind, key, attribute) in ascending version order, it is
+        # appended to in place and shared with the snapshots, which read its
+        # first _change_count entries only. Compaction keeps the last entry
+        # of each (kind, key, attribute) in a new list.
+        self._graph_version = 0
+        self._base_graph_version = 0
+        self._last_version = 0
+        self._change_log: List[Tuple[int, str, Any, str]] = []
+        self._change_count = 0
+        self._compacted_count = 0
+        # serializes writes, it is reentrant so a server can
+        # hold it around several writes
+        self._lock = WriteLock()
+        # executor of the async methods, None uses the default executor of the event loop
+        self._executor: Optional[Executor] = None
+        # query_graph results shared with the snapshots, None disables caching
+        self._query_cache: Optional[QueryCache] = QueryCache()
+        # copy-on-write state, see _write: the containers the current write
+        # may modify by id, None outside a write or when the write builds
+        # new containers only, the top level containers carried over from
+        # the previous write while its snapshot was not handed out, the
+        # undo log of the in place changes to those, the live service and
+        # the read-only snapshot of the last write
+        self._owned: Optional[Dict[int, Any]] = None
+        self._carried: Dict[int, Any] = {}
+        self._undo: Optional[List[Tuple[Dict[Any, Any], Any, Any]]] = None
+        self._live = self
+        self._read_only = False
+        self._publish_lock = threading.Lock()
+        self._snapshot: Optional["InfraGraphService"] = None
+        self._publish()
 
     @property
     def infrastructure(self) -> Infrastructure:
         """Return the current backing store infrastructure"""
         return self._infrastructure
 
+    @property
+    def graph_version(self) -> int:
+        """Return the version of the last graph or annotation write"""
+        return self._graph_version
+
+    @property
+    def base_graph_version(self) -> int:
+        """Return the version of the last set_graph or restore_graph, annotations leave it unchanged"""
+        return self._base_graph_version
+
+    @property
+    def lock(self) -> WriteLock:
+        """Return the lock every write takes, reads take no lock"""
+        return self._live._lock
+
+    @property
+    def executor(self) -> Optional[Executor]:
+        """Return the executor of the async methods, None uses the default executor of the event loop"""
+        return self._live._executor
+
+    @executor.setter
+    def executor(self, executor: Optional[Executor]) -> None:
+        self._check_live()
+        self._executor = executor
+
+    @property
+    def query_cache(self) -> Optional[QueryCache]:
+        """Return the query_graph cache of the live service and its snapshots, None disables caching"""
+        return self._live._query_cache
+
+    @query_cache.setter
+    def query_cache(self, query_cache: Optional[QueryCache]) -> None:
+        self._check_live()
+        self._query_cache = query_cache
+
+    def _check_live(self) -> None:
+        if self._read_only:
+            raise GraphError("Graph snapshots are read-only")
+
+    def snapshot(self) -> "InfraGraphService":
+        """Return the read-only snapshot of the graph as of the last completed write.
+
+        Writes never modify a container that a returned snapshot refers to.
+        The first write after a snapshot was returned copies the node,
+        adjacency and annotation dicts it changes and shares everything
+        else with the snapshot, later writes modify those copies in place
+        until the next snapshot is returned, so consecutive writes without
+        a read in between copy once. A reader that pins a snapshot
+        therefore sees one consistent version for as long as it holds it,
+        while writes go on. Asking for a snapshot waits only for a write
+        that modifies containers in place. A write that raises leaves the
+        service at the previous snapshot. Snapshots support all reads,
+        e.g. query_graph, get_graph and iter_query_pages, writes raise a
+        GraphError. Snapshots use the executor and query_cache of the live
+        service.
+        """
+        if self._read_only:
+            return self
+        snapshot = self._snapshot
+        if not snapshot._handed:
+            with self._publish_lock:
+                snapshot = self._snapshot
+                snapshot._handed = True
+        return snapshot
+
+    def _publish(self):
+        snapshot = object.__new__(self.__class__)
+        snapshot.__dict__.update(
+            (name, value) for name, value in self.__dict__.items() if name not in self._LIVE_ATTRIBUTES
+        )
+        snapshot._live = self
+        snapshot._read_only = True
+        snapshot._snapshot = None
+        snapshot._handed = False
+        self._snapshot = snapshot
+
+    def _next_version(self) -> int:
+        """Start a new graph version, never reusing the version of a failed write"""
+        self._last_version += 1
+        self._graph_version = self._last_version
+        return self._graph_version
+
+    @contextmanager
+    def _write(self, fresh: bool = False):
+        """Run a write under the write lock as copy-on-write against the published snapshot.
+
+        A fresh write replaces the graph and maps with new containers and
+        skips the copy-on-write bookkeeping. Other writes copy the
+        containers shared with a snapshot that was handed out. The top
+        level containers the previous writes copied are modified in place
+        while their snapshot was not handed out, snapshot() waits for such
+        a write and the undo log restores them if it fails.
+        """
+        self._check_live()
+        with self._lock.write():
+            publish_lock = self._publish_lock
+            publish_lock.acquire()
+            if self._snapshot._handed:
+                self._carried = {}
+            # an in place write holds the publish lock so its snapshot is not handed out meanwhile
+            locked = not fresh and bool(self._carried)
+            if not locked:
+                publish_lock.release()
+            self._owned = None if fresh else dict(self._carried)
+            self._undo = []
+            try:
+                try:
+                    yield
+                except BaseException:
+                    self._rollback()
+                    raise
+                if not locked:
+                    publish_lock.acquire()
+                    locked = True
+                self._commit()
+            finally:
+                self._owned = None
+                self._undo = None
+                if locked:
+                    publish_lock.release()
+
+    def _rollback(self):
+        for table, key, value in reversed(self._undo):
+            if value is _MISSING:
+                del table[key]
+            else:
+                table[key] = value
+        self.__dict__.update(
+            (name, value) for name, value in self._snapshot.__dict__.items() if name not in self._LIVE_ATTRIBUTES
+        )
+        # entries appended by the failed write are beyond every snapshot
+        del self._change_log[self._change_count :]
+
+    def _commit(self):
+        change_log = self._change_log
+        if len(change_log) > 2 * self._compacted_count + self._CHANGE_LOG_SLACK:
+            latest = set()
+            kept = []
+            for entry in reversed(change_log):
+                change = entry[1:]
+                if change not in latest:
+                    latest.add(change)
+                    kept.append(entry)
+            kept.reverse()
+            change_log = self._change_log = kept
+            self._compacted_count = len(kept)
+        self._change_count = len(change_log)
+        graph = self._graph
+        self._carried = {
+            id(table): table
+            for table in (
+                graph._node,
+                graph._adj,
+                self._node_annotations,
+                self._edge_annotations,
+                self._link_annotations,
+            )
+            if self._owns(table)
+        }
+        self._publish()
+
+    def _own(self, container):
+        """Return a copy of a container that the current write may modify"""
+        owned = container.copy()
+        if self._owned is not None:
+            self._owned[id(owned)] = owned
+        return owned
+
+    def _owns(self, container) -> bool:
+        return self._owned is None or id(container) in self._owned
+
+    def _assign(self, table: Dict[Any, Any], key: Any, value: Any) -> None:
+        """Set a key of an owned top level dict, logging the old value if the published snapshot shares the dict"""
+        if id(table) in self._carried:
+            self._undo.append((table, key, table.get(key, _MISSING)))
+        table[key] = value
+
+    def _writable_graph(self, nodes: bool = False, adjacency: bool = False, attributes: bool = False) -> Graph:
+        """Return the graph for modification of its graph attributes, node dict or adjacency dict"""
+        graph = self._graph
+        copy_nodes = nodes and not self._owns(graph._node)
+        copy_adjacency = adjacency and not self._owns(graph._adj)
+        copy_attributes = attributes and not self._owns(graph.graph)
+        if not copy_nodes and not copy_adjacency and not copy_attributes:
+            return graph
+        # a new graph object so no cached networkx view refers to a replaced dict
+        owned = graph.__class__()
+        owned.graph = self._own(graph.graph) if copy_attributes else graph.graph
+        owned._node = self._own(graph._node) if copy_nodes else graph._node
+        owned._adj = self._own(graph._adj) if copy_adjacency else graph._adj
+        self._graph = owned
+        return owned
+
+    def _writable_node(self, node: str) -> Dict[str, Any]:
+        """Return the attribute dict of a node for modification, raises KeyError for a missing node"""
+        nodes = self._writable_graph(nodes=True)._node
+        data = nodes[node]
+        if not self._owns(data):
+            data = self._own(data)
+            self._assign(nodes, node, data)
+        return data
+
+    def _writable_edge(self, ep1: str, ep2: str) -> Dict[str, Any]:
+        """Return the attribute dict of an edge for modification, raises KeyError for a missing edge"""
+        adj = self._writable_graph(adjacency=True)._adj
+        data = adj[ep1][ep2]
+        if not self._owns(data):
+            data = self._own(data)
+            for src, dst in ((ep1, ep2), (ep2, ep1)):
+                neighbors = adj[src]
+                if not self._owns(neighbors):
+                    neighbors = self._own(neighbors)
+                    self._assign(adj, src, neighbors)
+                neighbors[dst] = data
+        return data
+
+    def _writable_table(self, name: str) -> Dict[Any, Any]:
+        """Return a dict attribute of the service for modification"""
+        table = getattr(self, name)
+        if not self._owns(table):
+            table = self._own(table)
+            setattr(self, name, table)
+        return table
+
     def get_openapi_schema(self) -> str:
         """Returns the InfraGraph openapi.yaml schema definition"""
         with open("docs/openapi.yaml", "rt", encoding="utf-8") as fp:
             return fp.read()
 
     def get_networkx_graph(self) -> Graph:
-        """Returns the current infrastructure as a networkx graph object."""
+        """Returns the current infrastructure as a networkx graph object.
+
+        The graph shares its dicts with the snapshots of earlier writes,
+        modify it through the annotation methods rather than in place.
+        """
         if self._graph is None:
             raise ValueError("The networkx graph has not been created. Please call set_graph() first.")
         return self._graph
@@ -294,21 +599,26 @@ class InfraGraphService(Api):
         """
 
         for device in self._infrastructure.devices:
-            # iterate the components and generate component-node information
-            dd = DeviceData()
-            for component in device.components:
-                for index in range(component.count):
-                    
-                    if component.choice == Component.CUSTOM:
-                        component_type = component.custom.type
-                    else:
-                        component_type = component.choice
-                    dd.nodes[component.name + "." + str(index)] = component_type
-                dd.components[component.name] = component.count
-            for link in device.links:
-                dd.links[link.name] = link
-            self._device_data[device.name] = dd
-            
+            self._parse_device(device)
+
+    def _parse_device(self, device: Device) -> DeviceData:
+        """Construct the DeviceData of one device, see _parse_device_components"""
+        # iterate the components and generate component-node information
+        dd = DeviceData()
+        for component in device.components:
+            for index in range(component.count):
+
+                if component.choice == Component.CUSTOM:
+                    component_type = component.custom.type
+                else:
+                    component_type = component.choice
+                dd.nodes[component.name + "." + str(index)] = component_type
+            dd.components[component.name] = component.count
+        for link in device.links:
+            dd.links[link.name] = link
+        self._device_data[device.name] = dd
+        return dd
+
     def _parse_device_edges(self):
         """
         Parse infrastructure devices and their edges.
@@ -322,60 +632,83 @@ class InfraGraphService(Api):
         instance for further processing.
         """
         for device in self._infrastructure.devices:
-            # iterate the devices and generate - expand edges
-            # expand edges here:
-            dd = self._device_data[device.name]
-            for edge in device.edges:
-                endpoints1 = self._expand_device_endpoint(device.name, edge.ep1)
-                endpoints2 = self._expand_device_endpoint(device.name, edge.ep2)
-                for src_eps, dst_eps in [(x, y) for x, y in zip(endpoints1, endpoints2)]:
-                    if edge.scheme == DeviceEdge.MANY2MANY:  # cartesion product
-                        for src, dst in [(x, y) for x in src_eps for y in dst_eps]:
-                            if src == dst:
-                                continue
-                            dd.add_edge(src, dst, edge.link)
-                            
-                    elif edge.scheme == DeviceEdge.ONE2ONE:  # meshed product
-                        for src, dst in [(x, y) for x, y in zip(src_eps, dst_eps)]:
-                            if src == dst:
-                                continue
-                            dd.add_edge(src, dst, edge.link)
-                    else:
-                        raise NotImplementedError(f"Edge creation scheme {edge.scheme} is not supported")
+            self._parse_edges_of_device(device)
+
+    def _parse_edges_of_device(self, device: Device):
+        """Expand the edges of one device into its DeviceData, see _parse_device_edges"""
+        # iterate the devices and generate - expand edges
+        # expand edges here:
+        dd = self._device_data[device.name]
+        for edge in device.edges:
+            endpoints1 = self._expand_device_endpoint(device.name, edge.ep1)
+            endpoints2 = self._expand_device_endpoint(device.name, edge.ep2)
+            for src_eps, dst_eps in [(x, y) for x, y in zip(endpoints1, endpoints2)]:
+                if edge.scheme == DeviceEdge.MANY2MANY:  # cartesion product
+                    for src, dst in [(x, y) for x in src_eps for y in dst_eps]:
+                        if src == dst:
+                            continue
+                        dd.add_edge(src, dst, edge.link)
 
-    def _parse_edge_instance(self, endpoint: InfrastructureEndpoint) -> Tuple[Instance, Device]:
+                elif edge.scheme == DeviceEdge.ONE2ONE:  # meshed product
+                    for src, dst in [(x, y) for x, y in zip(src_eps, dst_eps)]:
+                        if src == dst:
+                            continue
+                        dd.add_edge(src, dst, edge.link)
+                else:
+                    raise NotImplementedError(f"Edge creation scheme {edge.scheme} is not supported")
+
+    def _parse_edge_instance(
+        self, endpoint: InfrastructureEndpoint, instances: Optional[Dict[str, Instance]] = None
+    ) -> Tuple[Instance, Device]:
         """Given an infrastructure endpoint return the Instance and Device"""
         device_instance = endpoint.instance.split(".")[0] 
         instance_name = device_instance.split("[")[0]
-        for instance in self._infrastructure.instances:
-            if instance.name == instance_name:
-                return instance
+        if instances is not None:
+            if instance_name in instances:
+                return instances[instance_name]
+        else:
+            for instance in self._infrastructure.instances:
+                if instance.name == instance_name:
+                    return instance
         raise InfrastructureError(f"Instance '{instance_name}' does not exist in infrastructure instances")
 
     def _parse_infrastructure_edges(self):
         """
         This parses the global infrastructure edges and expands the instances and endpoints
+
+        Ranged edges, e.g. host[0:64] nic[0] <-> tier_0[0:4] port[0:16] as
+        written by edge_compression.compress_edges, expand to all their
+        endpoint pairs at once and are added to the graph in one batch.
         """
         infrastructure_links = {link.name: link for link in self._infrastructure.links}
-        for edge in self._infrastructure.edges:
-            instance1 = self._parse_edge_instance(edge.ep1)
+        instances = {instance.name: instance for instance in self._infrastructure.instances}
+        self._add_infrastructure_edges(self._infrastructure.edges, infrastructure_links, instances, {})
+
+    def _add_infrastructure_edges(
+        self,
+        edges: Iterable[InfrastructureEdge],
+        infrastructure_links: Dict[str, Link],
+        instances: Dict[str, Instance],
+        link_edge_attrs: Dict[str, Dict[str, Any]],
+    ):
+        """Expand infrastructure edges into the graph, link_edge_attrs caches the attributes per link"""
+        for edge in edges:
+            instance1 = self._parse_edge_instance(edge.ep1, instances)
             endpoints1 = self._expand_instance_endpoint(instance1, edge.ep1)
-            instance2 = self._parse_edge_instance(edge.ep2)
+            instance2 = self._parse_edge_instance(edge.ep2, instances)
             endpoints2 = self._expand_instance_endpoint(instance2, edge.ep2)
-            edge_attrs = self._link_edge_attrs(edge.link, infrastructure_links.get(edge.link))
-            for src_eps, dst_eps in [(x, y) for x, y in zip(endpoints1, endpoints2)]:
+            edge_attrs = link_edge_attrs.get(edge.link)
+            if edge_attrs is None:
+                edge_attrs = self._link_edge_attrs(edge.link, infrastructure_links.get(edge.link))
+                link_edge_attrs[edge.link] = edge_attrs
+            for src_eps, dst_eps in zip(endpoints1, endpoints2):
                 if edge.scheme == InfrastructureEdge.MANY2MANY:  # cartesion product
-                    for src, dst in [(x, y) for x in src_eps for y in dst_eps]:
-                        if src == dst:
-                            continue 
-                        self._graph.add_edge(src, dst, **edge_attrs)
+                    pairs = ((x, y) for x in src_eps for y in dst_eps if x != y)
                 elif edge.scheme == InfrastructureEdge.ONE2ONE:  # meshed product
-                    for src, dst in [(x, y) for x, y in zip(src_eps, dst_eps, strict=False)]:
-                        if src == dst:
-                            continue
-                        self._graph.add_edge(src, dst, **edge_attrs)
+                    pairs = ((x, y) for x, y in zip(src_eps, dst_eps) if x != y)
                 else:
                     raise NotImplementedError(f"Edge creation scheme {edge.scheme} is not supported")
+                self._graph.add_edges_from(pairs, **edge_attrs)
 
     def _link_edge_attrs(self, link_name: str, link_obj) -> Dict[str, Any]:
         """Build the edge attribute dict for a link.
@@ -596,19 +929,22 @@ class InfraGraphService(Api):
         interconnections.
         """
         for instance in self._infrastructure.instances:
-            # get the device name
-            device_name = instance.device
-            count = instance.count
-            instance_name = instance.name
-            for index in range(0, count):
-                # call the specific class
-                
-                instance_name = instance.name + "." + str(index)
-                # generate node and edges
-                self._generate_device_nodes(instance_name, device_name)
-                self._generate_device_edges(instance_name, device_name)
-            
-    def set_graph(self, payload: Union[str, Infrastructure]) -> None:
+            self._generate_instance(instance)
+
+    def _generate_instance(self, instance: Instance):
+        """Generate the nodes and edges of every index of one instance"""
+        # get the device name
+        device_name = instance.device
+        count = instance.count
+        for index in range(0, count):
+            # call the specific class
+
+            instance_name = instance.name + "." + str(index)
+            # generate node and edges
+            self._generate_device_nodes(instance_name, device_name)
+            self._generate_device_edges(instance_name, device_name)
+
+    def set_graph(self, payload: Union[str, Infrastructure], trusted: bool = False) -> None:
         """Generates a networkx graph, validates it and if there are no problems
         returns the networkx graph as a serialized json string.
 
@@ -618,11 +954,18 @@ class InfraGraphService(Api):
             allowing for a lookup using networkx.get_node_attributes(graph, 'xpu')
         - adds annotations as node attributes if applicable
             - if an annotation has an endpoint, the data is added to the node as attributes
+        - trusted payloads, e.g. written by infragraph itself, are decoded
+          without validation and the redundant graph validation passes are skipped
         """
+        with self._write(fresh=True):
+            self._set_graph(payload, trusted)
+
+    def _set_graph(self, payload: Union[str, Infrastructure], trusted: bool) -> None:
         if isinstance(payload, str):
-            self._infrastructure = Infrastructure().deserialize(payload)
+            self._infrastructure = load_infrastructure(payload, trusted=trusted)
         else:
             self._infrastructure = payload
+        self._device_data = {}
         # Initialize an empty graph, populate it with device and instance nodes, validate the resulting device edges and infrastructure edges, run final graph-wide validation, and then build the prefix and link lookup maps used for fast endpoint resolution.
         self._graph = Graph()
         if self._infrastructure.name:
@@ -631,11 +974,79 @@ class InfraGraphService(Api):
             self._graph.graph["description"] = self._infrastructure.description
         self._generate_device_data()
         self._generate_instance_data()
-        self._validate_device_edges()
+        if not trusted:
+            self._validate_device_edges()
         self._parse_infrastructure_edges()
-        self._validate_graph()
+        if not trusted:
+            self._validate_graph()
         self._build_prefix_map()
         self._build_link_map()
+        self._build_annotation_map()
+
+    def restore_graph(
+        self,
+        infrastructure: Infrastructure,
+        graph: Graph,
+        device_data: Optional[Dict[str, DeviceData]] = None,
+        link_annotations: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> None:
+        """Installs a networkx graph previously built by set_graph for infrastructure.
+
+        The infrastructure is not expanded or validated again, only the
+        lookup maps are rebuilt. Attributes outside _IMMUTABLE_ATTRIBUTES are
+        treated as annotations, as if written by annotate_graph. Link
+        annotations are not stored on the graph, they are passed as
+        link_annotations, link name to {attribute: value}.
+        """
+        with self._write(fresh=True):
+            self._infrastructure = infrastructure
+            self._graph = graph
+            self._device_data = device_data if device_data is not None else {}
+            self._build_prefix_map()
+            self._build_link_map()
+            self._build_annotation_map()
+            for link, attributes in (link_annotations or {}).items():
+                for attribute, value in attributes.items():
+                    self._record_link_annotation(link, attribute, value)
+
+    async def _arun(self, write: bool, name: str, *args, **kwargs):
+        """Run the named method in the executor, a write under the write lock, a read on the current snapshot.
+
+        The event loop keeps serving other tasks while a long set_graph
+        expansion or query scan runs in a worker thread, the write lock is
+        acquired in the worker so waiting never blocks the loop. Reads pin
+        the snapshot when they are called and run in parallel with each
+        other and with writes.
+        """
+        if not write:
+            method = getattr(self.snapshot(), name)
+            return await asyncio.get_running_loop().run_in_executor(self.executor, lambda: method(*args, **kwargs))
+
+        def run():
+            with self._lock.write():
+                return getattr(self, name)(*args, **kwargs)
+
+        return await asyncio.get_running_loop().run_in_executor(self.executor, run)
+
+    async def aset_graph(self, payload: Union[str, Infrastructure], trusted: bool = False) -> None:
+        """Asynchronous set_graph"""
+        await self._arun(True, "set_graph", payload, trusted=trusted)
+
+    async def aannotate_graph(self, payload: Union[str, Annotation]) -> None:
+        """Asynchronous annotate_graph"""
+        await self._arun(True, "annotate_graph", payload)
+
+    async def aquery_graph(self, payload: Union[str, QueryRequest]) -> QueryResponseContent:
+        """Asynchronous query_graph, concurrent queries run in parallel"""
+        return await self._arun(False, "query_graph", payload)
+
+    async def aget_graph(self, request: GraphRequest, encoding: str = "yaml") -> Union[str, bytes]:
+        """Asynchronous get_graph, concurrent requests run in parallel"""
+        return await self._arun(False, "get_graph", request, encoding)
+
+    async def abatch(self, payload: Union[str, Dict[str, Any], List[Any]]) -> List[Any]:
+        """Asynchronous batch, run under the write lock"""
+        return await self._arun(True, "batch", payload)
 
     def _validate_device_edges(self):
         """Ensure that there are no edges between device instances
@@ -669,89 +1080,200 @@ class InfraGraphService(Api):
             partial_graph.add_edge(ep1, ep2, **filtered)
         return partial_graph
 
-    def get_graph(self, request: GraphRequest) -> str:
-        """Returns the current networkx graph as a serialized json string."""
+    def get_graph(self, request: GraphRequest, encoding: str = "yaml") -> Union[str, bytes]:
+        """Returns the current networkx graph as a serialized json string.
+
+        A networkx request is serialized as node-link yaml by default, the
+        json, ndjson, binary and protobuf encodings of GraphWriter are
+        streamed straight from the graph and are much faster for large
+        graphs. The binary and protobuf encodings are returned as bytes.
+        """
         if self._graph is None:
             raise ValueError("The networkx graph has not been created. Please call set_graph() first.")
 
         if request.choice == request.INFRAGRAPH:
             return self.populate_infragraph_dict(self._graph, request.infragraph.annotations.choice)
 
+        if encoding != "yaml":
+            fp = io.BytesIO() if encoding in GraphWriter.BYTE_ENCODINGS else io.StringIO()
+            self.write_graph(request, fp, encoding)
+            return fp.getvalue()
         is_full = request.networkx.annotations.choice == "full"
         graph = self._graph if is_full else self._build_partial_graph()
         return yaml.dump(json_graph.node_link_data(graph, edges="edges"))
 
-    def populate_infragraph_dict(self, source_graph, attr_type):
-        infragraph_dict = {
-            "infrastructure": self._infrastructure.serialize('dict'),
-            "annotations": {}
-        }
+    def write_graph(self, request: GraphRequest, fp, encoding: str = GraphWriter.JSON) -> None:
+        """Streams the networkx graph to a file object without building the node-link document.
+
+        fp must be a text file for the json and ndjson encodings and a
+        binary file for the binary and protobuf encodings.
+        """
+        self._graph_writer(request).write(fp, encoding)
+
+    def dump_graph(self, request: GraphRequest, path: str) -> None:
+        """Writes the get_graph output for request to a file.
+
+        The encoding follows the file extension: .yaml or .yml for the
+        node-link yaml, otherwise one of GraphWriter.EXTENSIONS. Infragraph
+        requests are written as .json. A trailing compression extension such
+        as .gz or .zst compresses the output while it is streamed.
+        """
+        extension = format_extension(path)
+        if request.choice == request.INFRAGRAPH:
+            if extension != "json":
+                raise ValueError(f"Infragraph documents are written as json, not {extension}")
+            with open_file(path, "wt") as fp:
+                self.write_infragraph(fp, request.infragraph.annotations.choice)
+        elif extension in ("yaml", "yml"):
+            with open_file(path, "wt") as fp:
+                fp.write(self.get_graph(request))
+        else:
+            encoding = GraphWriter.EXTENSIONS.get(extension)
+            if encoding is None:
+                raise ValueError(f"Cannot infer the graph encoding of {path}")
+            with open_file(path, "wb" if encoding in GraphWriter.BYTE_ENCODINGS else "wt") as fp:
+                self.write_graph(request, fp, encoding)
+
+    def iter_graph_chunks(self, request: GraphRequest, chunk_size: int = 1 << 16) -> "Iterator[graph_pb2.GraphChunk]":
+        """Yields the networkx graph as protobuf GraphChunk messages of at most chunk_size nodes and edges"""
+        return self._graph_writer(request).iter_protobuf_chunks(chunk_size)
+
+    def _graph_writer(self, request: GraphRequest) -> GraphWriter:
+        if self._graph is None:
+            raise ValueError("The networkx graph has not been created. Please call set_graph() first.")
+        is_full = request.networkx.annotations.choice == "full"
+        exclude = () if is_full else self._IMMUTABLE_ATTRIBUTES
+        return GraphWriter(self._graph, exclude=exclude)
 
+    def populate_infragraph_dict(self, source_graph, attr_type):
+        """Returns the infrastructure and its annotations as a json string"""
+        return "".join(self.iter_infragraph_json(attr_type, source_graph))
+
+    def write_infragraph(self, fp, attr_type: str = "full") -> None:
+        """Streams the infragraph json document to a text file object or socket file"""
+        for fragment in self.iter_infragraph_json(attr_type):
+            fp.write(fragment)
+
+    def iter_infragraph_json(self, attr_type: str = "full", source_graph: Optional[Graph] = None) -> Iterator[str]:
+        """Yields the infragraph json document as a sequence of fragments.
+
+        The infrastructure comes first, followed by the nodes, edges, links
+        and graph annotations, one annotation per fragment, so the document
+        never has to be held in memory as a whole.
+
+        In partial mode only the nodes and edges written by annotate_graph
+        are visited, their attribute names are recorded at annotation time
+        so no attribute is filtered here. Attributes set directly on the
+        networkx graph are only exported in full mode. With a source_graph
+        other than the graph of the service, annotated nodes, edges and
+        attributes it does not have are skipped.
+        """
+        graph = self._graph if source_graph is None else source_graph
         is_full = attr_type == "full"
+        dumps = json.JSONEncoder(separators=(",", ":")).encode
 
-        def node_attrs_filter(attrs):
-            return attrs.items() if is_full else (
-                (k, v) for k, v in attrs.items()
-                if k not in self._IMMUTABLE_ATTRIBUTES
-            )
+        stringify = self._stringify
 
-        def edge_attrs_filter(attrs):
-            return attrs.items() if is_full else (
-                (k, v) for k, v in attrs.items()
-                if k not in self._IMMUTABLE_ATTRIBUTES
+        def attributes(attrs, names):
+            return [{"attribute": k, "value": stringify(attrs[k])} for k in names if k in attrs]
+
+        if is_full:
+            nodes = ((name, attrs, attrs) for name, attrs in graph.nodes(data=True) if attrs)
+            edges = ((ep1, ep2, attrs, attrs) for ep1, ep2, attrs in graph.edges(data=True) if attrs)
+        else:
+            node_data = graph.nodes
+            nodes = (
+                (name, node_data[name], names) for name, names in self._node_annotations.items() if name in node_data
             )
+            edges = (
+                (ep1, ep2, graph[ep1][ep2], names)
+                for (ep1, ep2), names in self._edge_annotations.items()
+                if graph.has_edge(ep1, ep2)
+            )
+
+        yield '{"infrastructure":'
+        yield dumps(self._infrastructure.serialize("dict"))
+        yield ',"annotations":{"nodes":['
+        separator = ""
+        for name, attrs, names in nodes:
+            yield separator + dumps({"name": name, "attributes": attributes(attrs, names)})
+            separator = ","
 
-        def stringify(v):
-            # AnnotationAttribute.value is schema-typed as str; non-str attribute
-            # values (e.g. the immutable int "instance_idx") must be coerced so
-            # the resulting annotations can be deserialized back into an Annotation.
-            return v if isinstance(v, str) else str(v)
-
-        annotation_nodes = [
-            {
-                "name": node_name,
-                "attributes": [
-                    {"attribute": k, "value": stringify(v)}
-                    for k, v in node_attrs_filter(node_attrs)
-                ]
-            }
-            for node_name, node_attrs in source_graph.nodes(data=True)
-            if node_attrs
-        ]
-
-        annotation_edges = []
+        yield '],"edges":['
+        separator = ""
         seen_links = {}
-        for ep1, ep2, edge_attrs in source_graph.edges(data=True):
-            if not edge_attrs:
-                continue
-            filtered = list(edge_attrs_filter(edge_attrs))
-            annotation_edges.append({
-                "ep1": ep1,
-                "ep2": ep2,
-                "attributes": [{"attribute": k, "value": stringify(v)} for k, v in filtered]
-            })
-            link_name = edge_attrs.get("link")
+        for ep1, ep2, attrs, names in edges:
+            edge_attributes = attributes(attrs, names)
+            yield separator + dumps({"ep1": ep1, "ep2": ep2, "attributes": edge_attributes})
+            separator = ","
+            link_name = attrs.get("link")
             if link_name and link_name not in seen_links:
-                seen_links[link_name] = {
-                    "name": link_name,
-                    "attributes": [{"attribute": k, "value": stringify(v)} for k, v in filtered]
-                }
-
-        graph_attrs = source_graph.graph
-        annotation_graph = [
-            {"attribute": k, "value": stringify(v)}
-            for k, v in graph_attrs.items()
-            if is_full or k not in self._IMMUTABLE_ATTRIBUTES
-        ]
-
-        infragraph_dict["annotations"] = {
-            "nodes": annotation_nodes,
-            "edges": annotation_edges,
-            "links": list(seen_links.values()),
-            "graph": annotation_graph
-        }
+                seen_links[link_name] = {"name": link_name, "attributes": edge_attributes}
+
+        yield '],"links":['
+        yield ",".join(dumps(link) for link in seen_links.values())
+        yield '],"graph":'
+        yield dumps(
+            [
+                {"attribute": k, "value": stringify(v)}
+                for k, v in graph.graph.items()
+                if is_full or k not in self._IMMUTABLE_ATTRIBUTES
+            ]
+        )
+        yield "}}"
 
-        return json.dumps(infragraph_dict, indent=2)
+    @staticmethod
+    def _stringify(v: Any) -> str:
+        # AnnotationAttribute.value is schema-typed as str; non-str attribute
+        # values (e.g. the immutable int "instance_idx") must be coerced so
+        # the resulting annotations can be deserialized back into an Annotation.
+        return v if isinstance(v, str) else str(v)
+
+    def get_annotation_delta(self, since: int) -> str:
+        """Returns the annotations written after version since as a json string.
+
+        The document holds the current version, to pass as since on the next
+        call, a reset flag and the changed nodes, edges, links and graph
+        attributes with their current values in the infragraph annotations
+        layout. Only the change log entries newer than since are visited.
+
+        reset is true when since predates the last set_graph, the delta then
+        holds every annotation of the new graph and the caller should drop
+        what it had.
+        """
+        changes: Dict[str, Dict[Any, Dict[str, None]]] = {"nodes": {}, "edges": {}, "links": {}, "graph": {}}
+        for version, kind, key, attribute in self._iter_changes():
+            if version <= since:
+                break
+            changes[kind].setdefault(key, {}).setdefault(attribute)
+
+        stringify = self._stringify
+        graph = self._graph
+        links = self._link_annotations
+
+        def attributes(attrs, names):
+            return [{"attribute": k, "value": stringify(attrs[k])} for k in reversed(names)]
+
+        # keys were collected newest first, report them in write order
+        annotations = {
+            "nodes": [
+                {"name": node, "attributes": attributes(graph.nodes[node], names)}
+                for node, names in reversed(changes["nodes"].items())
+            ],
+            "edges": [
+                {"ep1": ep1, "ep2": ep2, "attributes": attributes(graph[ep1][ep2], names)}
+                for (ep1, ep2), names in reversed(changes["edges"].items())
+            ],
+            "links": [
+                {"name": link, "attributes": attributes(links[link], names)}
+                for link, names in reversed(changes["links"].items())
+            ],
+            "graph": attributes(graph.graph, changes["graph"].get(None, [])),
+        }
+        return json.dumps(
+            {"version": self._graph_version, "reset": since < self._base_graph_version, "annotations": annotations},
+            separators=(",", ":"),
+        )
 
     def get_shortest_path(self, endpoint1: str, endpoint2: str) -> list[str]:
         """Returns the shortest path between two endpoints in the graph."""
@@ -828,6 +1350,7 @@ class InfraGraphService(Api):
         (e.g. "dgx.0") to all of its descendants in the graph.
         """
 
+        self._graph_node_prefix_map = {}
         for node in self._graph.nodes:
             parts = node.split(".")
             for i in range(1, len(parts) + 1):
@@ -848,13 +1371,99 @@ class InfraGraphService(Api):
             if link_name is not None:
                 self._link_to_edges_map.setdefault(link_name, []).append((ep1, ep2))
 
+    def _build_annotation_map(self):
+        """Record the mutable attributes already present on the graph.
+
+        Link physical properties such as bandwidth are mutable edge
+        attributes from the start, later annotate_graph calls add to the
+        same maps.
+        """
+        self._node_annotations = {}
+        self._edge_annotations = {}
+        self._link_annotations = {}
+        self._change_log = []
+        self._change_count = 0
+        self._compacted_count = 0
+        self._base_graph_version = self._next_version()
+        for node, data in self._graph.nodes(data=True):
+            for k in data:
+                if k not in self._IMMUTABLE_ATTRIBUTES:
+                    self._record_node_annotation(node, k)
+        for ep1, ep2, data in self._graph.edges(data=True):
+            for k in data:
+                if k not in self._IMMUTABLE_ATTRIBUTES:
+                    self._record_edge_annotation(ep1, ep2, k)
+        for k in self._graph.graph:
+            if k not in self._IMMUTABLE_ATTRIBUTES:
+                self._log_change("graph", None, k)
+
+    def _log_change(self, kind: str, key: Any, attribute: str):
+        self._change_log.append((self._graph_version, kind, key, attribute))
+
+    def _iter_changes(self) -> Iterator[Tuple[int, str, Any, str]]:
+        """Yield the (version, kind, key, attribute) changes of this version newest first, a change may repeat"""
+        change_log = self._change_log
+        for index in range(self._change_count - 1, -1, -1):
+            yield change_log[index]
+
+    def _record_annotations(self, table: str, kind: str, keys: Iterable[Any], attribute: str):
+        """Record attribute as written for many nodes or normalized edges, see _record_node_annotation"""
+        annotations = self._writable_table(table)
+        append = self._change_log.append
+        version = self._graph_version
+        for key in keys:
+            attributes = annotations.get(key)
+            if attributes is None or attribute not in attributes:
+                if attributes is None or not self._owns(attributes):
+                    attributes = self._own(attributes or {})
+                    self._assign(annotations, key, attributes)
+                attributes[attribute] = None
+            append((version, kind, key, attribute))
+
+    def _record_node_annotation(self, node: str, attribute: str):
+        self._record_annotations("_node_annotations", "nodes", (node,), attribute)
+
+    def _record_edge_annotation(self, ep1: str, ep2: str, attribute: str):
+        key = (ep1, ep2) if ep1 <= ep2 else (ep2, ep1)
+        self._record_annotations("_edge_annotations", "edges", (key,), attribute)
+
+    def _record_link_annotation(self, link: str, attribute: str, value: Any):
+        links = self._writable_table("_link_annotations")
+        attributes = links.get(link)
+        if attributes is None or not self._owns(attributes):
+            attributes = self._own(attributes or {})
+            self._assign(links, link, attributes)
+        attributes[attribute] = value
+        self._log_change("links", link, attribute)
+
     def annotate_graph(self, payload: Union[str, Annotation]):
         """Annotation the graph using the data provided in the payload"""
         if isinstance(payload, str):
             annotate_request = Annotation().deserialize(payload)
         else:
             annotate_request: Annotation = payload
-        
+        with self._write():
+            self._annotate_graph(annotate_request)
+
+    def annotate_batches(self, batches: Iterable[Annotation]) -> None:
+        """Apply Annotation batches as one write, each batch as soon as the iterable yields it.
+
+        Only the batch being applied is held in memory, the changes are
+        staged copy-on-write and published as one snapshot after the last
+        batch. If a batch or the iterable itself raises none of the batches
+        is applied. The write lock is held while the iterable produces the
+        batches, so a slow producer delays other writes but not reads.
+        """
+        with self._write():
+            for index, batch in enumerate(batches):
+                try:
+                    self._annotate_graph(batch)
+                except Exception as error:
+                    raise GraphError(f"Annotation batch {index} failed: {error}") from error
+
+    def _annotate_graph(self, annotate_request: Annotation):
+        self._next_version()
+
         for annotation_node in annotate_request.nodes:
             # expand the nodes
             nodes = self._expand_node_string(annotation_node.name)
@@ -867,7 +1476,9 @@ class InfraGraphService(Api):
                     raise ValueError(f"{node} not present in networx graph")
             for attribute_kvp in annotation_node.attributes:
                 if attribute_kvp.attribute not in self._IMMUTABLE_ATTRIBUTES:
-                    networkx.set_node_attributes(self._graph, {n: {attribute_kvp.attribute: attribute_kvp.value} for n in matched})
+                    for n in matched:
+                        self._writable_node(n)[attribute_kvp.attribute] = attribute_kvp.value
+                    self._record_annotations("_node_annotations", "nodes", matched, attribute_kvp.attribute)
                 else:
                     warnings.warn(f"Skipping immutable attribute {attribute_kvp.attribute} for {annotation_node.name}")
             
@@ -887,7 +1498,9 @@ class InfraGraphService(Api):
 
             for attribute_kvp in annotation_node.attributes:
                 if attribute_kvp.attribute not in self._IMMUTABLE_ATTRIBUTES:
-                    networkx.set_edge_attributes(self._graph, {(u, v): {attribute_kvp.attribute: attribute_kvp.value} for u, v in matched_edges})
+                    for u, v in matched_edges:
+                        self._writable_edge(u, v)[attribute_kvp.attribute] = attribute_kvp.value
+                        self._record_edge_annotation(u, v, attribute_kvp.attribute)
                 else:
                     warnings.warn(f"Skipping immutable attribute {attribute_kvp.attribute} for edge")
                     
@@ -900,62 +1513,346 @@ class InfraGraphService(Api):
                     warnings.warn(f"Skipping immutable attribute {link_annotation.attribute} for {annotation_link.name}")
                     continue
                 for ep1, ep2 in edges_for_link:
-                    self._graph[ep1][ep2][link_annotation.attribute] = link_annotation.value
+                    self._writable_edge(ep1, ep2)[link_annotation.attribute] = link_annotation.value
+                    self._record_edge_annotation(ep1, ep2, link_annotation.attribute)
+                if edges_for_link:
+                    self._record_link_annotation(annotation_link.name, link_annotation.attribute, link_annotation.value)
 
         # graph
         for attribute_kvp in annotate_request.graph:
             if attribute_kvp.attribute in self._IMMUTABLE_ATTRIBUTES:
                 warnings.warn(f"Skipping immutable attribute {attribute_kvp.attribute} for graph")
                 continue
-            self._graph.graph[attribute_kvp.attribute] = attribute_kvp.value
+            self._writable_graph(attributes=True).graph[attribute_kvp.attribute] = attribute_kvp.value
+            self._log_change("graph", None, attribute_kvp.attribute)
+
+    def annotate_nodes(self, attribute: str, values: Dict[str, Any]) -> None:
+        """Bulk annotation of fully qualified node names with one attribute.
+
+        Unlike annotate_graph node names are not expanded, which makes this
+        the fast path for applying a table of per node values.
+        """
+        if attribute in self._IMMUTABLE_ATTRIBUTES:
+            warnings.warn(f"Skipping immutable attribute {attribute} for nodes")
+            return
+        with self._write():
+            self._next_version()
+            nodes = self._writable_graph(nodes=True)._node
+            owned = self._owned
+            # _assign inlined for the bulk path
+            undo = self._undo if id(nodes) in self._carried else None
+            for node, value in values.items():
+                data = nodes.get(node)
+                if data is None:
+                    raise ValueError(f"{node} not present in networx graph")
+                if owned is not None and id(data) not in owned:
+                    if undo is not None:
+                        undo.append((nodes, node, data))
+                    data = nodes[node] = self._own(data)
+                data[attribute] = value
+            self._record_annotations("_node_annotations", "nodes", values, attribute)
+
+    def annotate_edges(self, attribute: str, values: Dict[Tuple[str, str], Any]) -> None:
+        """Bulk annotation of (ep1, ep2) edges with one attribute"""
+        if attribute in self._IMMUTABLE_ATTRIBUTES:
+            warnings.warn(f"Skipping immutable attribute {attribute} for edges")
+            return
+        with self._write():
+            self._next_version()
+            adj = self._writable_graph(adjacency=True)._adj
+            owned = self._owned
+            undo = self._undo if id(adj) in self._carried else None
+            for (ep1, ep2), value in values.items():
+                neighbors = adj.get(ep1)
+                if neighbors is None or ep2 not in neighbors:
+                    raise ValueError(f"Edge {ep1} - {ep2} not present in networx graph")
+                data = neighbors[ep2]
+                if owned is not None and id(data) not in owned:
+                    # _writable_edge inlined for the bulk path
+                    data = self._own(data)
+                    for src, dst in ((ep1, ep2), (ep2, ep1)):
+                        neighbors = adj[src]
+                        if id(neighbors) not in owned:
+                            if undo is not None:
+                                undo.append((adj, src, neighbors))
+                            neighbors = adj[src] = self._own(neighbors)
+                        neighbors[dst] = data
+                data[attribute] = value
+            self._record_annotations(
+                "_edge_annotations", "edges", ((ep1, ep2) if ep1 <= ep2 else (ep2, ep1) for ep1, ep2 in values), attribute
+            )
+
+    # a cached query result is dropped rather than validated when more
+    # changes than this were logged since it was computed
+    _QUERY_CACHE_SCAN_LIMIT = 1 << 16
 
     def query_graph(self, payload: Union[str, QueryRequest]) -> QueryResponseContent:
-        """Query the graph"""
-        if isinstance(payload, str):
-            query_request = QueryRequest().deserialize(payload)
+        """Query the graph.
+
+        Results are cached in the query_cache of the live service, see
+        infragraph.query_cache, and shared between callers, treat them as
+        read-only. A snapshot reads the cache when it is queried, so setting
+        query_cache to None disables caching for every snapshot as well.
+        """
+        query_request = self._load_query_request(payload)
+        cache = self.query_cache
+        if cache is None:
+            return self._query_graph(query_request, [])
+        key = query_key(query_request)
+        entry = cache.get(key)
+        if entry is not None:
+            if self._query_cache_entry_valid(entry):
+                cache.hit()
+                return entry.content
+            cache.miss(invalidated=True)
         else:
-            query_request: QueryRequest = payload
+            cache.miss()
+        node_ids: List[str] = []
+        query_response_content = self._query_graph(query_request, node_ids)
+        cache.put(
+            key,
+            QueryCacheEntry(
+                query_response_content,
+                self._graph_version,
+                self._base_graph_version,
+                frozenset(node_ids),
+                query_attributes(query_request),
+            ),
+        )
+        return query_response_content
+
+    def _query_graph(self, query_request: QueryRequest, node_ids: List[str]) -> QueryResponseContent:
         query_response_content = QueryResponseContent()
-        if query_request.choice == QueryRequest.NODE_FILTERS:
-            node_matches = self._graph.nodes(data=True)
-            for node_filter in query_request.node_filters:
-                if node_filter.choice == QueryNodeFilter.ID_FILTER:
-                    node_matches = self._node_id_filter(node_matches, node_filter.id_filter)  # type: ignore
-                elif node_filter.choice == QueryNodeFilter.ATTRIBUTE_FILTER:
-                    node_matches = self._attribute_filter(node_matches, node_filter.attribute_filter)  # type: ignore
-                else:
-                    raise InfrastructureError(f"Invalid node query filter {node_filter.choice}")
-            for node in node_matches:
-                match = query_response_content.node_matches.add()
-                match.id = node[0]
-                for k, v in node[1].items():
-                    match.attributes.add(name=k, value=v if isinstance(v, str) else str(v))
-            return query_response_content
-        else:
+        for node in self._iter_node_matches(query_request, self._graph.nodes(data=True)):
+            self._add_node_match(query_response_content, node)
+            node_ids.append(node[0])
+        return query_response_content
+
+    def _query_cache_entry_valid(self, entry: QueryCacheEntry) -> bool:
+        """Return whether no write since the entry was computed changed its result.
+
+        Only node writes are relevant. A write to a matched node changes
+        the attributes in the result, a write to a filtered attribute may
+        change which nodes match. A valid entry is moved up to the current
+        version so the next lookup scans only newer changes.
+        """
+        if entry.base_version != self._base_graph_version or entry.version > self._graph_version:
+            return False
+        if entry.version == self._graph_version:
+            return True
+        node_ids = entry.node_ids
+        attributes = entry.attributes
+        for scanned, (version, kind, key, attribute) in enumerate(self._iter_changes()):
+            if version <= entry.version:
+                break
+            if scanned == self._QUERY_CACHE_SCAN_LIMIT:
+                return False
+            if kind == "nodes" and (key in node_ids or attribute in attributes):
+                return False
+        entry.version = self._graph_version
+        return True
+
+    BATCH_OPERATIONS = ("annotate", "query", "shortest_path")
+
+    @classmethod
+    def load_batch(cls, payload: Union[str, Dict[str, Any], List[Any]]) -> List[Tuple[str, Any]]:
+        """Decode the operations of a batch into (operation, request) pairs.
+
+        The payload is a json string or its decoded form, either a list of
+        operations or an object holding it under "operations". Every
+        operation is an object with one key:
+        - annotate: an Annotation
+        - query: a QueryRequest
+        - shortest_path: an object with the endpoints ep1 and ep2
+        Requests may also be given as Annotation and QueryRequest objects
+        and shortest paths as (ep1, ep2) pairs.
+        """
+        if isinstance(payload, str):
+            payload = json.loads(payload)
+        if isinstance(payload, dict):
+            payload = payload.get("operations", [])
+        if not isinstance(payload, list):
+            raise ValueError("A batch must be a list of operations")
+        operations = []
+        for index, operation in enumerate(payload):
+            if not isinstance(operation, dict) or len(operation) != 1:
+                raise ValueError(f"Batch operation {index} must be an object with one of the keys {cls.BATCH_OPERATIONS}")
+            (kind, request), = operation.items()
+            if kind == "annotate":
+                request = request if isinstance(request, Annotation) else Annotation().deserialize(request)
+            elif kind == "query":
+                request = request if isinstance(request, QueryRequest) else QueryRequest().deserialize(request)
+            elif kind == "shortest_path":
+                request = (request["ep1"], request["ep2"]) if isinstance(request, dict) else tuple(request)
+                if len(request) != 2:
+                    raise ValueError(f"Batch operation {index} shortest_path needs two endpoints")
+            else:
+                raise ValueError(f"Batch operation {index} {kind} is not one of {cls.BATCH_OPERATIONS}")
+            operations.append((kind, request))
+        return operations
+
+    def batch(self, payload: Union[str, Dict[str, Any], List[Any]]) -> List[Any]:
+        """Run the operations of a batch in order as one write and return their results.
+
+        See load_batch for the payload, which may also be the operations
+        returned by load_batch, e.g. decoded before taking a lock. The
+        results are in the order of the operations, None for annotate, a
+        QueryResponseContent for query and the list of nodes for
+        shortest_path. Every operation sees the annotations of the
+        operations before it, the batch is published as one snapshot, and
+        if an operation fails none of the batch is applied and a GraphError
+        naming the operation is raised. Queries in a batch bypass
+        query_cache.
+        """
+        operations = payload if self._is_loaded_batch(payload) else self.load_batch(payload)
+        results: List[Any] = []
+        with self._write():
+            for index, (kind, request) in enumerate(operations):
+                try:
+                    if kind == "annotate":
+                        self._annotate_graph(request)
+                        results.append(None)
+                    elif kind == "query":
+                        results.append(self._query_graph(request, []))
+                    else:
+                        results.append(self.get_shortest_path(*request))
+                except Exception as error:
+                    raise GraphError(f"Batch operation {index} {kind} failed: {error}") from error
+        return results
+
+    @staticmethod
+    def _is_loaded_batch(payload) -> bool:
+        return isinstance(payload, list) and all(isinstance(operation, tuple) for operation in payload)
+
+    def iter_query_pages(
+        self, payload: Union[str, QueryRequest], page_size: int = 1024, cursor: Optional[str] = None
+    ) -> Iterator[Tuple[QueryResponseContent, Optional[str]]]:
+        """Yields the query_graph matches in pages of at most page_size node matches.
+
+        Every page comes with the cursor of the next page, None after the
+        last page. Passing a cursor resumes the scan at that page, cursors
+        hold a hash of their query and a ValueError is raised for a cursor
+        of another query. Nodes are filtered while the graph is scanned so
+        only one page is held in memory. A write to the graph invalidates
+        the pages still to come and their cursors, reading on raises a
+        GraphError.
+        """
+        query_request = self._load_query_request(payload)
+        key = query_key(query_request)
+        version, start = self._decode_cursor(cursor, key)
+        nodes = self._graph.nodes(data=True)
+        position = start
+
+        def scan():
+            nonlocal position
+            for node in islice(nodes, start, None):
+                position += 1
+                yield node
+
+        page = QueryResponseContent()
+        count = 0
+        for node in self._iter_node_matches(query_request, scan()):
+            if count == page_size:
+                yield page, self._encode_cursor(version, position - 1, key)
+                self._check_cursor_version(version)
+                page = QueryResponseContent()
+                count = 0
+            self._add_node_match(page, node)
+            count += 1
+        yield page, None
+
+    def iter_graph_pages(
+        self, request: GraphRequest, page_size: int = 1 << 14, cursor: Optional[str] = None
+    ) -> "Iterator[Tuple[graph_pb2.GraphChunk, Optional[str]]]":
+        """Yields the networkx graph as self-contained GraphChunk pages of at most page_size nodes and edges.
+
+        Every page comes with the cursor of the next page, None after the
+        last page, see GraphWriter.iter_protobuf_pages and iter_query_pages.
+        """
+        key = self._graph_request_key(request)
+        version, start = self._decode_cursor(cursor, key)
+        total = self._graph.number_of_nodes() + self._graph.number_of_edges()
+        for position, chunk in self._graph_writer(request).iter_protobuf_pages(page_size, start):
+            yield chunk, self._encode_cursor(version, position, key) if position < total else None
+            self._check_cursor_version(version)
+
+    @staticmethod
+    def _graph_request_key(request: GraphRequest) -> str:
+        encoded = json.dumps(request.serialize("dict"), sort_keys=True).encode("utf-8")
+        return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+    def _encode_cursor(self, version: int, position: int, key: str) -> str:
+        return f"{version}.{position}.{key}"
+
+    def _decode_cursor(self, cursor: Optional[str], key: str) -> Tuple[int, int]:
+        """Return the graph version and scan position of a page cursor, the start of the current graph for None.
+
+        key is the hash of the request being paged, a cursor of another
+        request raises a ValueError.
+        """
+        if not cursor:
+            return self._graph_version, 0
+        try:
+            version, position, cursor_key = cursor.split(".")
+            version, position = int(version), int(position)
+        except ValueError:
+            raise ValueError(f"Invalid page cursor {cursor}")
+        if cursor_key != key:
+            raise ValueError(f"Page cursor {cursor} belongs to another request")
+        self._check_cursor_version(version)
+        return version, position
+
+    def _check_cursor_version(self, version: int) -> None:
+        if version != self._graph_version:
+            raise GraphError(
+                f"The graph changed from version {version} to {self._graph_version} while paging, restart without a cursor"
+            )
+
+    @staticmethod
+    def _load_query_request(payload: Union[str, QueryRequest]) -> QueryRequest:
+        if isinstance(payload, str):
+            return QueryRequest().deserialize(payload)
+        return payload
+
+    def _iter_node_matches(self, query_request: QueryRequest, nodes: Iterable[Any]) -> Iterator[Any]:
+        """Chain the node filters of a query lazily over (node, data) tuples"""
+        if query_request.choice != QueryRequest.NODE_FILTERS:
             raise NotImplementedError("Query edges not implemented")
+        node_matches = nodes
+        for node_filter in query_request.node_filters:
+            if node_filter.choice == QueryNodeFilter.ID_FILTER:
+                node_matches = self._node_id_filter(node_matches, node_filter.id_filter)  # type: ignore
+            elif node_filter.choice == QueryNodeFilter.ATTRIBUTE_FILTER:
+                node_matches = self._attribute_filter(node_matches, node_filter.attribute_filter)  # type: ignore
+            else:
+                raise InfrastructureError(f"Invalid node query filter {node_filter.choice}")
+        return iter(node_matches)
+
+    @staticmethod
+    def _add_node_match(query_response_content: QueryResponseContent, node: Tuple[str, Dict[str, Any]]) -> None:
+        match = query_response_content.node_matches.add()
+        match.id = node[0]
+        for k, v in node[1].items():
+            match.attributes.add(name=k, value=v if isinstance(v, str) else str(v))
 
-    def _node_id_filter(self, nodes: List[Any], query: QueryNodeId) -> List[Any]:
-        results = []
+    def _node_id_filter(self, nodes: Iterable[Any], query: QueryNodeId) -> Iterator[Any]:
         for node in nodes:
             id = node[0]
             if query.operator == QueryNodeId.EQ and query.value == id:
-                results.append(node)
+                yield node
             elif query.operator == QueryNodeId.CONTAINS and query.value in id:
-                results.append(node)
+                yield node
             elif query.operator == QueryNodeId.REGEX and re.match(query.value, id) is not None:
-                results.append(node)
-        return results
+                yield node
 
-    def _attribute_filter(self, nodes: List[Any], query: QueryAttribute) -> List[Any]:
-        results = []
+    def _attribute_filter(self, nodes: Iterable[Any], query: QueryAttribute) -> Iterator[Any]:
         for node in nodes:
             for k, v in node[1].items():
                 if k != query.name:
                     continue
                 if query.operator == QueryNodeId.EQ and query.value == v:
-                    results.append(node)
+                    yield node
                 elif query.operator == QueryNodeId.CONTAINS and query.value in v:
-                    results.append(node)
+                    yield node
                 elif query.operator == QueryNodeId.REGEX and re.match(query.value, v) is not None:
-                    results.append(node)
-        return results
\ No newline at end of file
+                    yield node
\ No newline at end of file
@@ -0,0 +1,192 @@
+"""
+Fast load path for large Infrastructure payloads.
+
+Infrastructure().deserialize(str) parses the payload with the pure Python
+PyYAML loader and then decodes every property through the generated
+setters, which validate each value and look up choices with dir(). For
+fabric files with tens of thousands of edges this costs far more than
+building the graph.
+
+load_infrastructure instead:
+- parses json payloads with the json module and yaml payloads with the
+  libyaml based CSafeLoader when PyYAML was built with it
+- for trusted payloads, e.g. files written by infragraph itself, fills
+  the generated objects directly from the parsed dict without the
+  per property validation
+Untrusted payloads are still decoded and validated by the generated SDK.
+For a 6 MB json fat tree with 24k edges the generated deserialize takes
+32 s from the string and 8 s from the parsed dict, the trusted path 0.5 s.
+
+The trusted decoder mirrors private internals of the SDK generated by
+openapiart, see _GeneratedSdk. An SDK regenerated with different
+internals is detected by its fingerprint and trusted payloads are then
+validated like untrusted ones.
+
+Example:
+    with open("fabric.yaml") as fp:
+        infrastructure = load_infrastructure(fp.read(), trusted=True)
+"""
+
+import hashlib
+import inspect
+import json
+import logging
+from typing import Any, Dict, Optional, Tuple, Type, Union
+import yaml
+from infragraph import Infrastructure
+from infragraph.infragraph import OpenApiIter, OpenApiObject
+from infragraph.compression import read_text
+
+try:
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:
+    from yaml import SafeLoader as _SafeLoader
+
+_DTYPES = (list, str, int, float, bool)
+_INT64_FORMATS = ("int64", "uint64")
+
+log = logging.getLogger(__name__)
+
+
+def parse_payload(payload: str) -> Dict[str, Any]:
+    """Parse a json or yaml payload into plain python objects"""
+    if payload.lstrip()[:1] == "{":
+        try:
+            return json.loads(payload)
+        except ValueError:
+            # json is a subset of yaml, anything else starting with { is flow style yaml
+            pass
+    return yaml.load(payload, Loader=_SafeLoader)
+
+
+class _GeneratedSdk:
+    """The only code that touches the private internals of the generated SDK.
+
+    The trusted decoder fills objects the way OpenApiObject._decode does,
+    which depends on _TYPES, _DEFAULTS, _properties, _get_child_class and
+    the slots set by the generated __init__ methods. fingerprint digests
+    the source of those internals, supported is True only for the
+    fingerprints of SDKs the decoder was checked against, otherwise
+    decode_trusted falls back to the validated deserialize.
+    """
+
+    # openapiart 0.3.44
+    SUPPORTED_FINGERPRINTS = frozenset({"1447a49c16790d4e"})
+
+    # (class, property name) -> (list class, item or child class)
+    _child_classes: Dict[Tuple[type, str], Tuple[Any, Any]] = {}
+    _supported: Optional[bool] = None
+
+    @staticmethod
+    def fingerprint() -> str:
+        """Return a digest of the generated internals the trusted decoder mirrors"""
+        parts = [repr(OpenApiObject.__slots__), repr(OpenApiIter.__slots__)]
+        for method in (
+            OpenApiObject.__init__,
+            OpenApiObject._decode,
+            OpenApiObject._get_child_class,
+            OpenApiObject._set_choice,
+            OpenApiIter.__init__,
+        ):
+            parts.append(inspect.getsource(method))
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+
+    @classmethod
+    def supported(cls) -> bool:
+        if cls._supported is None:
+            try:
+                fingerprint = cls.fingerprint()
+            except (AttributeError, OSError, TypeError):
+                fingerprint = None
+            cls._supported = fingerprint in cls.SUPPORTED_FINGERPRINTS
+            if not cls._supported:
+                log.warning(f"Generated SDK internals {fingerprint} are not supported, trusted payloads are validated")
+        return cls._supported
+
+    @classmethod
+    def child_class(cls, obj: OpenApiObject, name: str, is_list: bool):
+        key = (type(obj), name)
+        classes = cls._child_classes.get(key)
+        if classes is None:
+            classes = obj._get_child_class(name, is_list)
+            cls._child_classes[key] = classes
+        return classes
+
+    @staticmethod
+    def new(obj_class: Type[OpenApiObject], parent=None, choice=None) -> OpenApiObject:
+        """Create an empty object without running the generated __init__ setters"""
+        if obj_class._DEFAULTS:
+            return obj_class(parent=parent) if "_parent" in obj_class.__slots__ else obj_class()
+        obj = obj_class.__new__(obj_class)
+        obj._parent = parent
+        obj._choice = choice
+        obj._properties = {}
+        obj.__warnings__ = []
+        return obj
+
+    @classmethod
+    def decode(cls, obj: OpenApiObject, data: Dict[str, Any]) -> OpenApiObject:
+        """Mirror of OpenApiObject._decode without the validation"""
+        types = obj._TYPES
+        properties = obj._properties
+        choice = types.get("choice")
+        choices = choice["enum"] if choice is not None else ()
+        for name, value in data.items():
+            details = types.get(name)
+            if details is None:
+                continue
+            if isinstance(value, dict):
+                child_class: Type[OpenApiObject] = cls.child_class(obj, name, False)[1]
+                slots = child_class.__slots__
+                if "choice" in child_class._TYPES and "_parent" in slots:
+                    child = cls.new(child_class, obj, name)
+                elif "_parent" in slots:
+                    child = cls.new(child_class, obj)
+                else:
+                    child = cls.new(child_class)
+                value = cls.decode(child, value)
+            elif isinstance(value, list) and details["type"] not in _DTYPES:
+                list_class, item_class = cls.child_class(obj, name, True)
+                items = list_class()
+                items._items.extend(cls.decode(cls.new(item_class), item) for item in value)
+                value = items
+            elif value is None and name in obj._DEFAULTS and isinstance(obj._DEFAULTS[name], _DTYPES):
+                value = obj._DEFAULTS[name]
+            if name in choices:
+                for enum in choices:
+                    if enum != name:
+                        properties.pop(enum, None)
+                properties["choice"] = name
+            if details.get("format") in _INT64_FORMATS:
+                value = int(value)
+            elif details.get("itemformat") in _INT64_FORMATS:
+                value = [int(v) for v in value]
+            properties[name] = value
+        return obj
+
+
+def decode_trusted(obj: OpenApiObject, data: Dict[str, Any]) -> OpenApiObject:
+    """Fill a generated object from a parsed dict without validating it.
+
+    Mirrors OpenApiObject._decode: nested objects and lists are created
+    with the same parents, choices are recorded and int64 strings are
+    converted, but types, enums and required properties are not checked.
+    With a generated SDK whose internals differ from the supported ones
+    the object is deserialized and validated instead.
+    """
+    if not _GeneratedSdk.supported():
+        return obj.deserialize(data)
+    return _GeneratedSdk.decode(obj, data)
+
+
+def load_infrastructure(payload: Union[str, Dict[str, Any]], trusted: bool = False) -> Infrastructure:
+    """Return the Infrastructure of a json or yaml payload or an already parsed dict"""
+    data = parse_payload(payload) if isinstance(payload, str) else payload
+    if trusted:
+        return decode_trusted(Infrastructure(), data)
+    return Infrastructure().deserialize(data)
+
+
+def load_infrastructure_file(path: str, trusted: bool = False) -> Infrastructure:
+    """Return the Infrastructure of a json or yaml file, compressed files are decompressed by extension"""
+    return load_infrastructure(read_text(path), trusted=trusted)
@@ -0,0 +1,25 @@
+"""
+Locks guarding an InfraGraphService shared between threads.
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+
+class WriteLock:
+    """Reentrant lock serializing the writes to an InfraGraphService.
+
+    Reads run on the snapshot published by the last write, see
+    InfraGraphService.snapshot, and take no lock. Writers hold the lock
+    one at a time, the thread holding it may take it again, e.g. a server
+    holding it around several service writes that each take it too.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        with self._lock:
+            yield
@@ -0,0 +1,203 @@
+"""
+Warm-standby preloading of graphs at service startup.
+
+A restarted server would otherwise serve an empty graph until a client
+sends set_graph, and the first client pays for the whole expansion.
+GraphPreloader loads one or more graphs on a background thread while the
+server already accepts connections:
+- snapshot files written by write_snapshot are restored without
+  expanding the infrastructure again, see restore_graph
+- infrastructure json or yaml files, optionally compressed, are expanded
+  by set_graph
+
+Every graph goes through three phases, each timed:
+- read: open the snapshot or decode the infrastructure file
+- build: install the graph and its lookup maps under the write lock of
+  the service, the graph is queryable afterwards
+- index: warm the query_graph cache with a query per node type and the
+  extra queries given, and optionally build a DistanceOracle
+
+The preloader reports ready once every graph finished its build phase,
+indexes are built after that while queries are already served. A graph
+that fails to load stops preloading, the preloader is done without ever
+becoming ready and reports the failure in errors and status. Phase
+timings are logged to the infragraph.preload logger and returned by
+status, which the HTTP server reports on GET /ready.
+
+Example:
+    preloader = GraphPreloader({"fabric": "fabric.igsnap"}).start()
+    preloader.wait()
+    service = preloader.services["fabric"]
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+from infragraph import QueryAttribute, QueryNodeFilter, QueryRequest
+from infragraph.analytics.distance_oracle import DistanceOracle
+from infragraph.infragraph_service import InfraGraphService
+from infragraph.infrastructure_loader import load_infrastructure_file
+from infragraph.snapshot import SNAPSHOT_MAGIC, GraphSnapshot
+
+log = logging.getLogger(__name__)
+
+
+def is_snapshot_file(path: str) -> bool:
+    """Return whether a file starts with the snapshot magic"""
+    with open(path, "rb") as fp:
+        return fp.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC
+
+
+def node_type_queries(service: InfraGraphService) -> List[QueryRequest]:
+    """Return a query matching the nodes of each node type of the graph"""
+    queries = []
+    for node_type in sorted({str(data.get("type")) for _, data in service.get_networkx_graph().nodes(data=True)}):
+        query = QueryRequest()
+        node_filter = query.node_filters.add(name=f"{node_type} filter")
+        node_filter.choice = QueryNodeFilter.ATTRIBUTE_FILTER
+        node_filter.attribute_filter.name = "type"
+        node_filter.attribute_filter.operator = QueryAttribute.EQ
+        node_filter.attribute_filter.value = node_type
+        queries.append(query)
+    return queries
+
+
+class GraphPreloader:
+    """Loads graphs from snapshot or infrastructure files on a background thread and tracks readiness.
+
+    sources maps graph names to file paths. Graphs are loaded into the
+    services given for their name, e.g. the service of a running server,
+    or into new services. Infrastructure files written by infragraph
+    itself can be loaded as trusted to skip validation.
+    """
+
+    def __init__(
+        self,
+        sources: Dict[str, str],
+        services: Optional[Dict[str, InfraGraphService]] = None,
+        queries: Iterable[QueryRequest] = (),
+        distance_oracle: bool = False,
+        trusted: bool = False,
+    ):
+        services = services or {}
+        self.sources = dict(sources)
+        self.services: Dict[str, InfraGraphService] = {
+            name: services.get(name) or InfraGraphService() for name in self.sources
+        }
+        self.queries = list(queries)
+        self.distance_oracle = distance_oracle
+        self.trusted = trusted
+        self.oracles: Dict[str, DistanceOracle] = {}
+        # graph name to the seconds taken by each completed phase
+        self.timings: Dict[str, Dict[str, float]] = {name: {} for name in self.sources}
+        self.errors: Dict[str, str] = {}
+        self._ready = threading.Event()
+        self._done = threading.Event()
+        # set once ready or done, whichever comes first
+        self._settled = threading.Event()
+        self._started = time.perf_counter()
+        self._finished: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        # the graph read by the read phase and installed by the build phase
+        self._loaded: Any = None
+
+    @property
+    def ready(self) -> bool:
+        """Return whether every graph is queryable"""
+        return self._ready.is_set()
+
+    @property
+    def done(self) -> bool:
+        """Return whether preloading finished, including the index phase, or failed"""
+        return self._done.is_set()
+
+    @property
+    def loading(self) -> bool:
+        """Return whether a graph is still being loaded, False once every graph is queryable or preloading failed"""
+        return not self._settled.is_set()
+
+    def start(self) -> "GraphPreloader":
+        """Start preloading on a daemon thread"""
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self.run, name="infragraph-preload", daemon=True)
+        self._thread.start()
+        return self
+
+    def wait(self, timeout: Optional[float] = None, indexed: bool = False) -> bool:
+        """Wait until ready, or until done if indexed, returns whether every graph is queryable.
+
+        A failed preload ends the wait as well and returns False, errors
+        holds the failure.
+        """
+        (self._done if indexed else self._settled).wait(timeout)
+        return self.ready
+
+    def run(self) -> None:
+        """Load every graph then build the indexes, in the calling thread"""
+        try:
+            for name in self.sources:
+                if not self._phase(name, "read", self._read) or not self._phase(name, "build", self._build):
+                    return
+            log.info(f"preload ready after {time.perf_counter() - self._started:.3f}s")
+            self._ready.set()
+            self._settled.set()
+            for name in self.sources:
+                self._phase(name, "index", self._index)
+        finally:
+            self._loaded = None
+            self._finished = time.perf_counter()
+            self._done.set()
+            self._settled.set()
+
+    def _phase(self, name: str, phase: str, method) -> bool:
+        start = time.perf_counter()
+        try:
+            method(name)
+        except Exception as error:
+            self.errors[name] = f"{phase}: {error}"
+            log.error(f"preload {name} failed in phase {phase}: {error}")
+            return False
+        self.timings[name][phase] = time.perf_counter() - start
+        log.info(f"preload {name} {phase} {self.timings[name][phase]:.3f}s")
+        return True
+
+    def _read(self, name: str) -> None:
+        path = self.sources[name]
+        if is_snapshot_file(path):
+            with GraphSnapshot(path) as snapshot:
+                self._loaded = (snapshot.infrastructure, snapshot.to_networkx_graph(), None, snapshot.link_annotations)
+        else:
+            self._loaded = load_infrastructure_file(path, trusted=self.trusted)
+
+    def _build(self, name: str) -> None:
+        service = self.services[name]
+        loaded, self._loaded = self._loaded, None
+        with service.lock.write():
+            if isinstance(loaded, tuple):
+                service.restore_graph(*loaded)
+            else:
+                service.set_graph(loaded, trusted=self.trusted)
+
+    def _index(self, name: str) -> None:
+        snapshot = self.services[name].snapshot()
+        for query in node_type_queries(snapshot) + self.queries:
+            snapshot.query_graph(query)
+        if self.distance_oracle:
+            self.oracles[name] = DistanceOracle(snapshot)
+
+    def status(self) -> Dict[str, Any]:
+        """Return the readiness and the phase timings and errors of every graph"""
+        return {
+            "ready": self.ready,
+            "done": self.done,
+            "seconds": (self._finished or time.perf_counter()) - self._started,
+            "graphs": {
+                name: {
+                    "path": path,
+                    "phases": dict(self.timings[name]),
+                    "error": self.errors.get(name),
+                }
+                for name, path in self.sources.items()
+            },
+        }
@@ -0,0 +1,128 @@
+"""
+Bounded LRU cache of query_graph results.
+
+Entries are keyed by a hash of the normalized QueryRequest: filter names
+are labels and the node filters are ANDed, so neither the names nor the
+order of the filters change the result and both are left out of the key.
+
+An entry records the graph version it was computed at, the node ids it
+matched and the attributes its filters read. InfraGraphService checks
+the changes logged since that version on lookup, an entry stays valid
+unless a written node is in its result, which changes the returned
+attributes, or a written attribute is one its filters read, which can
+change the matches. set_graph starts a new base version and invalidates
+every entry.
+
+Cached QueryResponseContent objects are returned to every caller that
+hits them and must be treated as read-only.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Optional
+from infragraph import QueryNodeFilter, QueryRequest, QueryResponseContent
+
+DEFAULT_MAX_ENTRIES = 256
+
+
+def query_key(query: QueryRequest) -> str:
+    """Return the hash of a query with the names and order of its node filters normalized away"""
+    data = query.serialize("dict")
+    filters = []
+    for node_filter in data.pop("node_filters", []):
+        node_filter.pop("name", None)
+        filters.append(json.dumps(node_filter, sort_keys=True))
+    data["node_filters"] = sorted(filters)
+    encoded = json.dumps(data, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+def query_attributes(query: QueryRequest) -> FrozenSet[str]:
+    """Return the names of the attributes the node filters of a query read"""
+    return frozenset(
+        node_filter.attribute_filter.name
+        for node_filter in query.node_filters
+        if node_filter.choice == QueryNodeFilter.ATTRIBUTE_FILTER
+    )
+
+
+class QueryCacheEntry:
+    def __init__(
+        self,
+        content: QueryResponseContent,
+        version: int,
+        base_version: int,
+        node_ids: FrozenSet[str],
+        attributes: FrozenSet[str],
+    ):
+        self.content = content
+        self.version = version
+        self.base_version = base_version
+        self.node_ids = node_ids
+        self.attributes = attributes
+
+
+class QueryCache:
+    """Thread safe LRU map of query keys to QueryCacheEntry with hit, eviction and invalidation counts"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, QueryCacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[QueryCacheEntry]:
+        """Return the entry of a key and mark it most recently used, the caller validates it"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def hit(self) -> None:
+        with self._lock:
+            self.hits += 1
+
+    def miss(self, invalidated: bool = False) -> None:
+        with self._lock:
+            self.misses += 1
+            if invalidated:
+                self.invalidations += 1
+
+    def put(self, key: str, entry: QueryCacheEntry) -> None:
+        """Store an entry unless a newer one is cached, evicting the least recently used beyond max_entries"""
+        with self._lock:
+            current = self._entries.get(key)
+            if current is not None and (current.base_version, current.version) > (entry.base_version, entry.version):
+                return
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the hit rate, size and hit, miss, eviction and invalidation counts"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,388 @@
+"""
+gRPC server hosting one shared InfraGraphService.
+
+The server implements the Openapi service of infragraph.proto so the
+generated GrpcApi client and OpenapiStub can talk to it. Requests are
+served on a thread pool:
+- get_graph, query_graph and get_version read the snapshot of the graph
+  published by the last write, see InfraGraphService.snapshot, and run
+  concurrently with each other and with writes without taking a lock
+- set_graph and annotate_graph take the write lock of the service and
+  run one at a time
+
+The streamSetGraph rpc expands the infrastructure while its chunks arrive
+and only takes the write lock to install the finished graph. The
+streamAnnotateGraph rpc decodes the annotation in batches of
+ANNOTATION_BATCH_SIZE records while its chunks arrive and applies each
+batch as soon as it is decoded, all of them within one write, see
+InfraGraphService.annotate_batches, so only one batch is held in memory
+and a stream that fails midway applies none of the annotation. The
+write lock is held for the duration of the stream.
+
+A server started with a preload file loads its graph in the background
+and aborts requests with UNAVAILABLE until the graph is queryable or
+the preload failed, see infragraph.preload.
+
+The GraphStream service of graph.proto streams query_graph matches and
+get_graph chunks in pages with a continuation cursor. A stream reads the
+snapshot pinned when it started and builds each page when the client is
+ready for it, grpc only asks for the next page once the previous one was
+sent, so a slow client neither holds more than one page in server memory
+nor sees writes made during the stream.
+
+Protobuf messages are converted to and from the generated SDK objects
+outside the lock. Failures are returned as the json representation of
+the Error message as the Openapi service requires.
+
+Example:
+    infragraph serve --address localhost:50051 --input fabric.yaml
+    infragraph serve --address localhost:50051 --http localhost:8080
+    infragraph serve --address localhost:50051 --preload fabric.igsnap
+    infragraph benchmark --address localhost:50051 --clients 8
+"""
+
+import json
+import logging
+import threading
+import time
+from concurrent import futures
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple, Union
+import grpc
+from google.protobuf import json_format
+from infragraph import (
+    Annotation,
+    GraphRequest,
+    Infrastructure,
+    QueryAttribute,
+    QueryNodeFilter,
+    QueryRequest,
+    QueryResponseContent,
+)
+from infragraph import graph_pb2, graph_pb2_grpc
+from infragraph import infragraph_pb2 as pb2
+from infragraph import infragraph_pb2_grpc as pb2_grpc
+from infragraph.http_server import create_http_server
+from infragraph.infragraph_service import InfraGraphService, GraphError, InfrastructureError
+from infragraph.preload import GraphPreloader, log as preload_log
+from infragraph.streaming import StreamingGraphBuilder, iter_annotation_batches
+
+DEFAULT_ADDRESS = "localhost:50051"
+MAX_MESSAGE_LENGTH = 1 << 30
+ANNOTATION_BATCH_SIZE = 4096
+QUERY_PAGE_SIZE = 1024
+GRAPH_PAGE_SIZE = 1 << 14
+
+_SERVER_OPTIONS = [
+    ("grpc.max_receive_message_length", MAX_MESSAGE_LENGTH),
+    ("grpc.max_send_message_length", MAX_MESSAGE_LENGTH),
+]
+
+# errors caused by the request rather than by the server
+_VALIDATION_ERRORS = (ValueError, TypeError, KeyError, GraphError, InfrastructureError, json_format.ParseError)
+
+
+def _to_dict(message) -> Dict[str, Any]:
+    return json_format.MessageToDict(message, preserving_proto_field_name=True)
+
+
+def _error(code: grpc.StatusCode, kind: str, error: Exception) -> str:
+    return json.dumps({"code": code.value[0], "kind": kind, "errors": [str(error)]})
+
+
+def _check_ready(servicer, context) -> None:
+    """Abort with UNAVAILABLE while the preloader of a servicer is loading the graph"""
+    preloader = servicer.preloader
+    if preloader is not None and preloader.loading:
+        message = _error(grpc.StatusCode.UNAVAILABLE, "internal", RuntimeError("The graph is being preloaded"))
+        context.abort(grpc.StatusCode.UNAVAILABLE, message)
+
+
+def _rpc(method: Callable) -> Callable:
+    """Report exceptions of an rpc as the json representation of an Error"""
+
+    def handler(self, request, context):
+        _check_ready(self, context)
+        try:
+            return method(self, request, context)
+        except _VALIDATION_ERRORS as error:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, _error(grpc.StatusCode.INVALID_ARGUMENT, "validation", error))
+        except NotImplementedError as error:
+            context.abort(grpc.StatusCode.UNIMPLEMENTED, _error(grpc.StatusCode.UNIMPLEMENTED, "internal", error))
+        except Exception as error:
+            context.abort(grpc.StatusCode.INTERNAL, _error(grpc.StatusCode.INTERNAL, "internal", error))
+
+    handler.__name__ = method.__name__
+    handler.__doc__ = method.__doc__
+    return handler
+
+
+def _stream_rpc(method: Callable) -> Callable:
+    """Report exceptions of a server streaming rpc as the json representation of an Error"""
+
+    def handler(self, request, context):
+        _check_ready(self, context)
+        try:
+            yield from method(self, request, context)
+        except _VALIDATION_ERRORS as error:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, _error(grpc.StatusCode.INVALID_ARGUMENT, "validation", error))
+        except NotImplementedError as error:
+            context.abort(grpc.StatusCode.UNIMPLEMENTED, _error(grpc.StatusCode.UNIMPLEMENTED, "internal", error))
+        except Exception as error:
+            context.abort(grpc.StatusCode.INTERNAL, _error(grpc.StatusCode.INTERNAL, "internal", error))
+
+    handler.__name__ = method.__name__
+    handler.__doc__ = method.__doc__
+    return handler
+
+
+def _join_chunks(request_iterator, message_class):
+    """Parse the message a client split into Data chunks"""
+    return message_class.FromString(b"".join(data.datum for data in request_iterator))
+
+
+class InfraGraphServicer(pb2_grpc.OpenapiServicer):
+    """Openapi gRPC servicer for one shared InfraGraphService"""
+
+    def __init__(self, service: Optional[InfraGraphService] = None):
+        self.service = service if service is not None else InfraGraphService()
+        self.lock = self.service.lock
+        self.preloader: Optional[GraphPreloader] = None
+
+    def _set_graph(self, infrastructure: pb2.Infrastructure) -> pb2.SetGraphResponse:
+        payload = Infrastructure().deserialize(_to_dict(infrastructure))
+        with self.lock.write():
+            self.service.set_graph(payload)
+        return pb2.SetGraphResponse(warning=pb2.Warning())
+
+    def _get_graph(self, graph_request: pb2.GraphRequest) -> pb2.GetGraphResponse:
+        request = GraphRequest().deserialize(_to_dict(graph_request))
+        graph = self.service.snapshot().get_graph(request)
+        content = pb2.GraphResponseContent()
+        if request.choice == GraphRequest.INFRAGRAPH:
+            content.choice = pb2.GraphResponseContent.Choice.infragraph
+            json_format.Parse(graph, content.infragraph)
+        else:
+            content.choice = pb2.GraphResponseContent.Choice.networkx
+            content.networkx = graph
+        return pb2.GetGraphResponse(graph_response_content=content)
+
+    def _query_graph(self, query_request: pb2.QueryRequest) -> pb2.QueryGraphResponse:
+        request = QueryRequest().deserialize(_to_dict(query_request))
+        content = self.service.snapshot().query_graph(request)
+        return pb2.QueryGraphResponse(
+            query_response_content=json_format.ParseDict(content.serialize("dict"), pb2.QueryResponseContent())
+        )
+
+    def _annotate_graph(self, annotation: pb2.Annotation) -> pb2.AnnotateGraphResponse:
+        payload = Annotation().deserialize(_to_dict(annotation))
+        with self.lock.write():
+            self.service.annotate_graph(payload)
+        return pb2.AnnotateGraphResponse(warning=pb2.Warning())
+
+    @_rpc
+    def SetGraph(self, request, context):
+        return self._set_graph(request.infrastructure)
+
+    @_rpc
+    def streamSetGraph(self, request_iterator, context):
+        builder = StreamingGraphBuilder()
+        for data in request_iterator:
+            builder.feed(data.datum)
+        infrastructure, graph, device_data = builder.finish()
+        with self.lock.write():
+            self.service.restore_graph(infrastructure, graph, device_data)
+        return pb2.SetGraphResponse(warning=pb2.Warning())
+
+    @_rpc
+    def GetGraph(self, request, context):
+        return self._get_graph(request.graph_request)
+
+    @_rpc
+    def streamGetGraph(self, request_iterator, context):
+        return self._get_graph(_join_chunks(request_iterator, pb2.GraphRequest))
+
+    @_rpc
+    def QueryGraph(self, request, context):
+        return self._query_graph(request.query_request)
+
+    @_rpc
+    def streamQueryGraph(self, request_iterator, context):
+        return self._query_graph(_join_chunks(request_iterator, pb2.QueryRequest))
+
+    @_rpc
+    def AnnotateGraph(self, request, context):
+        return self._annotate_graph(request.annotation)
+
+    @_rpc
+    def streamAnnotateGraph(self, request_iterator, context):
+        chunks = (data.datum for data in request_iterator)
+        with self.lock.write():
+            self.service.annotate_batches(iter_annotation_batches(chunks, ANNOTATION_BATCH_SIZE))
+        return pb2.AnnotateGraphResponse(warning=pb2.Warning())
+
+    @_rpc
+    def GetVersion(self, request, context):
+        version = json_format.ParseDict(self.service._version_meta.serialize("dict"), pb2.Version())
+        return pb2.GetVersionResponse(version=version)
+
+
+class GraphStreamServicer(graph_pb2_grpc.GraphStreamServicer):
+    """GraphStream gRPC servicer sharing the service of an InfraGraphServicer"""
+
+    def __init__(self, servicer: InfraGraphServicer):
+        self.service = servicer.service
+        self._servicer = servicer
+
+    @property
+    def preloader(self) -> Optional[GraphPreloader]:
+        return self._servicer.preloader
+
+    @_stream_rpc
+    def QueryPages(self, request, context):
+        query = QueryRequest().deserialize(_to_dict(pb2.QueryRequest.FromString(request.query_request)))
+        snapshot = self.service.snapshot()
+        pages = snapshot.iter_query_pages(query, request.page_size or QUERY_PAGE_SIZE, request.cursor or None)
+        for content, cursor in pages:
+            yield graph_pb2.QueryPage(
+                query_response_content=json_format.ParseDict(
+                    content.serialize("dict"), pb2.QueryResponseContent()
+                ).SerializeToString(),
+                cursor=cursor or "",
+            )
+
+    @_stream_rpc
+    def GraphPages(self, request, context):
+        graph_request = GraphRequest().deserialize(_to_dict(pb2.GraphRequest.FromString(request.graph_request)))
+        if graph_request.choice != GraphRequest.NETWORKX:
+            raise ValueError("Only networkx graph requests are paged")
+        snapshot = self.service.snapshot()
+        pages = snapshot.iter_graph_pages(graph_request, request.page_size or GRAPH_PAGE_SIZE, request.cursor or None)
+        for chunk, cursor in pages:
+            yield graph_pb2.GraphPage(chunk=chunk, cursor=cursor or "")
+
+
+def iter_query_pages(
+    location: str, query: QueryRequest, page_size: int = QUERY_PAGE_SIZE, cursor: Optional[str] = None
+) -> Iterator[Tuple[QueryResponseContent, Optional[str]]]:
+    """Stream the query_graph matches of a server in pages, yields each page with the cursor of the next"""
+    request = graph_pb2.QueryPagesRequest(
+        query_request=json_format.ParseDict(query.serialize("dict"), pb2.QueryRequest()).SerializeToString(),
+        page_size=page_size,
+        cursor=cursor or "",
+    )
+    with grpc.insecure_channel(location, options=_SERVER_OPTIONS) as channel:
+        for page in graph_pb2_grpc.GraphStreamStub(channel).QueryPages(request):
+            content = pb2.QueryResponseContent.FromString(page.query_response_content)
+            yield QueryResponseContent().deserialize(_to_dict(content)), page.cursor or None
+
+
+def create_server(
+    service: Optional[InfraGraphService] = None,
+    address: str = DEFAULT_ADDRESS,
+    max_workers: int = 8,
+) -> Tuple[grpc.Server, InfraGraphServicer, int]:
+    """Create and start a server, returns the server, its servicer and the bound port.
+
+    A port of 0 in address binds a free port.
+    """
+    servicer = InfraGraphServicer(service)
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=max_workers), options=_SERVER_OPTIONS)
+    pb2_grpc.add_OpenapiServicer_to_server(servicer, server)
+    graph_pb2_grpc.add_GraphStreamServicer_to_server(GraphStreamServicer(servicer), server)
+    port = server.add_insecure_port(address)
+    if port == 0:
+        raise RuntimeError(f"Unable to bind the infragraph server to {address}")
+    server.start()
+    return server, servicer, port
+
+
+def serve(
+    address: str = DEFAULT_ADDRESS,
+    max_workers: int = 8,
+    infrastructure: Optional[Union[str, Infrastructure]] = None,
+    http_address: Optional[str] = None,
+    preload: Optional[str] = None,
+) -> None:
+    """Serve the Openapi service until interrupted, optionally starting with an infrastructure graph.
+
+    With an http_address the same service is also served over HTTP/JSON,
+    see infragraph.http_server. With a preload snapshot or infrastructure
+    file the servers start right away and load the graph in the
+    background, requests fail as UNAVAILABLE, or with status 503 over
+    HTTP, until the graph is queryable or the preload failed, see
+    infragraph.preload.
+    """
+    service = InfraGraphService()
+    if infrastructure is not None:
+        service.set_graph(infrastructure)
+    preloader = None
+    if preload is not None:
+        preload_log.setLevel(logging.INFO)
+        preloader = GraphPreloader({"graph": preload}, {"graph": service})
+    server, servicer, port = create_server(service, address, max_workers)
+    servicer.preloader = preloader
+    print(f"infragraph server listening on {address.rsplit(':', 1)[0]}:{port}")
+    http_server = None
+    if http_address is not None:
+        http_server, http_port = create_http_server(service, http_address, preloader=preloader)
+        print(f"infragraph http server listening on {http_address.rsplit(':', 1)[0]}:{http_port}")
+    if preloader is not None:
+        preloader.start()
+    try:
+        server.wait_for_termination()
+    except KeyboardInterrupt:
+        server.stop(grace=1).wait()
+    finally:
+        if http_server is not None:
+            http_server.shutdown()
+            http_server.server_close()
+
+
+def benchmark_query_graph(
+    location: str = DEFAULT_ADDRESS,
+    query: Optional[QueryRequest] = None,
+    clients: int = 8,
+    seconds: float = 5.0,
+) -> Dict[str, float]:
+    """Send QueryGraph requests from concurrent clients and return the queries per second.
+
+    Every client thread has its own channel. The default query matches the
+    xpu nodes of the graph.
+    """
+    if query is None:
+        query = QueryRequest()
+        node_filter = query.node_filters.add(name="xpu filter")
+        node_filter.choice = QueryNodeFilter.ATTRIBUTE_FILTER
+        node_filter.attribute_filter.name = "type"
+        node_filter.attribute_filter.operator = QueryAttribute.EQ
+        node_filter.attribute_filter.value = "xpu"
+    request = pb2.QueryGraphRequest(
+        query_request=json_format.ParseDict(query.serialize("dict"), pb2.QueryRequest())
+    )
+    counts = [0] * clients
+    errors = [0] * clients
+    deadline = time.perf_counter() + seconds
+
+    def client(index: int):
+        with grpc.insecure_channel(location, options=_SERVER_OPTIONS) as channel:
+            stub = pb2_grpc.OpenapiStub(channel)
+            while time.perf_counter() < deadline:
+                try:
+                    stub.QueryGraph(request)
+                    counts[index] += 1
+                except grpc.RpcError:
+                    errors[index] += 1
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return {
+        "queries": sum(counts),
+        "errors": sum(errors),
+        "seconds": elapsed,
+        "qps": sum(counts) / elapsed,
+    }
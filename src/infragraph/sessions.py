@@ -0,0 +1,291 @@
+"""
+Named graph sessions sharing one process.
+
+GraphSessions holds one InfraGraphService per session name, each with its
+own graph, lookup maps and annotations, so fabric variants can be built
+and compared side by side without paying the import and startup cost of a
+process per variant.
+
+Device definitions are often the same across sessions, e.g. every variant
+uses the same server blueprint. The DeviceData parsed from a device is
+read-only once the device edges are expanded, so sessions share it
+through a DeviceDataPool keyed by the content hash of the device and the
+devices composed into it.
+
+Memory is accounted per session as the estimated size of its graph and
+lookup maps, shared DeviceData is accounted once for the pool. When
+max_bytes or max_sessions is exceeded the least recently used sessions
+are evicted. With a spill_directory an evicted session is written as a
+snapshot and restored by the next get, otherwise it is dropped.
+
+Example:
+    sessions = GraphSessions(max_bytes=8 << 30, spill_directory="/tmp/sessions")
+    sessions.set_graph("baseline", baseline)
+    sessions.set_graph("oversubscribed", variant)
+    sessions["baseline"].query_graph(query)
+    print(sessions.memory())
+"""
+
+import hashlib
+import os
+from collections import OrderedDict
+from sys import getsizeof
+from urllib.parse import quote
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+from networkx import Graph
+from infragraph import Component, Device, Infrastructure
+from infragraph.content_hash import DIGEST_SIZE, canonical_bytes
+from infragraph.infragraph_service import DeviceData, InfraGraphService
+from infragraph.snapshot import GraphSnapshot, write_snapshot
+
+SNAPSHOT_EXTENSION = ".igsnap"
+
+
+def device_data_bytes(device_data: DeviceData) -> int:
+    """Estimate the memory held by a DeviceData"""
+    size = getsizeof(device_data)
+    for table in (device_data.nodes, device_data.components, device_data.edges, device_data.links):
+        size += getsizeof(table)
+    for edges in device_data.edges.values():
+        size += getsizeof(edges) + sum(getsizeof(edge) for edge in edges)
+    return size
+
+
+def graph_bytes(graph: Graph) -> int:
+    """Estimate the memory held by the containers of a networkx graph.
+
+    Node names and attribute values are mostly strings shared with other
+    nodes, only the dicts holding them are counted.
+    """
+    size = getsizeof(graph.graph) + getsizeof(graph._node) + getsizeof(graph._adj)
+    for data in graph.nodes.values():
+        size += getsizeof(data)
+    for neighbors in graph.adj.values():
+        size += getsizeof(neighbors)
+    for _, _, data in graph.edges(data=True):
+        size += getsizeof(data)
+    return size
+
+
+def service_bytes(service: InfraGraphService) -> int:
+    """Estimate the memory of the graph and lookup maps of a service, without its DeviceData"""
+    size = graph_bytes(service.get_networkx_graph())
+    for table in (service._graph_node_prefix_map, service._link_to_edges_map):
+        size += getsizeof(table) + sum(getsizeof(value) for value in table.values())
+    for table in (service._node_annotations, service._edge_annotations, service._link_annotations):
+        size += getsizeof(table) + sum(getsizeof(value) for value in table.values())
+    return size + getsizeof(service._change_log)
+
+
+class DeviceDataPool:
+    """DeviceData shared between sessions, keyed by device content and reference counted per session"""
+
+    def __init__(self):
+        self._device_data: Dict[bytes, DeviceData] = {}
+        self._sessions: Dict[bytes, Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._device_data)
+
+    @staticmethod
+    def key(device: Device, devices: Dict[str, Device]) -> bytes:
+        """Hash a device together with the devices composed into it, which its edges depend on"""
+        hasher = hashlib.blake2b(digest_size=DIGEST_SIZE)
+        seen = set()
+        stack = [device]
+        while stack:
+            current = stack.pop()
+            if current.name in seen:
+                continue
+            seen.add(current.name)
+            hasher.update(canonical_bytes(current))
+            for component in current.components:
+                if component.choice == Component.DEVICE and component.name in devices:
+                    stack.append(devices[component.name])
+        return hasher.digest()
+
+    def get(self, key: bytes, session: str) -> Optional[DeviceData]:
+        device_data = self._device_data.get(key)
+        if device_data is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._sessions[key].add(session)
+        return device_data
+
+    def add(self, key: bytes, device_data: DeviceData, session: str) -> None:
+        self._device_data.setdefault(key, device_data)
+        self._sessions.setdefault(key, set()).add(session)
+
+    def release(self, session: str) -> None:
+        """Drop the references of a session and the DeviceData no session refers to anymore"""
+        for key in [key for key, sessions in self._sessions.items() if session in sessions]:
+            sessions = self._sessions[key]
+            sessions.discard(session)
+            if not sessions:
+                del self._sessions[key]
+                del self._device_data[key]
+
+    def bytes(self) -> int:
+        """Estimate the memory of the pooled DeviceData"""
+        return sum(device_data_bytes(device_data) for device_data in self._device_data.values())
+
+
+class SessionGraphService(InfraGraphService):
+    """InfraGraphService that takes the DeviceData of known devices from a DeviceDataPool"""
+
+    def __init__(self, session: str, pool: DeviceDataPool):
+        super().__init__()
+        self._session = session
+        self._pool = pool
+
+    def _generate_device_data(self):
+        """Reuse pooled DeviceData and parse only the devices the pool does not hold yet"""
+        devices = {device.name: device for device in self._infrastructure.devices}
+        parsed: List[Tuple[Device, bytes]] = []
+        for device in self._infrastructure.devices:
+            key = DeviceDataPool.key(device, devices)
+            device_data = self._pool.get(key, self._session)
+            if device_data is None:
+                self._parse_device(device)
+                parsed.append((device, key))
+            else:
+                self._device_data[device.name] = device_data
+        for device, _ in parsed:
+            self._parse_edges_of_device(device)
+        for device, key in parsed:
+            self._pool.add(key, self._device_data[device.name], self._session)
+
+
+class GraphSessions:
+    """Named InfraGraphService sessions with shared DeviceData, memory accounting and LRU eviction"""
+
+    def __init__(
+        self,
+        max_bytes: Optional[int] = None,
+        max_sessions: Optional[int] = None,
+        spill_directory: Optional[str] = None,
+    ):
+        self.max_bytes = max_bytes
+        self.max_sessions = max_sessions
+        self.spill_directory = spill_directory
+        self.pool = DeviceDataPool()
+        self.evictions = 0
+        # least recently used first
+        self._sessions: "OrderedDict[str, SessionGraphService]" = OrderedDict()
+        # session name to (graph version, estimated bytes)
+        self._bytes: Dict[str, Tuple[int, int]] = {}
+        self._spilled: Dict[str, str] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._sessions or name in self._spilled
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __getitem__(self, name: str) -> InfraGraphService:
+        return self.get(name)
+
+    def names(self) -> List[str]:
+        """Return the names of the loaded sessions, least recently used first, followed by the spilled ones"""
+        return list(self._sessions) + list(self._spilled)
+
+    def set_graph(self, name: str, payload: Union[str, Infrastructure], trusted: bool = False) -> InfraGraphService:
+        """Build the graph of a session, creating or replacing it, and evict other sessions if over a limit"""
+        self.drop(name)
+        service = SessionGraphService(name, self.pool)
+        try:
+            service.set_graph(payload, trusted=trusted)
+        except Exception:
+            self.pool.release(name)
+            raise
+        self._sessions[name] = service
+        self.evict(keep=name)
+        return service
+
+    def get(self, name: str) -> InfraGraphService:
+        """Return a session, restoring it if it was spilled, and mark it most recently used"""
+        service = self._sessions.get(name)
+        if service is not None:
+            self._sessions.move_to_end(name)
+            return service
+        path = self._spilled.pop(name, None)
+        if path is None:
+            raise KeyError(f"Graph session {name} does not exist")
+        with GraphSnapshot(path) as snapshot:
+            service = SessionGraphService(name, self.pool)
+            service._infrastructure = snapshot.infrastructure
+            service._generate_device_data()
+            service.restore_graph(
+                service._infrastructure, snapshot.to_networkx_graph(), service._device_data, snapshot.link_annotations
+            )
+        os.remove(path)
+        self._sessions[name] = service
+        self.evict(keep=name)
+        return service
+
+    def drop(self, name: str) -> None:
+        """Remove a session if it exists"""
+        if self._sessions.pop(name, None) is not None:
+            self.pool.release(name)
+        self._bytes.pop(name, None)
+        path = self._spilled.pop(name, None)
+        if path is not None:
+            os.remove(path)
+
+    def session_bytes(self, name: str) -> int:
+        """Return the estimated memory of a loaded session, excluding the shared DeviceData"""
+        service = self._sessions[name]
+        version, size = self._bytes.get(name, (None, 0))
+        if version != service.graph_version:
+            size = service_bytes(service)
+            self._bytes[name] = (service.graph_version, size)
+        return size
+
+    def memory(self) -> Dict[str, Any]:
+        """Return the estimated memory per session, of the shared DeviceData and in total"""
+        sessions = {name: self.session_bytes(name) for name in self._sessions}
+        shared = self.pool.bytes()
+        return {
+            "sessions": sessions,
+            "shared": shared,
+            "total": sum(sessions.values()) + shared,
+            "spilled": list(self._spilled),
+            "evictions": self.evictions,
+        }
+
+    def evict(self, keep: Optional[str] = None) -> List[str]:
+        """Evict least recently used sessions until the limits hold, returns the evicted names.
+
+        keep is never evicted, e.g. the session just built, so a single
+        session larger than max_bytes stays loaded.
+        """
+        evicted = []
+        while True:
+            candidates = [name for name in self._sessions if name != keep]
+            if not candidates:
+                break
+            over_count = self.max_sessions is not None and len(self._sessions) > self.max_sessions
+            over_bytes = (
+                self.max_bytes is not None
+                and sum(self.session_bytes(name) for name in self._sessions) + self.pool.bytes() > self.max_bytes
+            )
+            if not over_count and not over_bytes:
+                break
+            name = candidates[0]
+            self._evict(name)
+            evicted.append(name)
+        return evicted
+
+    def _evict(self, name: str) -> None:
+        service = self._sessions[name]
+        if self.spill_directory is not None:
+            os.makedirs(self.spill_directory, exist_ok=True)
+            path = os.path.join(self.spill_directory, quote(name, safe="") + SNAPSHOT_EXTENSION)
+            write_snapshot(service, path)
+        self.drop(name)
+        if self.spill_directory is not None:
+            self._spilled[name] = path
+        self.evictions += 1
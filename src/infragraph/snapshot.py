@@ -0,0 +1,368 @@
+"""
+Versioned binary snapshots of a fully built InfraGraphService.
+
+A snapshot stores everything needed to serve a graph without running
+set_graph or replaying annotations:
+- an interned string table
+- node and edge attribute columns (immutable attributes and annotations)
+- link annotations, which are kept off the graph, in the manifest
+- CSR adjacency in the CompactGraph layout and an edge table
+- the infrastructure the graph was built from
+
+GraphSnapshot maps the file read-only and exposes every section as a
+zero-copy memoryview, so opening a snapshot costs the same for any graph
+size and processes that open the same file share its pages.
+
+File layout, all integers in the byte order recorded in the manifest:
+- header: b"IGSNAP", u16 version, u64 manifest offset, u64 manifest length
+- sections: raw arrays, each aligned to 8 bytes
+- manifest: json describing counts, graph attributes, sections and columns
+
+Example:
+    write_snapshot(service, "fabric.igsnap")
+    with GraphSnapshot("fabric.igsnap") as snapshot:
+        node = snapshot.node_index("host.0.xpu.0")
+        print([snapshot.node_name(n) for n in snapshot.neighbors(node)])
+"""
+
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+from networkx import Graph
+from infragraph import Infrastructure
+from infragraph.infragraph_service import InfraGraphService, GraphError
+from infragraph.analytics.compact_graph import CompactGraph
+from infragraph.infrastructure_loader import load_infrastructure
+
+SNAPSHOT_MAGIC = b"IGSNAP"
+SNAPSHOT_VERSION = 1
+
+_HEADER = struct.Struct("<6sHQQ")
+_MISSING_INT = -(1 << 63)
+
+# column types, the array typecode of the column section
+_STRING_COLUMN = "i"
+_INT_COLUMN = "q"
+_FLOAT_COLUMN = "d"
+
+
+class _SnapshotWriter:
+    def __init__(self, fp):
+        self._fp = fp
+        self._sections: Dict[str, Tuple[int, int, str]] = {}
+        self._strings: Dict[str, int] = {}
+        self._string_data = bytearray()
+        self._string_offsets = array("q", [0])
+        fp.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0, 0))
+
+    def intern(self, value: str) -> int:
+        sid = self._strings.get(value)
+        if sid is None:
+            sid = len(self._strings)
+            self._strings[value] = sid
+            self._string_data.extend(value.encode("utf-8"))
+            self._string_offsets.append(len(self._string_data))
+        return sid
+
+    def section(self, name: str, data: array) -> None:
+        padding = -self._fp.tell() % 8
+        self._fp.write(b"\0" * padding)
+        offset = self._fp.tell()
+        data.tofile(self._fp)
+        self._sections[name] = (offset, len(data) * data.itemsize, data.typecode)
+
+    def column(self, name: str, values: List[Any]) -> str:
+        """Write a column choosing the narrowest type that holds every value"""
+        present = [v for v in values if v is not None]
+        if present and all(type(v) is int and v != _MISSING_INT and -(1 << 63) <= v < (1 << 63) for v in present):
+            data = array(_INT_COLUMN, [_MISSING_INT if v is None else v for v in values])
+        elif present and all(type(v) is float and not math.isnan(v) for v in present):
+            data = array(_FLOAT_COLUMN, [math.nan if v is None else v for v in values])
+        else:
+            data = array(
+                _STRING_COLUMN,
+                [-1 if v is None else self.intern(v if isinstance(v, str) else str(v)) for v in values],
+            )
+        self.section(name, data)
+        return data.typecode
+
+    def finish(self, manifest: Dict[str, Any]) -> None:
+        self.section("strings.offsets", self._string_offsets)
+        data = array("B", self._string_data)
+        self.section("strings.data", data)
+        manifest["string_count"] = len(self._strings)
+        manifest["sections"] = self._sections
+        encoded = json.dumps(manifest, default=str).encode("utf-8")
+        offset = self._fp.tell()
+        self._fp.write(encoded)
+        self._fp.seek(0)
+        self._fp.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, offset, len(encoded)))
+
+
+def _columns(records: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """Pivot per row attribute dicts into per attribute columns"""
+    columns: Dict[str, List[Any]] = {}
+    for row, data in enumerate(records):
+        for key, value in data.items():
+            column = columns.get(key)
+            if column is None:
+                column = columns[key] = [None] * len(records)
+            column[row] = value
+    return columns
+
+
+def write_snapshot(service: InfraGraphService, path: str) -> None:
+    """Write a snapshot of the graph, annotations and infrastructure of a service.
+
+    The snapshot is written to a temporary file in the directory of path
+    and renamed over path once complete, readers and a failed write never
+    see a partial snapshot.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, temporary = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as fp:
+            # mkstemp creates the file readable by the owner only, use the mode open would
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(temporary, 0o666 & ~umask)
+            _write_snapshot(service, fp)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def _write_snapshot(service: InfraGraphService, fp) -> None:
+    graph = service.get_networkx_graph()
+    compact = CompactGraph(graph)
+    writer = _SnapshotWriter(fp)
+    nodes = compact.nodes
+    writer.section("nodes.name", array("i", [writer.intern(node) for node in nodes]))
+    # node indexes in name order, used to look up a node without building a dict
+    writer.section("nodes.sorted", array("i", sorted(range(len(nodes)), key=nodes.__getitem__)))
+    writer.section("csr.offsets", array("q", compact.offsets))
+    writer.section("csr.targets", array("i", compact.targets))
+    writer.section("csr.edges", array("i", compact.arc_edges))
+    writer.section("edges.ep1", array("i", [u for u, _ in compact.edge_endpoints]))
+    writer.section("edges.ep2", array("i", [v for _, v in compact.edge_endpoints]))
+    writer.section("edges.bandwidth", compact.bandwidth)
+
+    node_columns = {}
+    for key, values in _columns([graph.nodes[node] for node in nodes]).items():
+        node_columns[key] = writer.column(f"nodes.attr.{key}", values)
+    edge_records = [graph.adj[nodes[u]][nodes[v]] for u, v in compact.edge_endpoints]
+    edge_columns = {}
+    for key, values in _columns(edge_records).items():
+        edge_columns[key] = writer.column(f"edges.attr.{key}", values)
+
+    infrastructure = array("B", service.infrastructure.serialize("json").encode("utf-8"))
+    writer.section("infrastructure", infrastructure)
+    writer.finish(
+        {
+            "byteorder": sys.byteorder,
+            "node_count": compact.node_count,
+            "edge_count": compact.edge_count,
+            "graph": dict(graph.graph),
+            "node_columns": node_columns,
+            "edge_columns": edge_columns,
+            "link_annotations": {link: dict(attributes) for link, attributes in service._link_annotations.items()},
+        }
+    )
+
+
+class GraphSnapshot:
+    """Read-only, memory mapped view of a snapshot written by write_snapshot.
+
+    Arrays are memoryviews into the mapping:
+    - offsets, targets, arc_edges: CSR adjacency, see CompactGraph
+    - edge_ep1, edge_ep2, bandwidth: per edge id endpoints and Gbps
+    Attribute values are decoded only when they are read. The mapping
+    stays open until close() is called or the context manager exits.
+    """
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise GraphError(f"{path} is not an infragraph snapshot")
+        try:
+            self._open(path)
+        except Exception:
+            self.close()
+            raise
+
+    def _open(self, path: str):
+        if len(self._mmap) < _HEADER.size:
+            raise GraphError(f"{path} is not an infragraph snapshot")
+        magic, version, manifest_offset, manifest_length = _HEADER.unpack_from(self._mmap, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise GraphError(f"{path} is not an infragraph snapshot")
+        if version != SNAPSHOT_VERSION:
+            raise GraphError(f"Snapshot version {version} is not supported, expected {SNAPSHOT_VERSION}")
+        manifest = json.loads(self._mmap[manifest_offset : manifest_offset + manifest_length])
+        if manifest["byteorder"] != sys.byteorder:
+            raise GraphError(f"Snapshot was written on a {manifest['byteorder']} endian host")
+        self._manifest = manifest
+        self._view = memoryview(self._mmap)
+        self._string_offsets = self._section("strings.offsets")
+        self._string_data = self._section("strings.data")
+        self.node_names = self._section("nodes.name")
+        self._sorted = self._section("nodes.sorted")
+        self.offsets = self._section("csr.offsets")
+        self.targets = self._section("csr.targets")
+        self.arc_edges = self._section("csr.edges")
+        self.edge_ep1 = self._section("edges.ep1")
+        self.edge_ep2 = self._section("edges.ep2")
+        self.bandwidth = self._section("edges.bandwidth")
+        self._node_columns = {key: self._section(f"nodes.attr.{key}") for key in manifest["node_columns"]}
+        self._edge_columns = {key: self._section(f"edges.attr.{key}") for key in manifest["edge_columns"]}
+        self._infrastructure: Optional[Infrastructure] = None
+
+    def _section(self, name: str) -> memoryview:
+        offset, length, typecode = self._manifest["sections"][name]
+        return self._view[offset : offset + length].cast(typecode)
+
+    def close(self) -> None:
+        """Release the memoryviews and unmap the file.
+
+        The mapping outlives close() while views returned by neighbors() are
+        still referenced, it is unmapped once they are garbage collected.
+        """
+        views = [value for value in vars(self).values() if isinstance(value, memoryview)]
+        views.extend(getattr(self, "_node_columns", {}).values())
+        views.extend(getattr(self, "_edge_columns", {}).values())
+        for view in views:
+            view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
+        self._file.close()
+
+    def __enter__(self) -> "GraphSnapshot":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def node_count(self) -> int:
+        return self._manifest["node_count"]
+
+    @property
+    def edge_count(self) -> int:
+        return self._manifest["edge_count"]
+
+    @property
+    def graph_attributes(self) -> Dict[str, Any]:
+        return dict(self._manifest["graph"])
+
+    @property
+    def link_annotations(self) -> Dict[str, Dict[str, Any]]:
+        """Return the link annotations, link name to {attribute: value}"""
+        return {link: dict(attributes) for link, attributes in self._manifest.get("link_annotations", {}).items()}
+
+    @property
+    def infrastructure(self) -> Infrastructure:
+        if self._infrastructure is None:
+            data = self._section("infrastructure")
+            # snapshots are written by write_snapshot, the infrastructure is trusted
+            self._infrastructure = load_infrastructure(json.loads(bytes(data)), trusted=True)
+            data.release()
+        return self._infrastructure
+
+    def string(self, sid: int) -> str:
+        """Decode an interned string"""
+        return str(self._string_data[self._string_offsets[sid] : self._string_offsets[sid + 1]], "utf-8")
+
+    def node_name(self, node: int) -> str:
+        return self.string(self.node_names[node])
+
+    def node_index(self, name: str) -> int:
+        """Binary search the name ordered node index, raises GraphError for an unknown node"""
+        low, high = 0, self.node_count
+        while low < high:
+            middle = (low + high) // 2
+            if self.node_name(self._sorted[middle]) < name:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.node_count and self.node_name(self._sorted[low]) == name:
+            return self._sorted[low]
+        raise GraphError(f"Endpoint {name} is not present in the graph")
+
+    def neighbors(self, node: int) -> memoryview:
+        return self.targets[self.offsets[node] : self.offsets[node + 1]]
+
+    def degree(self, node: int) -> int:
+        return self.offsets[node + 1] - self.offsets[node]
+
+    def _value(self, column: memoryview, row: int) -> Any:
+        value = column[row]
+        if column.format == _STRING_COLUMN:
+            return None if value == -1 else self.string(value)
+        if column.format == _INT_COLUMN:
+            return None if value == _MISSING_INT else value
+        return None if math.isnan(value) else value
+
+    def _attributes(self, columns: Dict[str, memoryview], row: int) -> Dict[str, Any]:
+        attributes = {}
+        for key, column in columns.items():
+            value = self._value(column, row)
+            if value is not None:
+                attributes[key] = value
+        return attributes
+
+    def node_attributes(self, node: int) -> Dict[str, Any]:
+        return self._attributes(self._node_columns, node)
+
+    def edge_attributes(self, edge_id: int) -> Dict[str, Any]:
+        return self._attributes(self._edge_columns, edge_id)
+
+    def to_networkx_graph(self) -> Graph:
+        """Materialize the snapshot as a networkx graph"""
+        graph = Graph(**self.graph_attributes)
+        names = [self.node_name(node) for node in range(self.node_count)]
+        node_columns = [(key, self._decoded(column)) for key, column in self._node_columns.items()]
+        for node, name in enumerate(names):
+            graph.add_node(name, **{key: values[node] for key, values in node_columns if values[node] is not None})
+        edge_columns = [(key, self._decoded(column)) for key, column in self._edge_columns.items()]
+        for edge_id in range(self.edge_count):
+            graph.add_edge(
+                names[self.edge_ep1[edge_id]],
+                names[self.edge_ep2[edge_id]],
+                **{key: values[edge_id] for key, values in edge_columns if values[edge_id] is not None},
+            )
+        return graph
+
+    def _decoded(self, column: memoryview) -> List[Any]:
+        """Decode a whole column, strings are decoded once per distinct value"""
+        if column.format != _STRING_COLUMN:
+            return [self._value(column, row) for row in range(len(column))]
+        cache: Dict[int, Optional[str]] = {-1: None}
+        values = []
+        for sid in column:
+            value = cache.get(sid)
+            if value is None and sid != -1:
+                value = cache[sid] = self.string(sid)
+            values.append(value)
+        return values
+
+    def to_service(self) -> InfraGraphService:
+        """Return an InfraGraphService serving the snapshot graph and annotations"""
+        service = InfraGraphService()
+        service.restore_graph(
+            self.infrastructure, self.to_networkx_graph(), link_annotations=self.link_annotations
+        )
+        return service
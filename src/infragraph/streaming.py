@@ -0,0 +1,333 @@
+"""
+Incremental set_graph and annotate_graph from client streamed chunks.
+
+The x-stream client rpcs of infragraph.proto send a serialized message as
+a sequence of Data chunks. Instead of joining the chunks and decoding one
+monolithic message, the top level fields of the message are decoded as
+soon as their bytes are complete:
+- StreamingGraphBuilder expands every device, instance and edge of an
+  Infrastructure while the rest of the upload is still in flight
+- iter_annotation_batches turns the nodes, edges, links and graph
+  records of an Annotation into annotate_graph batches
+
+Only the bytes of one incomplete record are buffered. Chunks may split the
+message anywhere, as the generated GrpcApi client does, or carry whole
+records, as infrastructure_chunks and annotation_chunks do. Repeated
+fields of concatenated messages are merged, so both are the same message.
+
+Records are processed in arrival order. An instance is expanded once its
+device and the devices composed into it are known, an edge once both of
+its instances are expanded and its link is known. Anything still waiting
+is expanded by finish.
+
+Example:
+    builder = StreamingGraphBuilder()
+    for data in request_iterator:
+        builder.feed(data.datum)
+    service.restore_graph(*builder.finish())
+"""
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from google.protobuf import json_format
+from networkx import Graph
+from infragraph import Annotation, Component, Device, Infrastructure, InfrastructureEdge, Instance, Link
+from infragraph import infragraph_pb2 as pb2
+from infragraph.infragraph_service import InfraGraphService, DeviceData
+from infragraph.infrastructure_loader import decode_trusted
+
+_WIRE_VARINT = 0
+_WIRE_FIXED64 = 1
+_WIRE_LENGTH_DELIMITED = 2
+_WIRE_FIXED32 = 5
+
+
+def _read_varint(buffer: bytearray, offset: int) -> Optional[Tuple[int, int]]:
+    """Return the varint at offset and the offset after it, None if the buffer ends first"""
+    result = 0
+    shift = 0
+    while offset < len(buffer):
+        byte = buffer[offset]
+        offset += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, offset
+        shift += 7
+    return None
+
+
+class MessageFieldReader:
+    """Splits a protobuf byte stream into its top level fields as they complete"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> List[Tuple[int, Any]]:
+        """Add bytes and return the (field number, value) of every field completed by them.
+
+        Values of length delimited fields are bytes, other values are ints.
+        """
+        buffer = self._buffer
+        buffer += data
+        fields = []
+        offset = 0
+        while offset < len(buffer):
+            tag = _read_varint(buffer, offset)
+            if tag is None:
+                break
+            key, start = tag
+            number, wire_type = key >> 3, key & 0x07
+            if wire_type == _WIRE_VARINT:
+                value = _read_varint(buffer, start)
+                if value is None:
+                    break
+                value, end = value
+            elif wire_type == _WIRE_LENGTH_DELIMITED:
+                length = _read_varint(buffer, start)
+                if length is None:
+                    break
+                length, start = length
+                end = start + length
+                if end > len(buffer):
+                    break
+                value = bytes(buffer[start:end])
+            elif wire_type in (_WIRE_FIXED64, _WIRE_FIXED32):
+                end = start + (8 if wire_type == _WIRE_FIXED64 else 4)
+                if end > len(buffer):
+                    break
+                value = int.from_bytes(buffer[start:end], "little")
+            else:
+                raise ValueError(f"Unsupported protobuf wire type {wire_type} for field {number}")
+            fields.append((number, value))
+            offset = end
+        del buffer[:offset]
+        return fields
+
+    def close(self) -> None:
+        """Raise ValueError if the stream ended inside a field"""
+        if self._buffer:
+            raise ValueError(f"Message stream ended with {len(self._buffer)} bytes of an incomplete field")
+
+
+def _to_dict(message) -> Dict[str, Any]:
+    return json_format.MessageToDict(message, preserving_proto_field_name=True)
+
+
+class StreamingGraphBuilder:
+    """Expands an Infrastructure into a graph while its serialized records arrive.
+
+    Trusted streams, e.g. sent by infragraph itself, are decoded without
+    validation and skip the graph validation passes like set_graph.
+    """
+
+    _INFRASTRUCTURE_FIELDS = {field.number: field.name for field in pb2.Infrastructure.DESCRIPTOR.fields}
+
+    def __init__(self, trusted: bool = False):
+        self._trusted = trusted
+        self._reader = MessageFieldReader()
+        self._infrastructure = Infrastructure()
+        self._builder = InfraGraphService()
+        self._builder._infrastructure = self._infrastructure
+        self._builder._graph = Graph()
+        self._devices: Dict[str, Device] = {}
+        self._parsed_devices: Set[str] = set()
+        self._links: Dict[str, Link] = {}
+        self._instances: Dict[str, Instance] = {}
+        self._expanded_instances: Set[str] = set()
+        self._link_edge_attrs: Dict[str, Dict[str, Any]] = {}
+        self._pending_instances: List[Instance] = []
+        self._pending_edges: List[InfrastructureEdge] = []
+
+    def _decode(self, cls, message_class, payload: bytes):
+        data = _to_dict(message_class.FromString(payload))
+        if self._trusted:
+            return decode_trusted(cls(), data)
+        return cls().deserialize(data)
+
+    def feed(self, data: bytes) -> None:
+        """Process the records completed by the next chunk of a serialized Infrastructure"""
+        for number, value in self._reader.feed(data):
+            name = self._INFRASTRUCTURE_FIELDS.get(number)
+            if name == "devices":
+                self.add_device(self._decode(Device, pb2.Device, value))
+            elif name == "links":
+                self.add_link(self._decode(Link, pb2.Link, value))
+            elif name == "instances":
+                self.add_instance(self._decode(Instance, pb2.Instance, value))
+            elif name == "edges":
+                self.add_edge(self._decode(InfrastructureEdge, pb2.InfrastructureEdge, value))
+            elif name in ("name", "description"):
+                text = value.decode("utf-8")
+                setattr(self._infrastructure, name, text)
+                self._builder._graph.graph[name] = text
+
+    def add_device(self, device: Device) -> None:
+        self._infrastructure.devices.append(device)
+        self._devices[device.name] = device
+        self._builder._parse_device(device)
+        self._progress()
+
+    def add_link(self, link: Link) -> None:
+        self._infrastructure.links.append(link)
+        self._links[link.name] = link
+        self._progress()
+
+    def add_instance(self, instance: Instance) -> None:
+        self._infrastructure.instances.append(instance)
+        self._instances[instance.name] = instance
+        self._pending_instances.append(instance)
+        self._progress()
+
+    def add_edge(self, edge: InfrastructureEdge) -> None:
+        self._infrastructure.edges.append(edge)
+        self._pending_edges.append(edge)
+        self._progress()
+
+    def _composed_devices(self, device_name: str) -> Optional[Set[str]]:
+        """Return the device and every device composed into it, None while one is missing"""
+        names = set()
+        stack = [device_name]
+        while stack:
+            name = stack.pop()
+            if name in names:
+                continue
+            if name not in self._devices:
+                return None
+            names.add(name)
+            stack.extend(
+                component.name for component in self._devices[name].components if component.choice == Component.DEVICE
+            )
+        return names
+
+    def _instance_name(self, edge_endpoint) -> str:
+        return edge_endpoint.instance.split(".")[0].split("[")[0]
+
+    def _progress(self) -> None:
+        builder = self._builder
+        for device_name, device in self._devices.items():
+            if device_name not in self._parsed_devices and self._composed_devices(device_name) is not None:
+                builder._parse_edges_of_device(device)
+                self._parsed_devices.add(device_name)
+        if self._pending_instances:
+            waiting = []
+            for instance in self._pending_instances:
+                devices = self._composed_devices(instance.device)
+                if devices is not None and devices <= self._parsed_devices:
+                    builder._generate_instance(instance)
+                    self._expanded_instances.add(instance.name)
+                else:
+                    waiting.append(instance)
+            self._pending_instances = waiting
+        if self._pending_edges:
+            ready = []
+            waiting = []
+            for edge in self._pending_edges:
+                if (
+                    edge.link in self._links
+                    and self._instance_name(edge.ep1) in self._expanded_instances
+                    and self._instance_name(edge.ep2) in self._expanded_instances
+                ):
+                    ready.append(edge)
+                else:
+                    waiting.append(edge)
+            if ready:
+                builder._add_infrastructure_edges(ready, self._links, self._instances, self._link_edge_attrs)
+            self._pending_edges = waiting
+
+    def finish(self) -> Tuple[Infrastructure, Graph, Dict[str, DeviceData]]:
+        """Expand the remaining records and validate the graph.
+
+        Returns the arguments of InfraGraphService.restore_graph.
+        """
+        self._reader.close()
+        builder = self._builder
+        for device_name, device in self._devices.items():
+            if device_name not in self._parsed_devices:
+                builder._parse_edges_of_device(device)
+        for instance in self._pending_instances:
+            builder._generate_instance(instance)
+        builder._add_infrastructure_edges(self._pending_edges, self._links, self._instances, self._link_edge_attrs)
+        self._pending_instances = []
+        self._pending_edges = []
+        # _validate_device_edges is not applicable once infrastructure edges
+        # are interleaved, device edges are prefixed with their instance
+        # by _generate_device_edges and cannot cross instances
+        if not self._trusted:
+            builder._validate_graph()
+        return self._infrastructure, builder._graph, builder._device_data
+
+
+_ANNOTATION_FIELDS = {
+    field.number: (field.name, field.message_type._concrete_class) for field in pb2.Annotation.DESCRIPTOR.fields
+}
+
+
+def iter_annotation_batches(chunks: Iterable[bytes], batch_size: int = 1024) -> Iterator[Annotation]:
+    """Yield Annotation batches of at most batch_size records from the chunks of a serialized Annotation"""
+    reader = MessageFieldReader()
+    batch: Dict[str, List[Dict[str, Any]]] = {}
+    count = 0
+    for chunk in chunks:
+        for number, value in reader.feed(chunk):
+            field = _ANNOTATION_FIELDS.get(number)
+            if field is None:
+                continue
+            name, message_class = field
+            batch.setdefault(name, []).append(_to_dict(message_class.FromString(value)))
+            count += 1
+            if count == batch_size:
+                yield Annotation().deserialize(batch)
+                batch = {}
+                count = 0
+    reader.close()
+    if count:
+        yield Annotation().deserialize(batch)
+
+
+def _chunks(message_class, records: Iterator[Tuple[str, Any]], records_per_chunk: int) -> Iterator[pb2.Data]:
+    message = message_class()
+    count = 0
+    for name, record in records:
+        getattr(message, name).append(record)
+        count += 1
+        if count == records_per_chunk:
+            datum = message.SerializeToString()
+            yield pb2.Data(chunk_size=len(datum), datum=datum)
+            message = message_class()
+            count = 0
+    if count:
+        datum = message.SerializeToString()
+        yield pb2.Data(chunk_size=len(datum), datum=datum)
+
+
+def infrastructure_chunks(infrastructure: Infrastructure, records_per_chunk: int = 64) -> Iterator[pb2.Data]:
+    """Yield an Infrastructure as Data chunks of whole records for the streamSetGraph rpc.
+
+    Devices come first, then links, instances and edges, so the server can
+    expand each instance and edge as soon as it arrives.
+    """
+    header = pb2.Infrastructure(name=infrastructure.name, description=infrastructure.description)
+    datum = header.SerializeToString()
+    yield pb2.Data(chunk_size=len(datum), datum=datum)
+
+    def records():
+        for name, message_class in (
+            ("devices", pb2.Device),
+            ("links", pb2.Link),
+            ("instances", pb2.Instance),
+            ("edges", pb2.InfrastructureEdge),
+        ):
+            for item in getattr(infrastructure, name):
+                yield name, json_format.ParseDict(item.serialize("dict"), message_class())
+
+    yield from _chunks(pb2.Infrastructure, records(), records_per_chunk)
+
+
+def annotation_chunks(annotation: Annotation, records_per_chunk: int = 1024) -> Iterator[pb2.Data]:
+    """Yield an Annotation as Data chunks of whole records for the streamAnnotateGraph rpc"""
+
+    def records():
+        for name, message_class in _ANNOTATION_FIELDS.values():
+            for item in getattr(annotation, name):
+                yield name, json_format.ParseDict(item.serialize("dict"), message_class())
+
+    yield from _chunks(pb2.Annotation, records(), records_per_chunk)
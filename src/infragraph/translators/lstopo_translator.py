@@ -7,6 +7,7 @@ import xml.etree.ElementTree as ET
 from pathlib import Path
 from typing import Dict, List, Tuple
 from infragraph import *
+from infragraph.compression import format_extension, open_file, split_compression
 
 # Constants
 CPU_FABRICS = {
@@ -42,12 +43,14 @@ class LstopoParser:
     """Parser for lstopo XML files to generate device topology graphs."""
     
     def __init__(self, file_path: str, device_name: str | None = None):
-        _, ext = os.path.splitext(file_path)
+        # lstopo.xml, lstopo.xml.gz, ...
+        _, ext = os.path.splitext(split_compression(file_path)[0])
         if ext.lower() != ".xml":
             raise ValueError(
                 f"LstopoParser expects an XML file, got '{ext}' instead."
             )
-        self.tree = ET.parse(file_path)
+        with open_file(file_path, "rb") as fp:
+            self.tree = ET.parse(fp)
         self.root = self.tree.getroot()
         self.device = Device()
         self.device_name = device_name
@@ -597,8 +600,7 @@ def run_lstopo_parser(
     if os.path.isdir(output_file) or output_file.endswith(("/", os.sep)):
         output_file = os.path.join(output_file, f"devices.{dump_format.lower()}")
 
-    _, ext = os.path.splitext(output_file)
-    ext = ext.lstrip(".").lower()
+    ext = format_extension(output_file)
 
     if ext != dump_format.lower():
         raise ValueError(
@@ -614,7 +616,7 @@ def run_lstopo_parser(
     serialized_data = device_model.serialize(dump_format)
 
     Path(output_file).parent.mkdir(parents=True, exist_ok=True)
-    with open(output_file, "w", encoding="utf-8") as f:
+    with open_file(output_file, "wt") as f:
         f.write(serialized_data)
         print("translated output file", output_file)
 
@@ -6,6 +6,7 @@ import ctypes
 from pathlib import Path
 from typing import Dict, List, Tuple
 from infragraph import *
+from infragraph.compression import compression_extension, format_extension, open_file, split_compression
 from infragraph.infragraph_service import InfraGraphService
 
 # Constants
@@ -80,13 +81,15 @@ class NcclParser:
     """Parser for NCCL XML topology files to generate device topology graphs."""
 
     def __init__(self, file_path: str, device_name: str):
-        _, ext = os.path.splitext(file_path)
+        # nccl topology xml, optionally compressed: topo.xml, topo.xml.gz, ...
+        _, ext = os.path.splitext(split_compression(file_path)[0])
         if ext.lower() != ".xml":
             raise ValueError(
                 f"NcclParser expects an XML file, got '{ext}' instead."
             )
         self.file_path = file_path
-        self.tree = ET.parse(file_path)
+        with open_file(file_path, "rb") as fp:
+            self.tree = ET.parse(fp)
         self.root = self.tree.getroot()
         self.device = Device()
         self.device.name = device_name
@@ -573,8 +576,7 @@ def run_nccl_parser(
     if os.path.isdir(output_file) or output_file.endswith(("/", os.sep)):
         output_file = os.path.join(output_file, f"device.{dump_format.lower()}")
 
-    _, ext = os.path.splitext(output_file)
-    ext = ext.lstrip(".").lower()
+    ext = format_extension(output_file)
 
     if ext != dump_format.lower():
         raise ValueError(
@@ -590,14 +592,15 @@ def run_nccl_parser(
     serialized_data = device_model.serialize(dump_format)
 
     Path(output_file).parent.mkdir(parents=True, exist_ok=True)
-    with open(output_file, "w", encoding="utf-8") as f:
+    with open_file(output_file, "wt") as f:
         f.write(serialized_data)
         print(f"Translated output written to: {output_file}")
     req = GraphRequest()
     req.infragraph.annotations.choice = "full"
     annotation_output = parser.get_annotations().get_graph(req)
-    annotation_file = str(Path(output_file).parent / "annotated_infragraph.json")
-    with open(annotation_file, "w", encoding="utf-8") as f:
+    # compressed the same way as the device output
+    annotation_file = str(Path(output_file).parent / ("annotated_infragraph.json" + compression_extension(output_file)))
+    with open_file(annotation_file, "wt") as f:
         f.write(annotation_output)
         print(f"Annotated infragraph (infrastructure + annotations) written to: {annotation_file}")
     return serialized_data
@@ -1,11 +1,11 @@
 import os
 import shutil
-import yaml
 import json
-from json import JSONDecodeError
 from yaml import YAMLError
 from infragraph import Infrastructure, Annotation
 from infragraph.infragraph_service import InfraGraphService
+from infragraph.compression import read_text
+from infragraph.infrastructure_loader import parse_payload
 
 class Visualizer:
     """Builds vis.js-ready view JSON for an infrastructure graph and writes
@@ -316,19 +316,14 @@ class Visualizer:
 
     @staticmethod
     def _load_infrastructure(input_file):
-        """load the yaml/json file
+        """load the yaml/json file, optionally compressed e.g. fabric.yaml.gz
         Params:
                 input_file: given yaml/json file
                 infrastructure: infrastructure object"""
         if not input_file:
             raise ValueError("Either input_file or infrastructure must be provided")
         try:
-            with open(input_file, "r", encoding="utf-8") as f:
-                try:
-                    data = json.load(f)
-                except (JSONDecodeError, ValueError):
-                    f.seek(0)
-                    data = yaml.safe_load(f)
+            data = parse_payload(read_text(input_file))
         except FileNotFoundError:
             raise FileNotFoundError(f"Input file not found: '{input_file}'")
         except YAMLError as e:
@@ -0,0 +1,122 @@
+import pytest
+from infragraph import *
+from infragraph.blueprints.fabrics.closfabric import ClosFabric
+from infragraph.infragraph_service import InfraGraphService, GraphError
+from infragraph.analytics import congestion
+from infragraph.analytics.congestion import CongestionEstimator
+
+
+def _make_ranked_service():
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    annotation = Annotation()
+    for idx, npu_endpoint in enumerate(service.get_endpoints("type", Component.XPU)):
+        annotation.nodes.add(name=npu_endpoint).attributes.add(attribute="rank", value=str(idx))
+    service.annotate_graph(annotation)
+    return service
+
+
+def _inbound_load(estimator, result, node):
+    """Sum of the load arriving at a node over all of its edges"""
+    compact = estimator.compact_graph
+    target = compact.index[node]
+    total = 0.0
+    for edge_id, (ep1, ep2) in enumerate(compact.edge_endpoints):
+        if ep2 == target:
+            total += result.forward_load[edge_id]
+        elif ep1 == target:
+            total += result.reverse_load[edge_id]
+    return total
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "pattern",
+    [
+        CongestionEstimator.RING_ALL_REDUCE,
+        CongestionEstimator.ALL_TO_ALL,
+        CongestionEstimator.HALVING_DOUBLING,
+    ],
+)
+async def test_collective_traffic_is_delivered(pattern):
+    """Every destination rank receives exactly the volume the pattern sends to it"""
+    service = _make_ranked_service()
+    estimator = CongestionEstimator(service)
+    assert estimator.rank_count == 8
+
+    demand = estimator.traffic_matrix(pattern, message_size=16.0)
+    result = estimator.estimate(pattern, message_size=16.0)
+    graph = service.get_networkx_graph()
+    for node in service.get_endpoints("rank"):
+        rank = int(graph.nodes[node]["rank"])
+        expected = sum(demand.get(rank, {}).values())
+        assert _inbound_load(estimator, result, node) == pytest.approx(expected)
+    assert result.max_congestion == pytest.approx(max(result.utilization))
+    assert result.max_congestion > 0
+
+
+@pytest.mark.asyncio
+async def test_ecmp_splits_over_spines():
+    """Traffic between leaves is split equally over all spine switches"""
+    service = _make_ranked_service()
+    estimator = CongestionEstimator(service, ranks={0: "host.0.xpu.0", 1: "host.1.xpu.0"})
+    result = estimator.estimate_traffic({1: {0: 30.0}})
+
+    compact = estimator.compact_graph
+    spine_loads = []
+    for edge_id, (ep1, ep2) in enumerate(compact.edge_endpoints):
+        if compact.edge_links[edge_id] == "spine-link":
+            load = max(result.forward_load[edge_id], result.reverse_load[edge_id])
+            if load > 0:
+                spine_loads.append(load)
+    # up to 3 spines and back down to the destination leaf
+    assert sorted(spine_loads) == pytest.approx([10.0] * 6)
+
+
+@pytest.mark.asyncio
+async def test_zero_volume_demand():
+    """Zero volume demands route nothing instead of failing as unreachable"""
+    service = _make_ranked_service()
+    estimator = CongestionEstimator(service)
+    assert estimator.estimate(CongestionEstimator.ALL_TO_ALL, message_size=0.0).max_congestion == 0.0
+    result = estimator.estimate_traffic({1: {0: 0.0, 2: 4.0}})
+    assert result.max_congestion > 0
+    assert estimator.estimate_traffic({1: {0: 0.0}}).max_congestion == 0.0
+
+
+@pytest.mark.asyncio
+async def test_halving_doubling_requires_power_of_two():
+    """Halving doubling rejects rank counts that are not a power of two"""
+    service = _make_ranked_service()
+    estimator = CongestionEstimator(
+        service, ranks={0: "host.0.xpu.0", 1: "host.1.xpu.0", 2: "host.2.xpu.0"}
+    )
+    with pytest.raises(GraphError):
+        estimator.estimate(CongestionEstimator.HALVING_DOUBLING)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "pattern",
+    [
+        CongestionEstimator.RING_ALL_REDUCE,
+        CongestionEstimator.ALL_TO_ALL,
+        CongestionEstimator.HALVING_DOUBLING,
+    ],
+)
+async def test_block_sweep_matches_python_sweep(pattern, monkeypatch):
+    """The numpy block sweep routes the same load as the per destination Python sweep"""
+    pytest.importorskip("numpy")
+    service = _make_ranked_service()
+    estimator = CongestionEstimator(service)
+    estimator._BLOCK_ENTRIES = 1
+    blocks = estimator.estimate(pattern, message_size=16.0)
+    monkeypatch.setattr(congestion, "numpy", None)
+    python = CongestionEstimator(service).estimate(pattern, message_size=16.0)
+    assert list(blocks.forward_load) == pytest.approx(list(python.forward_load))
+    assert list(blocks.reverse_load) == pytest.approx(list(python.reverse_load))
+    assert blocks.max_edge == python.max_edge
+
+
+if __name__ == "__main__":
+    pytest.main(["-s", __file__])
@@ -0,0 +1,83 @@
+import pytest
+import networkx
+from infragraph import *
+from infragraph.blueprints.fabrics.closfabric import ClosFabric
+from infragraph.blueprints.fabrics.clos_fat_tree_fabric import ClosFatTreeFabric
+from infragraph.blueprints.devices.generic.server import Server
+from infragraph.blueprints.devices.generic.generic_switch import Switch
+from infragraph.infragraph_service import InfraGraphService, GraphError
+from infragraph.analytics.distance_oracle import DistanceOracle
+
+
+@pytest.mark.asyncio
+async def test_distance_matches_networkx():
+    """Oracle hop counts match networkx shortest path lengths for every xpu pair"""
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    oracle = DistanceOracle(service)
+
+    graph = service.get_networkx_graph()
+    xpus = service.get_endpoints("type", Component.XPU)
+    for src in xpus:
+        expected = networkx.single_source_shortest_path_length(graph, src)
+        for dst in xpus:
+            assert oracle.distance(src, dst) == expected[dst]
+
+
+@pytest.mark.asyncio
+async def test_distance_all_pairs_fat_tree():
+    """Oracle hop counts match networkx for all node pairs of a fat tree"""
+    service = InfraGraphService()
+    service.set_graph(ClosFatTreeFabric(Switch(port_count=8), Server(), 2, []))
+    oracle = DistanceOracle(service)
+
+    for src, lengths in networkx.all_pairs_shortest_path_length(service.get_networkx_graph()):
+        for dst, hops in lengths.items():
+            assert oracle.distance(src, dst) == hops
+
+
+@pytest.mark.asyncio
+async def test_distance_oracle_stats():
+    """Build statistics are reported and the oracle tracks graph replacement"""
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    oracle = DistanceOracle(service)
+
+    stats = oracle.stats
+    assert stats["nodes"] == service.get_networkx_graph().number_of_nodes()
+    assert stats["label_entries"] >= stats["nodes"]
+    assert stats["build_seconds"] > 0
+    assert stats["memory_bytes"] > 0
+    assert oracle.is_current(service)
+    service.set_graph(ClosFabric())
+    assert not oracle.is_current(service)
+
+
+@pytest.mark.asyncio
+async def test_distance_oracle_current_after_annotations():
+    """Annotations written after a snapshot keep the oracle current"""
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    oracle = DistanceOracle(service)
+    snapshot = service.snapshot()
+    annotation = Annotation()
+    annotation.nodes.add(name="host.0.xpu.0").attributes.add(attribute="rank", value="0")
+    service.annotate_graph(annotation)
+    assert service.get_networkx_graph() is not snapshot.get_networkx_graph()
+    assert oracle.is_current(service) and oracle.is_current(service.snapshot())
+    service.set_graph(ClosFabric())
+    assert not oracle.is_current(service) and oracle.is_current(snapshot)
+
+
+@pytest.mark.asyncio
+async def test_distance_unknown_endpoint():
+    """Unknown endpoints raise a GraphError"""
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    oracle = DistanceOracle(service)
+    with pytest.raises(GraphError):
+        oracle.distance("host.0.xpu.0", "host.99.xpu.0")
+
+
+if __name__ == "__main__":
+    pytest.main(["-s", __file__])
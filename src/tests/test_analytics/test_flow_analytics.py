@@ -0,0 +1,71 @@
+import pytest
+from infragraph import *
+from infragraph.blueprints.fabrics.closfabric import ClosFabric
+from infragraph.blueprints.fabrics.clos_fat_tree_fabric import ClosFatTreeFabric
+from infragraph.blueprints.devices.generic.server import Server
+from infragraph.blueprints.devices.generic.generic_switch import Switch
+from infragraph.infragraph_service import InfraGraphService, GraphError
+from infragraph.analytics.flow import FlowAnalytics
+
+
+def _make_analytics(infrastructure):
+    service = InfraGraphService()
+    service.set_graph(infrastructure)
+    return FlowAnalytics(service)
+
+
+@pytest.mark.asyncio
+async def test_min_cut_between_hosts():
+    """The min cut between two hosts is bounded by the host to leaf links"""
+    analytics = _make_analytics(ClosFabric())
+    cut = analytics.min_cut(r"host\.0\.xpu\.\d+", r"host\.1\.xpu\.\d+")
+    assert cut.value == 200
+    assert sorted(cut.edges) == [
+        ("host.0.nic.0", "leafsw.0.port.0"),
+        ("host.0.nic.1", "leafsw.0.port.1"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_min_cut_query_request_selection():
+    """Node sets can be selected using a QueryRequest"""
+    analytics = _make_analytics(ClosFabric())
+    request = QueryRequest()
+    node_filter = request.node_filters.add(name="host 2 xpus")
+    node_filter.choice = QueryNodeFilter.ID_FILTER
+    node_filter.id_filter.operator = QueryNodeId.REGEX
+    node_filter.id_filter.value = r"host\.2\.xpu\.\d+"
+    assert analytics.max_flow(request, ["host.3.xpu.0"]) == 200
+
+
+@pytest.mark.asyncio
+async def test_bisection_bandwidth_fat_tree():
+    """A non blocking fat tree has full bisection bandwidth"""
+    analytics = _make_analytics(ClosFatTreeFabric(Switch(port_count=8), Server(), 2, []))
+    xpus = analytics.select_nodes(r"server\.\d+\.xpu\.\d+")
+    cut = analytics.bisection_bandwidth(xpus)
+    host_count = len(xpus) // 2
+    # each host has 2 nics of 100G and half of the hosts send to the other half
+    assert cut.value == host_count // 2 * 2 * 100
+
+
+@pytest.mark.asyncio
+async def test_min_cuts_parallel_matches_serial():
+    """Parallel cut queries return the same values as serial queries"""
+    analytics = _make_analytics(ClosFabric())
+    pairs = [(rf"host\.{i}\.xpu\.\d+", rf"host\.{(i + 1) % 4}\.xpu\.\d+") for i in range(4)]
+    serial = analytics.min_cuts(pairs, max_workers=1)
+    parallel = analytics.min_cuts(pairs, max_workers=2)
+    assert [cut.value for cut in serial] == [cut.value for cut in parallel]
+
+
+@pytest.mark.asyncio
+async def test_min_cut_overlapping_sets():
+    """A node cannot be both a source and a sink"""
+    analytics = _make_analytics(ClosFabric())
+    with pytest.raises(GraphError):
+        analytics.min_cut(["host.0.xpu.0"], ["host.0.xpu.0", "host.1.xpu.0"])
+
+
+if __name__ == "__main__":
+    pytest.main(["-s", __file__])
@@ -0,0 +1,108 @@
+import time
+import pytest
+from infragraph import *
+from infragraph.blueprints.fabrics.closfabric import ClosFabric
+from infragraph.blueprints.devices.generic.server import Server
+from infragraph.infragraph_service import InfraGraphService, GraphError
+from infragraph.analytics.distance_oracle import DistanceOracle
+from infragraph.analytics.placement import RankPlacement
+
+# rank r talks heavily to rank r + 4, enumeration order puts them on different hosts
+PAIRED_COMMUNICATION = {(rank, rank + 4): 100.0 for rank in range(4)}
+
+
+def _host(xpu):
+    return ".".join(xpu.split(".")[:2])
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("max_seconds", [0, 0.2])
+async def test_placement_keeps_heavy_pairs_on_one_host(max_seconds):
+    """Heavily communicating ranks are placed on the same host"""
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    placement = RankPlacement(service)
+    mapping = placement.place(PAIRED_COMMUNICATION, rank_count=8, max_seconds=max_seconds)
+
+    assert sorted(mapping) == list(range(8))
+    assert len(set(mapping.values())) == 8
+    for rank in range(4):
+        assert _host(mapping[rank]) == _host(mapping[rank + 4])
+    enumeration = {rank: xpu for rank, xpu in enumerate(placement.candidates)}
+    assert placement.cost(PAIRED_COMMUNICATION, mapping) < placement.cost(PAIRED_COMMUNICATION, enumeration)
+
+
+@pytest.mark.asyncio
+async def test_placement_annotation():
+    """The placement is emitted as a rank Annotation that can be applied to the graph"""
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    placement = RankPlacement(service)
+    mapping = placement.place([(0, 1, 1.0), (1, 2, 1.0), (2, 3, 1.0)], max_seconds=0)
+    service.annotate_graph(placement.to_annotation(mapping))
+
+    graph = service.get_networkx_graph()
+    for rank, xpu in mapping.items():
+        assert graph.nodes[xpu]["rank"] == str(rank)
+    assert len(service.get_endpoints("rank")) == 4
+
+
+@pytest.mark.asyncio
+async def test_placement_budget_includes_oracle_build():
+    """A budget used up by the DistanceOracle build returns the greedy placement"""
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    greedy = RankPlacement(service).place(PAIRED_COMMUNICATION, rank_count=8, max_seconds=0)
+    placement = RankPlacement(service)
+    assert placement.place(PAIRED_COMMUNICATION, rank_count=8, max_seconds=1e-9) == greedy
+    assert placement._oracle is None
+    with pytest.raises(TimeoutError):
+        DistanceOracle(service, deadline=time.perf_counter())
+
+
+@pytest.mark.asyncio
+async def test_placement_scales_to_64k_ranks():
+    """64k ranks of a ring plus heavy pairs are placed within a minute"""
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    rank_count = 1 << 16
+    candidates = [f"host.{rank // 8}.xpu.{rank % 8}" for rank in range(rank_count)]
+    communication = [(rank, (rank + 1) % rank_count, 1.0) for rank in range(rank_count)]
+    communication.extend((rank, rank ^ 1024, 100.0) for rank in range(rank_count))
+    start = time.perf_counter()
+    mapping = RankPlacement(service, candidates).place(communication, rank_count=rank_count, max_seconds=0)
+    assert time.perf_counter() - start < 60
+    assert len(set(mapping.values())) == rank_count
+    for rank in range(0, rank_count, 997):
+        assert abs(candidates.index(mapping[rank]) - candidates.index(mapping[rank ^ 1024])) < 8
+
+
+@pytest.mark.asyncio
+async def test_placement_on_disconnected_xpus():
+    """Ranks on xpus without a path between them cost infinity and annealing moves them together"""
+    server = Server()
+    infrastructure = Infrastructure(name="islands")
+    infrastructure.devices.append(server)
+    infrastructure.instances.add(name="host", device=server.name, count=2)
+    service = InfraGraphService()
+    service.set_graph(infrastructure)
+    placement = RankPlacement(service, ["host.0.xpu.0", "host.1.xpu.0", "host.0.xpu.1", "host.1.xpu.1"])
+    communication = {(0, 1): 1.0}
+    greedy = placement.place(communication, max_seconds=0)
+    assert placement.cost(communication, greedy) == float("inf")
+    mapping = placement.place(communication, max_seconds=0.2)
+    assert _host(mapping[0]) == _host(mapping[1])
+    assert placement.cost(communication, mapping) < float("inf")
+
+
+@pytest.mark.asyncio
+async def test_placement_too_many_ranks():
+    """More ranks than xpus cannot be placed"""
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    with pytest.raises(GraphError):
+        RankPlacement(service).place({(0, 8): 1.0}, max_seconds=0)
+
+
+if __name__ == "__main__":
+    pytest.main(["-s", __file__])
@@ -0,0 +1,90 @@
+import io
+import json
+import pytest
+import networkx
+from infragraph.blueprints.fabrics.closfabric import ClosFabric
+from infragraph.blueprints.fabrics.clos_fat_tree_fabric import ClosFatTreeFabric
+from infragraph.blueprints.fabrics.multi_host_debruijn_fabric import MultiHostDeBruijnFabric
+from infragraph.blueprints.devices.generic.server import Server
+from infragraph.blueprints.devices.generic.generic_switch import Switch
+from infragraph.infragraph_service import InfraGraphService, InfrastructureError
+from infragraph.analytics.routing import RoutingTableGenerator
+
+
+def _switch_only_next_hops(graph, switch, host, switch_prefixes):
+    """Reference next hops using networkx on the switch only subgraph plus one host"""
+    def keep(node):
+        prefix = ".".join(node.split(".")[:2])
+        return prefix in switch_prefixes or prefix == host
+    subgraph = graph.subgraph([n for n in graph.nodes if keep(n)])
+    host_nodes = [n for n in subgraph.nodes if n.startswith(host + ".")]
+    lengths = networkx.multi_source_dijkstra_path_length(subgraph, host_nodes)
+    candidates = {}
+    for port in subgraph.nodes:
+        if not port.startswith(switch + "."):
+            continue
+        for neighbor in subgraph.neighbors(port):
+            if not neighbor.startswith(switch + ".") and neighbor in lengths:
+                candidates.setdefault(lengths[neighbor], set()).add(port)
+    return sorted(candidates[min(candidates)]) if candidates else None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "fabric",
+    [
+        ClosFatTreeFabric(Switch(port_count=8), Server(), 2, []),
+        MultiHostDeBruijnFabric(Switch(port_count=16), Server(), 2),
+    ],
+)
+async def test_routing_tables_match_shortest_paths(fabric):
+    """Every table entry is the set of ports starting a shortest path to the host"""
+    service = InfraGraphService()
+    service.set_graph(fabric)
+    generator = RoutingTableGenerator(service)
+    graph = service.get_networkx_graph()
+    switch_prefixes = set(generator.switches)
+
+    tables = dict(generator.iter_tables())
+    assert list(tables) == generator.switches
+    for switch, table in tables.items():
+        assert set(table) == set(generator.destinations)
+        for host, ports in table.items():
+            assert ports == _switch_only_next_hops(graph, switch, host, switch_prefixes)
+
+
+@pytest.mark.asyncio
+async def test_leaf_forwards_to_attached_host():
+    """A leaf switch forwards to its own host out of the ports wired to it"""
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    tables = dict(RoutingTableGenerator(service).iter_tables())
+    assert tables["leafsw.0"]["host.0"] == ["leafsw.0.port.0", "leafsw.0.port.1"]
+    assert tables["spinesw.0"]["host.0"] == ["spinesw.0.port.0"]
+    assert tables["leafsw.1"]["host.0"] == ["leafsw.1.port.2", "leafsw.1.port.3", "leafsw.1.port.4"]
+
+
+@pytest.mark.asyncio
+async def test_write_tables_streams_json_lines():
+    """Tables are written as one JSON object per switch"""
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    generator = RoutingTableGenerator(service)
+    fp = io.StringIO()
+    assert generator.write_tables(fp) == len(generator.switches)
+    lines = [json.loads(line) for line in fp.getvalue().splitlines()]
+    assert [line["switch"] for line in lines] == generator.switches
+    assert "host.3" in lines[0]["routes"]
+
+
+@pytest.mark.asyncio
+async def test_unknown_switch_device():
+    """Naming a switch device that has no instances is an error"""
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    with pytest.raises(InfrastructureError):
+        RoutingTableGenerator(service, switches=["not_a_device"])
+
+
+if __name__ == "__main__":
+    pytest.main(["-s", __file__])
@@ -0,0 +1,85 @@
+import json
+import pytest
+from infragraph import *
+from infragraph.blueprints.fabrics.closfabric import ClosFabric
+from infragraph.infragraph_service import InfraGraphService
+
+
+def _make_service():
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    return service
+
+
+def _annotation(node: str, attribute: str, value: str) -> Annotation:
+    annotation = Annotation()
+    annotation.nodes.add(name=node).attributes.add(attribute=attribute, value=value)
+    return annotation
+
+
+@pytest.mark.asyncio
+async def test_delta_holds_only_newer_writes():
+    """A delta since version N holds the attributes written after N with their current values"""
+    service = _make_service()
+    start = service.graph_version
+    service.annotate_graph(_annotation("host.0.xpu.0", "rank", "0"))
+    middle = service.graph_version
+    annotation = _annotation("host.0.xpu.1", "rank", "1")
+    annotation.links.add(name="pcie").attributes.add(attribute="util", value="0.5")
+    annotation.graph.add(attribute="experiment", value="run-3")
+    service.annotate_graph(annotation)
+    service.annotate_nodes("rank", {"host.0.xpu.0": "8"})
+    assert service.graph_version == middle + 2
+
+    delta = json.loads(service.get_annotation_delta(middle))
+    assert delta["version"] == service.graph_version
+    assert delta["reset"] is False
+    annotations = delta["annotations"]
+    assert annotations["nodes"] == [
+        {"name": "host.0.xpu.1", "attributes": [{"attribute": "rank", "value": "1"}]},
+        {"name": "host.0.xpu.0", "attributes": [{"attribute": "rank", "value": "8"}]},
+    ]
+    assert annotations["links"] == [{"name": "pcie", "attributes": [{"attribute": "util", "value": "0.5"}]}]
+    assert len(annotations["edges"]) == len(service._link_to_edges_map["pcie"])
+    assert annotations["graph"] == [{"attribute": "experiment", "value": "run-3"}]
+    Annotation().deserialize(annotations)
+
+    assert len(json.loads(service.get_annotation_delta(start))["annotations"]["nodes"]) == 2
+    empty = json.loads(service.get_annotation_delta(service.graph_version))["annotations"]
+    assert empty == {"nodes": [], "edges": [], "links": [], "graph": []}
+
+
+@pytest.mark.asyncio
+async def test_delta_link_value_is_the_link_annotation():
+    """A link reports the value of its link annotation, not that of an edge annotated later"""
+    service = _make_service()
+    annotation = Annotation()
+    annotation.links.add(name="pcie").attributes.add(attribute="util", value="0.5")
+    service.annotate_graph(annotation)
+    since = service.graph_version - 1
+    ep1, ep2 = service._link_to_edges_map["pcie"][0]
+    annotation = Annotation()
+    annotation.edges.add(ep1=ep1, ep2=ep2).attributes.add(attribute="util", value="0.9")
+    service.annotate_graph(annotation)
+    links = json.loads(service.get_annotation_delta(since))["annotations"]["links"]
+    assert links == [{"name": "pcie", "attributes": [{"attribute": "util", "value": "0.5"}]}]
+
+
+@pytest.mark.asyncio
+async def test_delta_after_set_graph_is_a_reset():
+    """A delta older than the last set_graph is flagged as a reset and holds the new graph annotations"""
+    service = _make_service()
+    service.annotate_graph(_annotation("host.0.xpu.0", "rank", "0"))
+    before = service.graph_version
+    service.set_graph(ClosFabric())
+    delta = json.loads(service.get_annotation_delta(before))
+    assert delta["reset"] is True
+    assert delta["annotations"]["nodes"] == []
+    edges = delta["annotations"]["edges"]
+    assert len(edges) == len(service._edge_annotations)
+    assert all(attribute["attribute"] in ("bandwidth", "latency") for e in edges for attribute in e["attributes"])
+    assert json.loads(service.get_annotation_delta(service.graph_version))["reset"] is False
+
+
+if __name__ == "__main__":
+    pytest.main(["-s", __file__])
@@ -0,0 +1,74 @@
+import asyncio
+import threading
+import pytest
+from infragraph import *
+from infragraph.blueprints.fabrics.closfabric import ClosFabric
+from infragraph.infragraph_service import InfraGraphService
+
+
+def _xpu_query() -> QueryRequest:
+    query = QueryRequest()
+    node_filter = query.node_filters.add(name="xpu filter")
+    node_filter.choice = QueryNodeFilter.ATTRIBUTE_FILTER
+    node_filter.attribute_filter.name = "type"
+    node_filter.attribute_filter.operator = QueryAttribute.EQ
+    node_filter.attribute_filter.value = "xpu"
+    return query
+
+
+@pytest.mark.asyncio
+async def test_async_round_trip():
+    """The async methods build, annotate, query and export the graph without blocking the event loop"""
+    service = InfraGraphService()
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0)
+
+    task = asyncio.ensure_future(ticker())
+    await service.aset_graph(ClosFabric().serialize("yaml"))
+    task.cancel()
+    assert ticks > 1
+
+    annotation = Annotation()
+    annotation.nodes.add(name="host.0.xpu.0").attributes.add(attribute="rank", value="0")
+    await service.aannotate_graph(annotation)
+    results = await asyncio.gather(*(service.aquery_graph(_xpu_query()) for _ in range(4)))
+    assert {len(result.node_matches) for result in results} == {8}
+    request = GraphRequest()
+    request.networkx.annotations.choice = "partial"
+    assert "rank" in await service.aget_graph(request, "json")
+
+
+@pytest.mark.asyncio
+async def test_async_reads_proceed_and_writes_wait():
+    """Queries proceed while a writer holds the lock and a write waits for it"""
+    service = InfraGraphService()
+    await service.aset_graph(ClosFabric())
+    release = threading.Event()
+    held = threading.Event()
+
+    def holder():
+        with service.lock.write():
+            held.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=holder)
+    thread.start()
+    held.wait(5)
+    result = await asyncio.wait_for(service.aquery_graph(_xpu_query()), 5)
+    assert len(result.node_matches) == 8
+
+    write = asyncio.ensure_future(service.aannotate_graph(Annotation()))
+    await asyncio.sleep(0.05)
+    assert not write.done()
+    release.set()
+    await asyncio.wait_for(write, 5)
+    thread.join(5)
+
+
+if __name__ == "__main__":
+    pytest.main(["-s", __file__])
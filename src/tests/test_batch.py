@@ -0,0 +1,96 @@
+import http.client
+import json
+import pytest
+from infragraph import *
+from infragraph.blueprints.fabrics.closfabric import ClosFabric
+from infragraph.http_server import create_http_server
+from infragraph.infragraph_service import GraphError, InfraGraphService
+
+
+def _rank_query(rank: str) -> dict:
+    return {
+        "node_filters": [
+            {
+                "name": "rank filter",
+                "choice": "attribute_filter",
+                "attribute_filter": {"name": "rank", "operator": "eq", "value": rank},
+            }
+        ]
+    }
+
+
+def _rank(node: str, rank: str) -> dict:
+    return {"nodes": [{"name": node, "attributes": [{"attribute": "rank", "value": rank}]}]}
+
+
+@pytest.mark.asyncio
+async def test_batch_operations_in_order():
+    """Batch operations see the annotations before them and are published as one snapshot"""
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    snapshot = service.snapshot()
+    results = service.batch(
+        {
+            "operations": [
+                {"query": _rank_query("0")},
+                {"annotate": _rank("host.0.xpu.0", "0")},
+                {"query": _rank_query("0")},
+                {"shortest_path": {"ep1": "host.0.xpu.0", "ep2": "host.0.xpu.1"}},
+            ]
+        }
+    )
+    assert len(results[0].node_matches) == 0 and results[1] is None
+    assert [match.id for match in results[2].node_matches] == ["host.0.xpu.0"]
+    assert results[3] == service.get_shortest_path("host.0.xpu.0", "host.0.xpu.1")
+    assert service.get_endpoints("rank") == ["host.0.xpu.0"]
+    assert snapshot.get_endpoints("rank") == [] and service.snapshot() is not snapshot
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_not_applied():
+    """A failing operation rolls back the whole batch and names the operation"""
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    version = service.graph_version
+    with pytest.raises(GraphError, match="operation 1 shortest_path"):
+        service.batch(
+            [
+                {"annotate": _rank("host.0.xpu.0", "0")},
+                {"shortest_path": ["host.0.xpu.0", "missing"]},
+            ]
+        )
+    assert service.get_endpoints("rank") == [] and service.graph_version == version
+    with pytest.raises(ValueError):
+        service.load_batch([{"delete": {}}])
+    assert await service.abatch([{"annotate": _rank("host.1.xpu.0", "1")}]) == [None]
+    assert service.get_endpoints("rank") == ["host.1.xpu.0"]
+
+
+@pytest.mark.asyncio
+async def test_http_batch():
+    """POST /batch returns the result of every operation keyed by its kind"""
+    server, port = create_http_server(address="localhost:0")
+    server.service.set_graph(ClosFabric())
+    connection = http.client.HTTPConnection("localhost", port)
+    try:
+        operations = [{"annotate": _rank(f"host.{host}.xpu.0", str(host))} for host in range(4)]
+        operations += [{"query": _rank_query("3")}, {"shortest_path": {"ep1": "host.0.xpu.0", "ep2": "host.1.xpu.0"}}]
+        connection.request("POST", "/batch", json.dumps({"operations": operations}))
+        response = connection.getresponse()
+        results = json.loads(response.read())["results"]
+        assert response.status == 200
+        assert results[:4] == [{"annotate": {}}] * 4
+        assert [match["id"] for match in results[4]["query"]["node_matches"]] == ["host.3.xpu.0"]
+        assert results[5]["shortest_path"][0] == "host.0.xpu.0"
+
+        connection.request("POST", "/batch", json.dumps([{"annotate": _rank("host.9.xpu.0", "9")}]))
+        response = connection.getresponse()
+        assert response.status == 400 and "operation 0 annotate" in json.loads(response.read())["errors"][0]
+    finally:
+        connection.close()
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    pytest.main(["-s", __file__])
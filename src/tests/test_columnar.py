@@ -0,0 +1,73 @@
+import pytest
+from infragraph import *
+from infragraph.blueprints.fabrics.closfabric import ClosFabric
+from infragraph.infragraph_service import InfraGraphService, GraphError
+from infragraph.columnar import edge_table, export_edges, export_nodes, import_annotations, node_table
+
+pyarrow = pytest.importorskip("pyarrow")
+
+
+def _make_service():
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    annotation = Annotation()
+    annotation.nodes.add(name="host.0.xpu.0").attributes.add(attribute="rank", value="0")
+    service.annotate_graph(annotation)
+    return service
+
+
+@pytest.mark.asyncio
+async def test_node_and_edge_tables():
+    """Tables hold one typed row per node and edge"""
+    service = _make_service()
+    graph = service.get_networkx_graph()
+    nodes = node_table(service)
+    assert nodes.num_rows == graph.number_of_nodes()
+    assert nodes.schema.field("instance_idx").type == pyarrow.int64()
+    assert nodes.schema.field("rank").type == pyarrow.string()
+    rows = {row["id"]: row for row in nodes.to_pylist()}
+    assert rows["host.0.xpu.0"]["rank"] == "0"
+    assert rows["host.0.xpu.1"]["rank"] is None
+    edges = edge_table(service)
+    assert edges.num_rows == graph.number_of_edges()
+    assert {"source", "target", "link", "bandwidth"} <= set(edges.column_names)
+    assert node_table(service, AnnotationType.PARTIAL).column_names == ["id", "rank"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("extension", ["parquet", "arrow"])
+async def test_round_trip(tmp_path, extension):
+    """Annotations exported to a file are applied to a fresh service"""
+    service = _make_service()
+    edge_annotation = Annotation()
+    edge_annotation.links.add(name="pcie").attributes.add(attribute="util", value="0.5")
+    service.annotate_graph(edge_annotation)
+    nodes_path = str(tmp_path / f"nodes.{extension}")
+    edges_path = str(tmp_path / f"edges.{extension}")
+    assert export_nodes(service, nodes_path, batch_size=16) == service.get_networkx_graph().number_of_nodes()
+    export_edges(service, edges_path, batch_size=16)
+
+    restored = InfraGraphService()
+    restored.set_graph(ClosFabric())
+    import_annotations(restored, nodes_path)
+    import_annotations(restored, edges_path)
+    assert restored.get_endpoints("rank") == ["host.0.xpu.0"]
+    expected = {frozenset(e[:2]): e[2] for e in service.get_networkx_graph().edges(data=True)}
+    actual = {frozenset(e[:2]): e[2] for e in restored.get_networkx_graph().edges(data=True)}
+    assert actual == expected
+
+
+@pytest.mark.asyncio
+async def test_import_errors():
+    """Tables without key columns or with unknown nodes are rejected, immutable columns are ignored"""
+    service = _make_service()
+    with pytest.raises(GraphError):
+        import_annotations(service, pyarrow.table({"name": ["host.0.xpu.0"], "rank": ["1"]}))
+    with pytest.raises(ValueError):
+        import_annotations(service, pyarrow.table({"id": ["host.9.xpu.0"], "rank": ["1"]}))
+    assert import_annotations(service, pyarrow.table({"id": ["host.0.xpu.0"], "type": ["nic"]})) == 0
+    assert service.get_networkx_graph().nodes["host.0.xpu.0"]["type"] == "xpu"
+
+
+if __name__ == "__main__":
+    pytest.main(["-s", __file__])
@@ -0,0 +1,96 @@
+import gzip
+import os
+import pytest
+from infragraph import *
+from infragraph.blueprints.fabrics.closfabric import ClosFabric
+from infragraph.compression import format_extension, open_file, split_compression
+from infragraph.graph_writer import read_graph
+from infragraph.infragraph_service import InfraGraphService
+from infragraph.infrastructure_loader import load_infrastructure_file
+from infragraph.translators.lstopo_translator import run_lstopo_parser
+from infragraph.visualizer.visualize import Visualizer
+
+
+def _networkx_request(annotations: str = AnnotationType.FULL) -> GraphRequest:
+    request = GraphRequest()
+    request.choice = GraphRequest.NETWORKX
+    request.networkx.annotations.choice = annotations
+    return request
+
+
+def _assert_same_graph(expected, actual):
+    assert dict(expected.graph) == dict(actual.graph)
+    assert dict(expected.nodes(data=True)) == dict(actual.nodes(data=True))
+    assert {frozenset(e[:2]): e[2] for e in expected.edges(data=True)} == {
+        frozenset(e[:2]): e[2] for e in actual.edges(data=True)
+    }
+
+
+@pytest.mark.asyncio
+async def test_extensions():
+    """The payload format and the compression are both taken from the file extension"""
+    assert split_compression("fabric.yaml.zst") == ("fabric.yaml", "zstd")
+    assert split_compression("graph.json.GZ") == ("graph.json", "gzip")
+    assert split_compression("graph.json") == ("graph.json", None)
+    assert format_extension("fabric.YAML.xz") == "yaml"
+    assert format_extension("graph.pb") == "pb"
+
+
+@pytest.mark.asyncio
+async def test_dump_and_read_graph(tmp_path):
+    """dump_graph output in every encoding and compression reads back as the same graph"""
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    expected = service.get_networkx_graph()
+    for name in ("graph.yaml.gz", "graph.json.gz", "graph.ndjson.bz2", "graph.ignx.xz", "graph.pb.gz", "graph.json"):
+        path = str(tmp_path / name)
+        service.dump_graph(_networkx_request(), path)
+        _assert_same_graph(expected, read_graph(path))
+    with gzip.open(tmp_path / "graph.json.gz", "rt", encoding="utf-8") as fp:
+        assert fp.read() == service.get_graph(_networkx_request(), encoding="json")
+    assert os.path.getsize(tmp_path / "graph.json.gz") < os.path.getsize(tmp_path / "graph.json") / 5
+    with pytest.raises(ValueError):
+        service.dump_graph(_networkx_request(), str(tmp_path / "graph.csv.gz"))
+
+
+@pytest.mark.asyncio
+async def test_zstd_infrastructure_round_trip(tmp_path):
+    """A zstd compressed infrastructure loads into the service and the visualizer"""
+    pytest.importorskip("zstandard")
+    infrastructure = ClosFabric()
+    path = str(tmp_path / "fabric.yaml.zst")
+    with open_file(path, "wt") as fp:
+        fp.write(infrastructure.serialize("yaml"))
+    assert load_infrastructure_file(path).serialize("dict") == infrastructure.serialize("dict")
+    loaded, annotations = Visualizer._load_infrastructure(path)
+    assert loaded.name == infrastructure.name and annotations is None
+
+    service = InfraGraphService()
+    service.set_graph(infrastructure)
+    request = GraphRequest()
+    request.choice = GraphRequest.INFRAGRAPH
+    request.infragraph.annotations.choice = AnnotationType.FULL
+    document = str(tmp_path / "infragraph.json.zst")
+    service.dump_graph(request, document)
+    with open_file(document) as fp:
+        assert fp.read() == service.get_graph(request)
+
+
+@pytest.mark.asyncio
+async def test_translator_compressed_input_and_output(tmp_path):
+    """lstopo translation reads a gzipped xml file and writes a gzipped device"""
+    resources = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_translators", "resources")
+    with open(os.path.join(resources, "supermicro.xml"), "rb") as source:
+        xml = source.read()
+    input_file = str(tmp_path / "supermicro.xml.gz")
+    with gzip.open(input_file, "wb") as fp:
+        fp.write(xml)
+    output_file = str(tmp_path / "device.yaml.gz")
+    run_lstopo_parser(None, input_file, output_file, "yaml")
+    with gzip.open(output_file, "rt", encoding="utf-8") as fp:
+        infrastructure = Infrastructure().deserialize(fp.read())
+    assert infrastructure.devices[0].name == "SYS-221H-TNR"
+
+
+if __name__ == "__main__":
+    pytest.main(["-s", __file__])
@@ -0,0 +1,68 @@
+import pytest
+from infragraph import *
+from infragraph.blueprints.fabrics.closfabric import ClosFabric
+from infragraph.content_hash import EDGES, NODES, GraphHash, InfrastructureHash, graph_hash, infrastructure_hash
+from infragraph.infragraph_service import InfraGraphService
+from infragraph.infrastructure_loader import load_infrastructure
+
+
+@pytest.mark.asyncio
+async def test_hash_ignores_formatting_and_order():
+    """The hash is the same for every encoding and load path and for reordered lists"""
+    infrastructure = ClosFabric()
+    expected = infrastructure_hash(infrastructure)
+    assert infrastructure_hash(Infrastructure().deserialize(infrastructure.serialize("yaml"))) == expected
+    assert infrastructure_hash(load_infrastructure(infrastructure.serialize("json"), trusted=True)) == expected
+    reordered = load_infrastructure(infrastructure.serialize("dict"))
+    reordered.edges._items.reverse()
+    reordered.instances._items.reverse()
+    reordered.devices._items.reverse()
+    assert infrastructure_hash(reordered) == expected
+    reordered.instances[0].count += 1
+    assert infrastructure_hash(reordered) != expected
+
+
+@pytest.mark.asyncio
+async def test_incremental_updates_match_a_full_rehash():
+    """Updating one instance or device rehashes to the same root as hashing from scratch"""
+    infrastructure = ClosFabric()
+    hashes = InfrastructureHash(infrastructure)
+    before = dict(hashes.instances)
+    instance = infrastructure.instances[0]
+    instance.count += 1
+    hashes.update_instance(instance)
+    assert hashes.hexdigest() == infrastructure_hash(infrastructure)
+    assert [k for k in before if before[k] != hashes.instances[k]] == [instance.name]
+
+    device = next(d for d in infrastructure.devices if d.name == instance.device)
+    device.description = "changed"
+    hashes.update_device(device)
+    assert hashes.hexdigest() == infrastructure_hash(infrastructure)
+    assert hashes.instances[instance.name] != before[instance.name]
+
+
+@pytest.mark.asyncio
+async def test_graph_hash_columns():
+    """Annotations change only their own column and update_column matches a full rehash"""
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    hashes = GraphHash(service)
+    assert hashes.infrastructure.hexdigest() == infrastructure_hash(service.infrastructure)
+    columns = dict(hashes.columns)
+    before = hashes.hexdigest()
+
+    service.annotate_nodes("rank", {"host.0.xpu.0": "0", "host.0.xpu.1": "1"})
+    hashes.update_column(NODES, "rank")
+    assert hashes.hexdigest() != before
+    assert hashes.hexdigest() == graph_hash(service)
+    assert {k: v for k, v in hashes.columns.items() if k != (NODES, "rank")} == columns
+
+    ep1, ep2 = next(iter(service.get_networkx_graph().edges))
+    service.annotate_edges("bandwidth", {(ep2, ep1): "1 Gbps"})
+    hashes.update_column(EDGES, "bandwidth")
+    assert hashes.columns[(EDGES, "bandwidth")] != columns[(EDGES, "bandwidth")]
+    assert hashes.hexdigest() == graph_hash(service)
+
+
+if __name__ == "__main__":
+    pytest.main(["-s", __file__])
@@ -0,0 +1,214 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from infragraph import *
+from infragraph.blueprints.fabrics.closfabric import ClosFabric
+from infragraph.infragraph_service import GraphError, InfraGraphService
+from infragraph.query_cache import QueryCache
+
+XPUS = [f"host.{host}.xpu.{xpu}" for host in range(4) for xpu in range(2)]
+
+
+def _annotation(node: str, attribute: str, value: str) -> Annotation:
+    annotation = Annotation()
+    annotation.nodes.add(name=node).attributes.add(attribute=attribute, value=value)
+    return annotation
+
+
+def _xpu_query() -> QueryRequest:
+    query = QueryRequest()
+    node_filter = query.node_filters.add(name="xpu filter")
+    node_filter.choice = QueryNodeFilter.ATTRIBUTE_FILTER
+    node_filter.attribute_filter.name = "type"
+    node_filter.attribute_filter.operator = QueryAttribute.EQ
+    node_filter.attribute_filter.value = "xpu"
+    return query
+
+
+@pytest.mark.asyncio
+async def test_snapshots_are_isolated_and_share_structure():
+    """A pinned snapshot keeps its version while writes publish new snapshots sharing unchanged dicts"""
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    pinned = service.snapshot()
+    assert pinned.get_networkx_graph() is service.get_networkx_graph()
+
+    service.annotate_nodes("rank", {"host.0.xpu.0": "0"})
+    ep1, ep2 = next(iter(service.get_networkx_graph().edges))
+    service.annotate_edges("utilization", {(ep1, ep2): "0.5"})
+    annotation = Annotation()
+    annotation.graph.add(attribute="job", value="allreduce")
+    annotation.links.add(name="leaf-link").attributes.add(attribute="state", value="down")
+    service.annotate_graph(annotation)
+
+    old, new = pinned.get_networkx_graph(), service.snapshot().get_networkx_graph()
+    assert "rank" not in old.nodes["host.0.xpu.0"] and new.nodes["host.0.xpu.0"]["rank"] == "0"
+    assert "utilization" not in old.edges[ep1, ep2] and new.edges[ep1, ep2]["utilization"] == "0.5"
+    assert "job" not in old.graph and new.graph["job"] == "allreduce"
+    assert all("state" not in data for _, _, data in old.edges(data=True))
+    assert pinned.get_endpoints("rank") == [] and pinned.graph_version < service.graph_version
+    assert old.nodes["host.1.xpu.0"] is new.nodes["host.1.xpu.0"]
+    assert new.adj[ep1][ep2] is new.adj[ep2][ep1]
+
+    request = GraphRequest()
+    request.networkx.annotations.choice = "partial"
+    assert "rank" not in pinned.get_graph(request, "json")
+    assert "rank" in service.snapshot().get_graph(request, "json")
+    with pytest.raises(GraphError):
+        pinned.annotate_nodes("rank", {"host.0.xpu.1": "1"})
+
+
+@pytest.mark.asyncio
+async def test_failed_write_is_rolled_back():
+    """A write that raises leaves the service at the previous snapshot"""
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    version = service.graph_version
+    before = service.snapshot()
+    annotation = Annotation()
+    annotation.nodes.add(name="host.0.xpu.0").attributes.add(attribute="rank", value="0")
+    annotation.nodes.add(name="missing.0").attributes.add(attribute="rank", value="1")
+    with pytest.raises(ValueError):
+        service.annotate_graph(annotation)
+    assert service.graph_version == version
+    assert service.snapshot() is before
+    assert "rank" not in service.get_networkx_graph().nodes["host.0.xpu.0"]
+    with pytest.raises(Exception):
+        service.set_graph("not an infrastructure")
+    assert service.infrastructure.name == "closfabric"
+
+
+@pytest.mark.asyncio
+async def test_readers_see_consistent_snapshots_during_writes():
+    """Lock-free readers never see a half applied write"""
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    service.annotate_nodes("epoch", {xpu: "0" for xpu in XPUS})
+    stop = threading.Event()
+    errors = []
+
+    def write():
+        for epoch in range(1, 200):
+            service.annotate_nodes("epoch", {xpu: str(epoch) for xpu in XPUS})
+        stop.set()
+
+    def read():
+        while not stop.is_set():
+            try:
+                matches = service.snapshot().query_graph(_xpu_query()).node_matches
+                epochs = {a.value for match in matches for a in match.attributes if a.name == "epoch"}
+                if len(matches) != len(XPUS) or len(epochs) != 1:
+                    errors.append(epochs)
+            except Exception as error:
+                errors.append(error)
+
+    threads = [threading.Thread(target=read) for _ in range(3)] + [threading.Thread(target=write)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+    assert errors == []
+    assert service.get_networkx_graph().nodes["host.3.xpu.1"]["epoch"] == "199"
+
+
+
+@pytest.mark.asyncio
+async def test_writes_between_snapshots_copy_once():
+    """Writes without a snapshot handed out in between modify the dicts copied by the first one in place"""
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    pinned = service.snapshot()
+    service.annotate_nodes("rank", {"host.0.xpu.0": "0"})
+    nodes = service.get_networkx_graph()._node
+    assert nodes is not pinned.get_networkx_graph()._node
+    service.annotate_nodes("rank", {"host.0.xpu.1": "1"})
+    service.annotate_graph(_annotation("host.1.xpu.0", "rank", "2"))
+    assert service.get_networkx_graph()._node is nodes
+    latest = service.snapshot()
+    assert latest.get_endpoints("rank") == XPUS[:3]
+    assert pinned.get_endpoints("rank") == []
+    service.annotate_nodes("rank", {"host.1.xpu.1": "3"})
+    assert service.get_networkx_graph()._node is not nodes
+    assert latest.get_endpoints("rank") == XPUS[:3]
+
+
+@pytest.mark.asyncio
+async def test_failed_in_place_write_is_rolled_back():
+    """A write failing after in place changes restores them, keeps the configuration and uses up its version"""
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    executor = ThreadPoolExecutor(max_workers=1)
+    cache = QueryCache(max_entries=8)
+    service.executor = executor
+    service.query_cache = cache
+    service.annotate_nodes("rank", {"host.0.xpu.0": "0"})
+    version = service.graph_version
+    annotation = _annotation("host.0.xpu.0", "rank", "9")
+    annotation.nodes.add(name="host.0.xpu.1").attributes.add(attribute="rank", value="1")
+    annotation.links.add(name="leaf-link").attributes.add(attribute="state", value="down")
+    annotation.nodes.add(name="missing.0").attributes.add(attribute="rank", value="2")
+    with pytest.raises(ValueError):
+        service.annotate_graph(annotation)
+
+    for reader in (service, service.snapshot()):
+        graph = reader.get_networkx_graph()
+        assert graph.nodes["host.0.xpu.0"]["rank"] == "0" and "rank" not in graph.nodes["host.0.xpu.1"]
+        assert all("state" not in data for _, _, data in graph.edges(data=True))
+        assert reader.graph_version == version
+        assert reader.executor is executor and reader.query_cache is cache
+    delta = json.loads(service.get_annotation_delta(version - 1))["annotations"]
+    assert delta["nodes"] == [{"name": "host.0.xpu.0", "attributes": [{"attribute": "rank", "value": "0"}]}]
+    assert delta["links"] == []
+    assert list(service._node_annotations) == ["host.0.xpu.0"]
+
+    service.annotate_nodes("rank", {"host.0.xpu.1": "1"})
+    assert service.graph_version == version + 2
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_change_log_is_compacted():
+    """Repeated writes of one attribute are compacted out of the change log, snapshots keep their log"""
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    version = service.graph_version
+    pinned = service.snapshot()
+    pinned_delta = pinned.get_annotation_delta(0)
+    writes = InfraGraphService._CHANGE_LOG_SLACK + 1000
+    for rank in range(writes):
+        service.annotate_nodes("rank", {"host.0.xpu.0": str(rank)})
+    assert len(service._change_log) < writes
+    delta = json.loads(service.get_annotation_delta(version))["annotations"]
+    assert delta["nodes"] == [{"name": "host.0.xpu.0", "attributes": [{"attribute": "rank", "value": str(writes - 1)}]}]
+    assert pinned.get_annotation_delta(0) == pinned_delta
+
+@pytest.mark.asyncio
+async def test_sync_writes_take_the_write_lock():
+    """Synchronous writes wait for another writer holding the lock and nest inside a held write lock"""
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    with service.lock.write():
+        service.annotate_nodes("rank", {"host.0.xpu.0": "0"})
+    release = threading.Event()
+    held = threading.Event()
+
+    def holder():
+        with service.lock.write():
+            held.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=holder)
+    thread.start()
+    held.wait(5)
+    writer = threading.Thread(target=service.annotate_nodes, args=("rank", {"host.0.xpu.1": "1"}))
+    writer.start()
+    writer.join(0.05)
+    assert writer.is_alive() and "rank" not in service.get_networkx_graph().nodes["host.0.xpu.1"]
+    release.set()
+    writer.join(5)
+    thread.join(5)
+    assert service.get_networkx_graph().nodes["host.0.xpu.1"]["rank"] == "1"
+
+if __name__ == "__main__":
+    pytest.main(["-s", __file__])
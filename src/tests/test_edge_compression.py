@@ -0,0 +1,84 @@
+import pytest
+from infragraph import *
+from infragraph.blueprints.fabrics.closfabric import ClosFabric
+from infragraph.blueprints.fabrics.clos_fat_tree_fabric import ClosFatTreeFabric
+from infragraph.blueprints.devices.generic.server import Server
+from infragraph.blueprints.devices.generic.generic_switch import Switch
+from infragraph.infragraph_service import InfraGraphService
+from infragraph.edge_compression import compress_edges
+
+
+def _graph(infrastructure):
+    service = InfraGraphService()
+    service.set_graph(infrastructure)
+    graph = service.get_networkx_graph()
+    return list(graph.nodes(data=True)), list(graph.edges(data=True))
+
+
+def _endpoints(infrastructure):
+    return [
+        (edge.ep1.instance, edge.ep1.component, edge.ep2.instance, edge.ep2.component, edge.scheme)
+        for edge in infrastructure.edges
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "make_infrastructure",
+    [
+        lambda: ClosFabric(),
+        lambda: ClosFatTreeFabric(Switch(port_count=8), Server(), 2, []),
+        lambda: ClosFatTreeFabric(Switch(port_count=8), Server(), 3, []),
+    ],
+)
+async def test_compressed_graph_is_identical(make_infrastructure):
+    """A compressed infrastructure builds the same graph with the same edge order"""
+    expected = make_infrastructure()
+    infrastructure = make_infrastructure()
+    before = len(infrastructure.edges)
+    assert compress_edges(infrastructure) < before
+    assert _graph(infrastructure) == _graph(expected)
+    # the compressed form survives a serialization round trip
+    assert _graph(Infrastructure().deserialize(infrastructure.serialize("yaml"))) == _graph(expected)
+
+
+@pytest.mark.asyncio
+async def test_fat_tree_host_edges():
+    """All host to tier 0 edges of a fat tree merge into one ranged edge"""
+    infrastructure = ClosFatTreeFabric(Switch(port_count=8), Server(), 2, [])
+    compress_edges(infrastructure)
+    assert _endpoints(infrastructure)[0] == ("server[0:16]", "nic[0:2]", "tier_0[0:8]", "port[0:4]", "one2one")
+
+
+@pytest.mark.asyncio
+async def test_strides_and_passthrough():
+    """Strided runs use step slices, other schemes and run breaks are kept"""
+    infrastructure = Infrastructure()
+    for index in range(4):
+        edge = infrastructure.edges.add(scheme=InfrastructureEdge.ONE2ONE, link="l")
+        edge.ep1.instance = f"a[{index * 2}]"
+        edge.ep1.component = "port[1]"
+        edge.ep2.instance = "b[0]"
+        edge.ep2.component = f"port[{index * 3}]"
+    edge = infrastructure.edges.add(scheme=InfrastructureEdge.MANY2MANY, link="l")
+    edge.ep1.instance = "a[0]"
+    edge.ep1.component = "port[0]"
+    edge.ep2.instance = "b[1]"
+    edge.ep2.component = "port[0]"
+    for component in (0, 1, 5):
+        edge = infrastructure.edges.add(scheme=InfrastructureEdge.ONE2ONE, link="l")
+        edge.ep1.instance = "a[1]"
+        edge.ep1.component = f"port[{component}]"
+        edge.ep2.instance = "b[2]"
+        edge.ep2.component = f"port[{component}]"
+    assert compress_edges(infrastructure) == 4
+    assert _endpoints(infrastructure) == [
+        ("a[0:7:2]", "port[1]", "b[0]", "port[0:10:3]", "one2one"),
+        ("a[0]", "port[0]", "b[1]", "port[0]", "many2many"),
+        ("a[1]", "port[0:2]", "b[2]", "port[0:2]", "one2one"),
+        ("a[1]", "port[5]", "b[2]", "port[5]", "one2one"),
+    ]
+
+
+if __name__ == "__main__":
+    pytest.main(["-s", __file__])
@@ -0,0 +1,117 @@
+import io
+import json
+import os
+import subprocess
+import sys
+import pytest
+import yaml
+from networkx.readwrite import json_graph
+from infragraph import *
+from infragraph.blueprints.fabrics.closfabric import ClosFabric
+from infragraph.infragraph_service import InfraGraphService
+from infragraph.graph_writer import GraphWriter, read_binary_graph, read_protobuf_graph
+
+
+def _make_service():
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    annotation = Annotation()
+    annotation.graph.add(attribute="topology", value="clos")
+    annotation.nodes.add(name="host.0.xpu.0").attributes.add(attribute="rank", value="0")
+    service.annotate_graph(annotation)
+    return service
+
+
+def _networkx_request(annotations: str) -> GraphRequest:
+    request = GraphRequest()
+    request.choice = GraphRequest.NETWORKX
+    request.networkx.annotations.choice = annotations
+    return request
+
+
+def _assert_same_graph(expected, actual):
+    assert dict(expected.graph) == dict(actual.graph)
+    assert dict(expected.nodes(data=True)) == dict(actual.nodes(data=True))
+    assert sorted(expected.edges(data=True)) == sorted(actual.edges(data=True))
+
+
+@pytest.mark.asyncio
+async def test_json_encoding_matches_yaml():
+    """The compact json encoding holds the same node-link document as the default yaml"""
+    service = _make_service()
+    for annotations in (AnnotationType.FULL, AnnotationType.PARTIAL):
+        request = _networkx_request(annotations)
+        expected = yaml.safe_load(service.get_graph(request))
+        assert json.loads(service.get_graph(request, encoding=GraphWriter.JSON)) == expected
+
+
+@pytest.mark.asyncio
+async def test_ndjson_encoding():
+    """Every ndjson line is a graph header, a node or an edge record"""
+    service = _make_service()
+    text = service.get_graph(_networkx_request(AnnotationType.FULL), encoding=GraphWriter.NDJSON)
+    lines = [json.loads(line) for line in text.splitlines()]
+    graph = service.get_networkx_graph()
+    assert lines[0]["graph"]["topology"] == "clos"
+    assert sum(1 for line in lines if "node" in line) == graph.number_of_nodes()
+    assert sum(1 for line in lines if "edge" in line) == graph.number_of_edges()
+
+
+@pytest.mark.asyncio
+async def test_binary_encoding_round_trip():
+    """The binary encoding rebuilds an identical graph and is smaller than json"""
+    service = _make_service()
+    request = _networkx_request(AnnotationType.FULL)
+    data = service.get_graph(request, encoding=GraphWriter.BINARY)
+    assert isinstance(data, bytes)
+    _assert_same_graph(service.get_networkx_graph(), read_binary_graph(data))
+    assert len(data) < len(service.get_graph(request, encoding=GraphWriter.JSON))
+
+
+@pytest.mark.asyncio
+async def test_protobuf_encoding_round_trip():
+    """The protobuf encoding rebuilds an identical graph whole or from streamed chunks"""
+    service = _make_service()
+    request = _networkx_request(AnnotationType.FULL)
+    data = service.get_graph(request, encoding=GraphWriter.PROTOBUF)
+    assert isinstance(data, bytes)
+    expected = service.get_networkx_graph()
+    _assert_same_graph(expected, read_protobuf_graph(data))
+    chunks = list(service.iter_graph_chunks(request, chunk_size=10))
+    assert len(chunks) == -(-(expected.number_of_nodes() + expected.number_of_edges()) // 10)
+    _assert_same_graph(expected, read_protobuf_graph(chunks))
+    _assert_same_graph(expected, read_protobuf_graph(c.SerializeToString() for c in chunks))
+    fp = io.BytesIO()
+    GraphWriter(expected).write_protobuf(fp, chunk_size=10)
+    _assert_same_graph(expected, read_protobuf_graph(fp.getvalue()))
+    with pytest.raises(ValueError):
+        read_protobuf_graph(chunks[1:])
+
+
+@pytest.mark.asyncio
+async def test_write_graph_partial():
+    """write_graph streams the partial view without the immutable attributes"""
+    service = _make_service()
+    fp = io.StringIO()
+    service.write_graph(_networkx_request(AnnotationType.PARTIAL), fp, GraphWriter.JSON)
+    graph = json_graph.node_link_graph(json.loads(fp.getvalue()), edges="edges")
+    assert graph.nodes["host.0.xpu.0"] == {"rank": "0"}
+    with pytest.raises(ValueError):
+        service.write_graph(_networkx_request(AnnotationType.FULL), fp, "xml")
+
+
+@pytest.mark.asyncio
+async def test_service_import_does_not_load_graph_pb2():
+    """graph_pb2 and its protobuf runtime check are only imported once protobuf chunks are written"""
+    script = (
+        "import sys; import infragraph.infragraph_service; "
+        "assert 'infragraph.graph_pb2' not in sys.modules; "
+        "from infragraph.graph_writer import GraphWriter; "
+        "assert 'infragraph.graph_pb2' not in sys.modules"
+    )
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    subprocess.run([sys.executable, "-c", script], check=True, env=environment)
+
+
+if __name__ == "__main__":
+    pytest.main(["-s", __file__])
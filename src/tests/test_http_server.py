@@ -0,0 +1,103 @@
+import gzip
+import http.client
+import json
+import pytest
+import infragraph
+from infragraph import *
+from infragraph.blueprints.fabrics.closfabric import ClosFabric
+from infragraph.http_server import create_http_server
+
+
+def _port_query() -> QueryRequest:
+    query = QueryRequest()
+    node_filter = query.node_filters.add(name="port filter")
+    node_filter.choice = QueryNodeFilter.ID_FILTER
+    node_filter.id_filter.operator = QueryNodeId.CONTAINS
+    node_filter.id_filter.value = "port"
+    return query
+
+
+@pytest.mark.asyncio
+async def test_http_api_client():
+    """The generated HttpApi client sets, annotates, queries and gets the graph"""
+    server, port = create_http_server(address="localhost:0")
+    try:
+        api = infragraph.api(location=f"http://localhost:{port}", transport="http")
+        api.set_graph(ClosFabric())
+        annotation = Annotation()
+        annotation.nodes.add(name="host.0.xpu.0").attributes.add(attribute="rank", value="0")
+        api.annotate_graph(annotation)
+        content = api.query_graph(_port_query())
+        expected = server.service.query_graph(_port_query())
+        assert [match.id for match in content.node_matches] == [match.id for match in expected.node_matches]
+
+        request = GraphRequest()
+        request.infragraph.annotations.choice = "full"
+        response = api.get_graph(request)
+        assert response.choice == "infragraph" and response.infragraph.infrastructure.name == "closfabric"
+        assert server.service.get_endpoints("rank") == ["host.0.xpu.0"]
+        missing = Annotation()
+        missing.nodes.add(name="host.9.xpu.0").attributes.add(attribute="rank", value="9")
+        with pytest.raises(Exception) as error:
+            api.annotate_graph(missing)
+        assert error.value.args[0].code == 400
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.mark.asyncio
+async def test_keep_alive_gzip_and_pages():
+    """Requests share one connection, large responses are gzipped and query pages follow X-Next-Cursor"""
+    server, port = create_http_server(address="localhost:0")
+    server.service.set_graph(ClosFabric())
+    expected = [match.id for match in server.service.query_graph(_port_query()).node_matches]
+    connection = http.client.HTTPConnection("localhost", port)
+    try:
+        headers = {"Content-Type": "application/json", "Accept-Encoding": "gzip"}
+        ids = []
+        path = "/query_graph?page_size=10"
+        sockets = set()
+        encodings = []
+        while path is not None:
+            connection.request("POST", path, _port_query().serialize(), headers)
+            response = connection.getresponse()
+            sockets.add(id(connection.sock))
+            body = response.read()
+            assert response.status == 200
+            encodings.append(response.getheader("Content-Encoding"))
+            if encodings[-1] == "gzip":
+                body = gzip.decompress(body)
+            ids.extend(match["id"] for match in json.loads(body)["node_matches"])
+            cursor = response.getheader("X-Next-Cursor")
+            path = None if cursor is None else f"/query_graph?page_size=10&cursor={cursor}"
+        assert ids == expected and len(sockets) == 1
+        assert encodings[0] == "gzip" and len(encodings) == -(-len(expected) // 10)
+
+        connection.request("GET", "/capabilities/version")
+        response = connection.getresponse()
+        assert response.getheader("Content-Encoding") is None and "api_spec_version" in json.loads(response.read())
+
+        connection.request("POST", "/query_graph?cursor=bad", _port_query().serialize(), headers)
+        response = connection.getresponse()
+        assert response.status == 400 and json.loads(response.read())["kind"] == "validation"
+        connection.request("POST", "/missing", "{}", headers)
+        response = connection.getresponse()
+        assert response.status == 404
+        response.read()
+
+        request = GraphRequest()
+        request.networkx.annotations.choice = "full"
+        body = gzip.compress(request.serialize().encode("utf-8"))
+        connection.request("POST", "/get_graph?encoding=json", body, dict(headers, **{"Content-Encoding": "gzip"}))
+        response = connection.getresponse()
+        graph = json.loads(json.loads(gzip.decompress(response.read()))["networkx"])
+        assert len(graph["nodes"]) == server.service.get_networkx_graph().number_of_nodes()
+    finally:
+        connection.close()
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    pytest.main(["-s", __file__])
@@ -0,0 +1,85 @@
+import io
+import json
+import pytest
+from infragraph import *
+from infragraph.blueprints.fabrics.closfabric import ClosFabric
+from infragraph.infragraph_service import InfraGraphService
+
+
+def _make_service():
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    annotation = Annotation()
+    annotation.nodes.add(name="host.0.xpu.0").attributes.add(attribute="rank", value="0")
+    annotation.nodes.add(name="host.1.xpu.0").attributes.add(attribute="rank", value="1")
+    annotation.edges.add(ep1="host.0.xpu.0", ep2="host.0.pciesw.0").attributes.add(attribute="util", value="0.5")
+    annotation.graph.add(attribute="experiment", value="run-7")
+    service.annotate_graph(annotation)
+    return service
+
+
+@pytest.mark.asyncio
+async def test_fragments_form_infragraph_document():
+    """The joined fragments are a valid document whose annotations deserialize"""
+    service = _make_service()
+    fragments = list(service.iter_infragraph_json("full"))
+    assert len(fragments) > service.get_networkx_graph().number_of_nodes()
+    document = json.loads("".join(fragments))
+    assert Infrastructure().deserialize(document["infrastructure"]).name == service.infrastructure.name
+    annotation = Annotation().deserialize(document["annotations"])
+    assert len(annotation.nodes) == service.get_networkx_graph().number_of_nodes()
+    assert {a.attribute: a.value for a in annotation.graph}["experiment"] == "run-7"
+
+
+@pytest.mark.asyncio
+async def test_partial_skips_unannotated():
+    """Partial mode only exports the nodes and edges written by annotate_graph"""
+    service = _make_service()
+    fp = io.StringIO()
+    service.write_infragraph(fp, AnnotationType.PARTIAL)
+    annotations = json.loads(fp.getvalue())["annotations"]
+    assert annotations["nodes"] == [
+        {"name": "host.0.xpu.0", "attributes": [{"attribute": "rank", "value": "0"}]},
+        {"name": "host.1.xpu.0", "attributes": [{"attribute": "rank", "value": "1"}]},
+    ]
+    # link bandwidths are mutable edge attributes, the pcie edge only carries the annotation
+    graph = service.get_networkx_graph()
+    with_bandwidth = sum(1 for _, _, data in graph.edges(data=True) if "bandwidth" in data)
+    assert len(annotations["edges"]) == with_bandwidth + 1 < graph.number_of_edges()
+    assert {
+        "ep1": "host.0.pciesw.0",
+        "ep2": "host.0.xpu.0",
+        "attributes": [{"attribute": "util", "value": "0.5"}],
+    } in annotations["edges"]
+    assert "pcie" in [link["name"] for link in annotations["links"]]
+    assert {"attribute": "experiment", "value": "run-7"} in annotations["graph"]
+
+
+@pytest.mark.asyncio
+async def test_partial_reset_by_set_graph():
+    """A new set_graph starts without recorded annotations"""
+    service = _make_service()
+    service.set_graph(ClosFabric())
+    annotations = json.loads(service.populate_infragraph_dict(service.get_networkx_graph(), "partial"))["annotations"]
+    assert annotations["nodes"] == []
+    assert all(edge["attributes"] != [{"attribute": "util", "value": "0.5"}] for edge in annotations["edges"])
+
+
+@pytest.mark.asyncio
+async def test_partial_with_foreign_source_graph():
+    """Partial mode skips the annotated nodes, edges and attributes a foreign source graph lacks"""
+    service = _make_service()
+    source = service.get_networkx_graph().copy()
+    source.remove_node("host.1.xpu.0")
+    del source.nodes["host.0.xpu.0"]["rank"]
+    source.nodes["host.0.xpu.1"]["rank"] = "9"
+    annotations = json.loads(service.populate_infragraph_dict(source, "partial"))["annotations"]
+    assert annotations["nodes"] == [{"name": "host.0.xpu.0", "attributes": []}]
+    assert {"ep1": "host.0.pciesw.0", "ep2": "host.0.xpu.0", "attributes": [{"attribute": "util", "value": "0.5"}]} in (
+        annotations["edges"]
+    )
+    assert all("host.1.xpu.0" not in (edge["ep1"], edge["ep2"]) for edge in annotations["edges"])
+
+
+if __name__ == "__main__":
+    pytest.main(["-s", __file__])
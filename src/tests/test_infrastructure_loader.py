@@ -0,0 +1,73 @@
+import pytest
+from infragraph import *
+from infragraph.blueprints.fabrics.closfabric import ClosFabric
+from infragraph.blueprints.fabrics.clos_fat_tree_fabric import ClosFatTreeFabric
+from infragraph.blueprints.devices.generic.server import Server
+from infragraph.blueprints.devices.generic.generic_switch import Switch
+from infragraph.infragraph_service import InfraGraphService
+from infragraph.infrastructure_loader import _GeneratedSdk, load_infrastructure, parse_payload
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("encoding", ["yaml", "json"])
+@pytest.mark.parametrize("trusted", [False, True])
+async def test_load_matches_sdk(encoding, trusted):
+    """The fast load path builds the same Infrastructure as the generated deserialize"""
+    payload = ClosFatTreeFabric(Switch(port_count=8), Server(), 2, []).serialize(encoding)
+    expected = Infrastructure().deserialize(payload)
+    infrastructure = load_infrastructure(payload, trusted=trusted)
+    assert infrastructure.serialize("dict") == expected.serialize("dict")
+    link = infrastructure.links[0]
+    assert link.physical.bandwidth.choice == expected.links[0].physical.bandwidth.choice
+    # objects built by the trusted decoder keep working with the generated setters
+    infrastructure.edges[0].ep1.instance = "server[1]"
+    infrastructure.devices[0].components.add(name="extra", count=1).choice = Component.CPU
+    assert infrastructure.serialize("dict")["devices"][0]["components"][-1]["choice"] == "cpu"
+
+
+@pytest.mark.asyncio
+async def test_set_graph_trusted():
+    """A trusted set_graph builds the same graph as a validated one"""
+    payload = ClosFabric().serialize("yaml")
+    expected = InfraGraphService()
+    expected.set_graph(payload)
+    service = InfraGraphService()
+    service.set_graph(payload, trusted=True)
+    assert list(service.get_networkx_graph().nodes(data=True)) == list(expected.get_networkx_graph().nodes(data=True))
+    assert list(service.get_networkx_graph().edges(data=True)) == list(expected.get_networkx_graph().edges(data=True))
+
+
+@pytest.mark.asyncio
+async def test_untrusted_payload_is_validated():
+    """Invalid payloads are rejected unless they are trusted"""
+    payload = {"name": "bad", "edges": [{"ep1": {"instance": "a[0]", "component": "b[0]"}, "scheme": "mesh"}]}
+    with pytest.raises(Exception):
+        load_infrastructure(payload)
+    assert load_infrastructure(payload, trusted=True).edges[0].scheme == "mesh"
+    assert parse_payload('{"name": "fabric"}') == {"name": "fabric"}
+    assert parse_payload("{name: fabric}") == {"name": "fabric"}
+
+
+@pytest.mark.asyncio
+async def test_trusted_decoder_supports_generated_sdk():
+    """The generated SDK has the internals the trusted decoder mirrors"""
+    # a failure means openapiart changed them, check _GeneratedSdk.decode
+    # against OpenApiObject._decode and add the new fingerprint
+    assert _GeneratedSdk.fingerprint() in _GeneratedSdk.SUPPORTED_FINGERPRINTS
+    assert _GeneratedSdk.supported()
+
+
+@pytest.mark.asyncio
+async def test_unsupported_sdk_validates_trusted_payloads(monkeypatch):
+    """With unknown SDK internals trusted payloads go through the validated deserialize"""
+    monkeypatch.setattr(_GeneratedSdk, "SUPPORTED_FINGERPRINTS", frozenset())
+    monkeypatch.setattr(_GeneratedSdk, "_supported", None)
+    payload = {"name": "bad", "edges": [{"ep1": {"instance": "a[0]", "component": "b[0]"}, "scheme": "mesh"}]}
+    with pytest.raises(Exception):
+        load_infrastructure(payload, trusted=True)
+    payload = ClosFabric().serialize("yaml")
+    assert load_infrastructure(payload, trusted=True).serialize("dict") == ClosFabric().serialize("dict")
+
+
+if __name__ == "__main__":
+    pytest.main(["-s", __file__])
@@ -0,0 +1,102 @@
+import grpc
+import pytest
+from google.protobuf import json_format
+from networkx import Graph
+from infragraph import *
+from infragraph import graph_pb2, graph_pb2_grpc
+from infragraph import infragraph_pb2 as pb2
+from infragraph.blueprints.fabrics.closfabric import ClosFabric
+from infragraph.graph_writer import read_protobuf_graph
+from infragraph.infragraph_service import GraphError, InfraGraphService
+from infragraph.server import create_server, iter_query_pages
+
+
+def _port_query() -> QueryRequest:
+    query = QueryRequest()
+    node_filter = query.node_filters.add(name="port filter")
+    node_filter.choice = QueryNodeFilter.ID_FILTER
+    node_filter.id_filter.operator = QueryNodeId.CONTAINS
+    node_filter.id_filter.value = "port"
+    return query
+
+
+@pytest.mark.asyncio
+async def test_query_pages_and_cursor():
+    """Query pages hold page_size matches, resume at their cursor and fail after a write"""
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    expected = [match.id for match in service.query_graph(_port_query()).node_matches]
+    pages = list(service.iter_query_pages(_port_query(), page_size=5))
+    assert [len(page.node_matches) for page, _ in pages[:-1]] == [5] * (len(pages) - 1)
+    assert [match.id for page, _ in pages for match in page.node_matches] == expected
+    assert pages[-1][1] is None
+
+    resumed = service.iter_query_pages(_port_query(), page_size=5, cursor=pages[2][1])
+    assert [match.id for match in next(resumed)[0].node_matches] == expected[15:20]
+    other_query = _port_query()
+    other_query.node_filters[0].id_filter.value = "xpu"
+    with pytest.raises(ValueError):
+        next(service.iter_query_pages(other_query, page_size=5, cursor=pages[2][1]))
+
+    stale = service.iter_query_pages(_port_query(), page_size=5)
+    next(stale)
+    service.annotate_nodes("rank", {"host.0.xpu.0": "0"})
+    with pytest.raises(GraphError):
+        next(stale)
+    with pytest.raises(GraphError):
+        next(service.iter_query_pages(_port_query(), cursor=pages[2][1]))
+
+
+@pytest.mark.asyncio
+async def test_graph_pages():
+    """Self-contained graph pages merge back into the graph"""
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    request = GraphRequest()
+    request.networkx.annotations.choice = "full"
+    graph = Graph()
+    cursors = []
+    for chunk, cursor in service.iter_graph_pages(request, page_size=40):
+        page = read_protobuf_graph(chunk)
+        graph.graph.update(page.graph)
+        graph.add_nodes_from(page.nodes(data=True))
+        graph.add_edges_from(page.edges(data=True))
+        cursors.append(cursor)
+    expected = service.get_networkx_graph()
+    assert dict(graph.nodes(data=True)) == dict(expected.nodes(data=True))
+    assert graph.number_of_edges() == expected.number_of_edges()
+    assert graph.graph == expected.graph
+    assert cursors[-1] is None and len(cursors) == -(-(len(expected) + expected.number_of_edges()) // 40)
+
+
+@pytest.mark.asyncio
+async def test_grpc_pages():
+    """The GraphStream service streams query and graph pages"""
+    server, servicer, port = create_server(address="localhost:0", max_workers=2)
+    try:
+        servicer.service.set_graph(ClosFabric())
+        location = f"localhost:{port}"
+        expected = [match.id for match in servicer.service.query_graph(_port_query()).node_matches]
+        pages = list(iter_query_pages(location, _port_query(), page_size=7))
+        assert [match.id for page, _ in pages for match in page.node_matches] == expected
+        assert [cursor is None for _, cursor in pages] == [False] * (len(pages) - 1) + [True]
+
+        request = GraphRequest()
+        request.networkx.annotations.choice = "full"
+        with grpc.insecure_channel(location) as channel:
+            stub = graph_pb2_grpc.GraphStreamStub(channel)
+            graph_request = json_format.ParseDict(request.serialize("dict"), pb2.GraphRequest())
+            pages = list(
+                stub.GraphPages(graph_pb2.GraphPagesRequest(graph_request=graph_request.SerializeToString(), page_size=100))
+            )
+            nodes = sum(len(page.chunk.nodes) for page in pages)
+            assert nodes == servicer.service.get_networkx_graph().number_of_nodes()
+            with pytest.raises(grpc.RpcError) as error:
+                list(stub.GraphPages(graph_pb2.GraphPagesRequest(graph_request=graph_request.SerializeToString(), cursor="x")))
+            assert error.value.code() == grpc.StatusCode.INVALID_ARGUMENT
+    finally:
+        server.stop(grace=None)
+
+
+if __name__ == "__main__":
+    pytest.main(["-s", __file__])
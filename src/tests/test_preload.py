@@ -0,0 +1,123 @@
+import http.client
+import json
+import grpc
+import pytest
+from google.protobuf import empty_pb2
+from infragraph import *
+from infragraph import infragraph_pb2_grpc as pb2_grpc
+from infragraph.blueprints.fabrics.closfabric import ClosFabric
+from infragraph.http_server import create_http_server
+from infragraph.infragraph_service import InfraGraphService
+from infragraph.preload import GraphPreloader
+from infragraph.server import create_server
+from infragraph.snapshot import write_snapshot
+
+
+@pytest.mark.asyncio
+async def test_preload_snapshot_and_infrastructure(tmp_path):
+    """Snapshot and infrastructure files preload into queryable graphs with timed phases and warm indexes"""
+    expected = InfraGraphService()
+    expected.set_graph(ClosFabric())
+    expected.annotate_nodes("rank", {"host.0.xpu.0": "0"})
+    snapshot_path = str(tmp_path / "fabric.igsnap")
+    write_snapshot(expected, snapshot_path)
+    infrastructure_path = tmp_path / "fabric.yaml"
+    infrastructure_path.write_text(ClosFabric().serialize("yaml"))
+
+    service = InfraGraphService()
+    preloader = GraphPreloader(
+        {"snapshot": snapshot_path, "infrastructure": str(infrastructure_path)},
+        {"snapshot": service},
+        distance_oracle=True,
+    )
+    assert not preloader.ready
+    assert preloader.start().wait(timeout=60, indexed=True)
+    assert preloader.services["snapshot"] is service
+    assert service.get_endpoints("rank") == ["host.0.xpu.0"]
+    expected_nodes = dict(expected.get_networkx_graph().nodes(data=True))
+    assert dict(preloader.services["infrastructure"].get_networkx_graph().nodes(data=True)).keys() == expected_nodes.keys()
+    status = preloader.status()
+    assert status["ready"] and status["done"]
+    for graph in status["graphs"].values():
+        assert list(graph["phases"]) == ["read", "build", "index"] and graph["error"] is None
+    assert service.query_cache.stats()["size"] > 0
+    assert preloader.oracles["snapshot"].distance("host.0.xpu.0", "host.0.xpu.0") == 0
+
+
+@pytest.mark.asyncio
+async def test_readiness_while_preloading(tmp_path):
+    """HTTP and gRPC requests are refused until the preloaded graph is queryable"""
+    path = tmp_path / "fabric.json"
+    path.write_text(ClosFabric().serialize())
+    service = InfraGraphService()
+    preloader = GraphPreloader({"graph": str(path)}, {"graph": service})
+    http_server, http_port = create_http_server(service, "localhost:0", preloader=preloader)
+    server, servicer, port = create_server(service, "localhost:0", max_workers=2)
+    servicer.preloader = preloader
+    connection = http.client.HTTPConnection("localhost", http_port)
+    try:
+        for path in ("/ready", "/query_graph"):
+            connection.request("GET" if path == "/ready" else "POST", path, "{}")
+            response = connection.getresponse()
+            assert response.status == 503
+            response.read()
+        with grpc.insecure_channel(f"localhost:{port}") as channel:
+            with pytest.raises(grpc.RpcError) as error:
+                pb2_grpc.OpenapiStub(channel).GetVersion(empty_pb2.Empty())
+            assert error.value.code() == grpc.StatusCode.UNAVAILABLE
+
+        assert preloader.start().wait(timeout=60)
+        connection.request("GET", "/ready")
+        response = connection.getresponse()
+        assert response.status == 200 and json.loads(response.read())["ready"]
+        with grpc.insecure_channel(f"localhost:{port}") as channel:
+            pb2_grpc.OpenapiStub(channel).GetVersion(empty_pb2.Empty())
+    finally:
+        connection.close()
+        http_server.shutdown()
+        http_server.server_close()
+        server.stop(grace=None)
+
+
+@pytest.mark.asyncio
+async def test_failed_preload(tmp_path):
+    """A file that fails to load is reported and the preloader never becomes ready"""
+    path = tmp_path / "broken.yaml"
+    path.write_text("devices: [")
+    preloader = GraphPreloader({"graph": str(path)}).start()
+    assert not preloader.wait(timeout=60, indexed=True)
+    assert preloader.done and preloader.status()["graphs"]["graph"]["error"].startswith("read:")
+
+
+@pytest.mark.asyncio
+async def test_failed_preload_stops_gating(tmp_path):
+    """A failed preload ends wait without a timeout and requests are served again"""
+    service = InfraGraphService()
+    preloader = GraphPreloader({"graph": str(tmp_path / "missing.json")}, {"graph": service})
+    http_server, http_port = create_http_server(service, "localhost:0", preloader=preloader)
+    server, servicer, port = create_server(service, "localhost:0", max_workers=2)
+    servicer.preloader = preloader
+    connection = http.client.HTTPConnection("localhost", http_port)
+    try:
+        assert not preloader.start().wait()
+        assert not preloader.loading and preloader.errors["graph"].startswith("read:")
+        connection.request("GET", "/ready")
+        response = connection.getresponse()
+        assert response.status == 503
+        assert json.loads(response.read())["graphs"]["graph"]["error"] == preloader.errors["graph"]
+        connection.request("POST", "/set_graph", ClosFabric().serialize())
+        response = connection.getresponse()
+        assert response.status == 200
+        response.read()
+        assert len(service.get_endpoints("type", Component.XPU)) == 8
+        with grpc.insecure_channel(f"localhost:{port}") as channel:
+            pb2_grpc.OpenapiStub(channel).GetVersion(empty_pb2.Empty())
+    finally:
+        connection.close()
+        http_server.shutdown()
+        http_server.server_close()
+        server.stop(grace=None)
+
+
+if __name__ == "__main__":
+    pytest.main(["-s", __file__])
@@ -0,0 +1,117 @@
+import pytest
+from infragraph import *
+from infragraph.blueprints.fabrics.closfabric import ClosFabric
+from infragraph.infragraph_service import InfraGraphService
+from infragraph.query_cache import QueryCache, query_key
+
+
+def _query(*filters) -> QueryRequest:
+    query = QueryRequest()
+    for name, value in filters:
+        node_filter = query.node_filters.add(name=f"{name} filter")
+        if name == "id":
+            node_filter.choice = QueryNodeFilter.ID_FILTER
+            node_filter.id_filter.operator = QueryNodeId.CONTAINS
+            node_filter.id_filter.value = value
+        else:
+            node_filter.choice = QueryNodeFilter.ATTRIBUTE_FILTER
+            node_filter.attribute_filter.name = name
+            node_filter.attribute_filter.operator = QueryAttribute.EQ
+            node_filter.attribute_filter.value = value
+    return query
+
+
+@pytest.mark.asyncio
+async def test_query_key_normalization():
+    """Filter names and order do not change the key, filter values do"""
+    first = _query(("id", "xpu"), ("rank", "0"))
+    second = _query(("rank", "0"), ("id", "xpu"))
+    second.node_filters[0].name = "renamed"
+    assert query_key(first) == query_key(second)
+    assert query_key(first) != query_key(_query(("id", "xpu"), ("rank", "1")))
+
+
+@pytest.mark.asyncio
+async def test_query_cache_invalidation():
+    """Only writes to matched nodes or filtered attributes and set_graph invalidate a cached result"""
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    service.annotate_nodes("rank", {"host.0.xpu.0": "0"})
+    xpus = _query(("id", "host.1.xpu"))
+    ranked = _query(("rank", "0"))
+    first = service.query_graph(xpus)
+    assert service.query_graph(xpus.serialize()) is first
+    assert [match.id for match in service.query_graph(ranked).node_matches] == ["host.0.xpu.0"]
+
+    # a node outside the results and an unfiltered attribute
+    service.annotate_nodes("role", {"host.0.xpu.1": "spare"})
+    assert service.query_graph(xpus) is first
+    # a filtered attribute on a node that did not match
+    service.annotate_nodes("rank", {"host.2.xpu.0": "0"})
+    assert service.query_graph(xpus) is first
+    assert [match.id for match in service.query_graph(ranked).node_matches] == ["host.0.xpu.0", "host.2.xpu.0"]
+    # a matched node
+    service.annotate_nodes("role", {"host.1.xpu.0": "worker"})
+    second = service.query_graph(xpus)
+    assert second is not first
+    assert {attr.name: attr.value for attr in second.node_matches[0].attributes}["role"] == "worker"
+
+    stats = service.query_cache.stats()
+    assert (stats["hits"], stats["misses"], stats["invalidations"]) == (3, 4, 2)
+    service.set_graph(ClosFabric())
+    assert service.query_graph(xpus) is not second
+    assert service.query_cache.stats()["invalidations"] == 3
+
+
+@pytest.mark.asyncio
+async def test_query_cache_eviction_and_snapshots():
+    """The cache evicts least recently used results and is shared with snapshots at their own version"""
+    service = InfraGraphService()
+    service.query_cache = QueryCache(max_entries=2)
+    service.set_graph(ClosFabric())
+    queries = [_query(("id", f"host.{host}.")) for host in range(3)]
+    results = [service.query_graph(query) for query in queries]
+    assert service.query_cache.stats()["evictions"] == 1
+    assert service.query_graph(queries[2]) is results[2]
+    assert service.query_graph(queries[0]) is not results[0]
+
+    snapshot = service.snapshot()
+    assert snapshot.query_graph(queries[2]) is results[2]
+    service.annotate_nodes("rank", {"host.2.xpu.0": "0"})
+    current = service.query_graph(queries[2])
+    assert current is not results[2]
+    # the entry is newer than the snapshot, which computes its own result
+    assert "rank" not in {attr.name for attr in snapshot.query_graph(queries[2]).node_matches[0].attributes}
+    stats = service.query_cache.stats()
+    assert stats["size"] == 2 and 0 < stats["hit_rate"] < 1
+
+    service.query_cache = None
+    assert service.query_graph(queries[2]) is not service.query_graph(queries[2])
+
+
+@pytest.mark.asyncio
+async def test_disabled_query_cache_applies_to_snapshots():
+    """Disabling the cache disables it for every snapshot and a failed write does not restore it"""
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    query = _query(("id", "host.0."))
+    older = service.snapshot()
+    cache = service.query_cache
+    older.query_graph(query)
+    assert cache.stats()["size"] == 1
+
+    service.query_cache = None
+    annotation = Annotation()
+    annotation.nodes.add(name="missing.0").attributes.add(attribute="rank", value="0")
+    with pytest.raises(ValueError):
+        service.annotate_graph(annotation)
+    assert service.query_cache is None
+    for snapshot in (older, service.snapshot()):
+        assert snapshot.query_cache is None
+        assert snapshot.query_graph(query) is not snapshot.query_graph(query)
+    stats = cache.stats()
+    assert (stats["size"], stats["hits"], stats["misses"]) == (1, 0, 1)
+
+
+if __name__ == "__main__":
+    pytest.main(["-s", __file__])
@@ -0,0 +1,105 @@
+import threading
+import time
+import grpc
+import pytest
+from infragraph import *
+from infragraph import infragraph_pb2 as pb2
+from infragraph import infragraph_pb2_grpc as pb2_grpc
+from infragraph.blueprints.fabrics.closfabric import ClosFabric
+from infragraph.locks import WriteLock
+from infragraph.server import benchmark_query_graph, create_server
+
+
+@pytest.fixture
+def grpc_server():
+    server, servicer, port = create_server(address="localhost:0", max_workers=4)
+    yield servicer, f"localhost:{port}"
+    server.stop(grace=None)
+
+
+@pytest.mark.asyncio
+async def test_grpc_client_round_trip(grpc_server):
+    """The generated gRPC client sets and annotates the shared graph which the stub queries"""
+    servicer, location = grpc_server
+    client = api(location=location, transport="grpc")
+    client.set_graph(ClosFabric())
+    annotation = Annotation()
+    annotation.nodes.add(name="host.0.xpu.0").attributes.add(attribute="rank", value="0")
+    client.annotate_graph(annotation)
+    assert servicer.service.get_endpoints("rank") == ["host.0.xpu.0"]
+
+    with grpc.insecure_channel(location) as channel:
+        stub = pb2_grpc.OpenapiStub(channel)
+        query = pb2.QueryRequest(
+            choice=pb2.QueryRequest.Choice.node_filters,
+            node_filters=[
+                pb2.QueryNodeFilter(
+                    name="rank filter",
+                    choice=pb2.QueryNodeFilter.Choice.attribute_filter,
+                    attribute_filter=pb2.QueryAttribute(name="rank", operator=pb2.QueryAttribute.Operator.eq, value="0"),
+                )
+            ],
+        )
+        matches = stub.QueryGraph(pb2.QueryGraphRequest(query_request=query)).query_response_content.node_matches
+        assert [match.id for match in matches] == ["host.0.xpu.0"]
+
+        request = pb2.GraphRequest(
+            choice=pb2.GraphRequest.Choice.infragraph,
+            infragraph=pb2.AnnotationConfig(annotations=pb2.AnnotationType(choice=pb2.AnnotationType.Choice.partial)),
+        )
+        content = stub.GetGraph(pb2.GetGraphRequest(graph_request=request)).graph_response_content
+        assert content.infragraph.infrastructure.name == "closfabric"
+        assert [node.name for node in content.infragraph.annotations.nodes] == ["host.0.xpu.0"]
+        assert stub.GetVersion(pb2.google_dot_protobuf_dot_empty__pb2.Empty()).version.api_spec_version
+
+
+@pytest.mark.asyncio
+async def test_grpc_errors_and_streaming(grpc_server):
+    """Invalid requests return an Error and chunked client streams are reassembled"""
+    servicer, location = grpc_server
+    client = api(location=location, transport="grpc")
+    client.enable_grpc_streaming = True
+    client._chunk_size = 512
+    client.set_graph(ClosFabric())
+    assert servicer.service.infrastructure.name == "closfabric"
+
+    annotation = Annotation()
+    annotation.nodes.add(name="missing.0").attributes.add(attribute="rank", value="0")
+    with pytest.raises(Exception) as error:
+        client.annotate_graph(annotation)
+    assert "missing.0 not present" in str(error.value)
+    assert "validation" in str(error.value)
+
+
+@pytest.mark.asyncio
+async def test_write_lock():
+    """A writer excludes other writers and may take the lock again"""
+    lock = WriteLock()
+    events = []
+
+    def write():
+        with lock.write():
+            events.append("write")
+
+    with lock.write():
+        with lock.write():
+            writer = threading.Thread(target=write)
+            writer.start()
+            time.sleep(0.05)
+            assert events == []
+    writer.join(1)
+    assert events == ["write"]
+
+
+@pytest.mark.asyncio
+async def test_benchmark(grpc_server):
+    """The loopback benchmark reports queries per second"""
+    servicer, location = grpc_server
+    servicer.service.set_graph(ClosFabric())
+    result = benchmark_query_graph(location, clients=2, seconds=0.5)
+    assert result["errors"] == 0
+    assert result["queries"] > 0 and result["qps"] > 0
+
+
+if __name__ == "__main__":
+    pytest.main(["-s", __file__])
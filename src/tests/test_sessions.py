@@ -0,0 +1,62 @@
+import pytest
+from infragraph import *
+from infragraph.blueprints.fabrics.closfabric import ClosFabric
+from infragraph.sessions import GraphSessions
+
+
+@pytest.mark.asyncio
+async def test_sessions_share_device_data():
+    """Sessions of the same fabric share DeviceData but keep separate graphs and annotations"""
+    sessions = GraphSessions()
+    baseline = sessions.set_graph("baseline", ClosFabric())
+    variant = sessions.set_graph("variant", ClosFabric())
+    assert sessions.names() == ["baseline", "variant"]
+    assert sessions.pool.misses == len(sessions.pool) and sessions.pool.hits == len(sessions.pool)
+    for name, device_data in baseline._device_data.items():
+        assert variant._device_data[name] is device_data
+
+    variant.annotate_nodes("rank", {"host.0.xpu.0": "0"})
+    assert variant.get_endpoints("rank") == ["host.0.xpu.0"]
+    assert baseline.get_endpoints("rank") == []
+    assert baseline.get_networkx_graph() is not variant.get_networkx_graph()
+
+    memory = sessions.memory()
+    assert memory["sessions"]["baseline"] > 0 and memory["shared"] > 0
+    assert memory["total"] == sum(memory["sessions"].values()) + memory["shared"]
+
+    sessions.drop("baseline")
+    assert len(sessions.pool) > 0
+    sessions.drop("variant")
+    assert len(sessions.pool) == 0
+    with pytest.raises(KeyError):
+        sessions.get("variant")
+
+
+@pytest.mark.asyncio
+async def test_sessions_evict_and_spill(tmp_path):
+    """Least recently used sessions are evicted and spilled sessions are restored with their annotations"""
+    sessions = GraphSessions(max_sessions=2, spill_directory=str(tmp_path))
+    sessions.set_graph("a", ClosFabric())
+    sessions["a"].annotate_nodes("rank", {"host.0.xpu.0": "0"})
+    sessions.set_graph("b", ClosFabric())
+    sessions.get("a")
+    sessions.set_graph("c/d", ClosFabric())
+    assert sessions.evictions == 1
+    assert sessions.memory()["spilled"] == ["b"]
+    assert "b" in sessions and len(sessions) == 2
+
+    restored = sessions["b"]
+    assert restored.infrastructure.name == "closfabric"
+    assert sessions.names() == ["c/d", "b", "a"]
+    assert sessions.memory()["spilled"] == ["a"]
+    assert sessions["a"].get_endpoints("rank") == ["host.0.xpu.0"]
+    assert list(tmp_path.iterdir()) != []
+
+    tight = GraphSessions(max_bytes=1)
+    tight.set_graph("a", ClosFabric())
+    tight.set_graph("b", ClosFabric())
+    assert tight.names() == ["b"]
+
+
+if __name__ == "__main__":
+    pytest.main(["-s", __file__])
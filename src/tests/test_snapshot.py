@@ -0,0 +1,112 @@
+import os
+import json
+import pytest
+from infragraph import *
+from infragraph.blueprints.fabrics.closfabric import ClosFabric
+from infragraph.infragraph_service import InfraGraphService, GraphError
+from infragraph.analytics.compact_graph import CompactGraph
+from infragraph.snapshot import GraphSnapshot, write_snapshot
+
+
+def _make_service():
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    annotation = Annotation()
+    annotation.nodes.add(name="host.0.xpu.0").attributes.add(attribute="rank", value="0")
+    annotation.links.add(name="pcie").attributes.add(attribute="util", value="0.25")
+    annotation.graph.add(attribute="experiment", value="run-9")
+    service.annotate_graph(annotation)
+    return service
+
+
+def _edge_dict(graph):
+    return {frozenset((ep1, ep2)): data for ep1, ep2, data in graph.edges(data=True)}
+
+
+@pytest.mark.asyncio
+async def test_snapshot_arrays(tmp_path):
+    """The memory mapped arrays match the CompactGraph of the service"""
+    service = _make_service()
+    path = str(tmp_path / "closfabric.igsnap")
+    write_snapshot(service, path)
+    compact = CompactGraph(service.get_networkx_graph())
+    with GraphSnapshot(path) as snapshot:
+        assert snapshot.node_count == compact.node_count
+        assert snapshot.edge_count == compact.edge_count
+        assert list(snapshot.offsets) == list(compact.offsets)
+        assert list(snapshot.targets) == list(compact.targets)
+        assert list(snapshot.bandwidth) == list(compact.bandwidth)
+        node = snapshot.node_index("host.0.xpu.0")
+        assert snapshot.node_name(node) == "host.0.xpu.0"
+        assert snapshot.node_attributes(node)["rank"] == "0"
+        assert snapshot.node_attributes(node)["instance_idx"] == 0
+        assert [snapshot.node_name(n) for n in snapshot.neighbors(node)] == list(
+            service.get_networkx_graph().neighbors("host.0.xpu.0")
+        )
+        with pytest.raises(GraphError):
+            snapshot.node_index("host.99.xpu.0")
+
+
+@pytest.mark.asyncio
+async def test_snapshot_to_service(tmp_path):
+    """A service restored from a snapshot serves the same graph and annotations"""
+    service = _make_service()
+    path = str(tmp_path / "closfabric.igsnap")
+    write_snapshot(service, path)
+    with GraphSnapshot(path) as snapshot:
+        restored = snapshot.to_service()
+    expected = service.get_networkx_graph()
+    actual = restored.get_networkx_graph()
+    assert dict(actual.nodes(data=True)) == dict(expected.nodes(data=True))
+    assert _edge_dict(actual) == _edge_dict(expected)
+    assert actual.graph == expected.graph
+    assert restored.get_endpoints("rank") == ["host.0.xpu.0"]
+    assert restored._link_annotations == {"pcie": {"util": "0.25"}}
+    assert json.loads(restored.get_annotation_delta(0))["annotations"]["links"] == [
+        {"name": "pcie", "attributes": [{"attribute": "util", "value": "0.25"}]}
+    ]
+
+    request = GraphRequest()
+    request.choice = GraphRequest.INFRAGRAPH
+    request.infragraph.annotations.choice = AnnotationType.PARTIAL
+    annotations = json.loads(restored.get_graph(request))["annotations"]
+    assert annotations["nodes"] == [{"name": "host.0.xpu.0", "attributes": [{"attribute": "rank", "value": "0"}]}]
+    assert {"attribute": "util", "value": "0.25"} in next(
+        link["attributes"] for link in annotations["links"] if link["name"] == "pcie"
+    )
+    annotation = Annotation()
+    annotation.nodes.add(name="host.1").attributes.add(attribute="rack", value="r1")
+    restored.annotate_graph(annotation)
+    assert len(restored.get_endpoints("rack", "r1")) == len(service._graph_node_prefix_map["host.1"])
+
+
+@pytest.mark.asyncio
+async def test_failed_snapshot_keeps_previous(tmp_path):
+    """A failed write leaves the previous snapshot in place and no temporary file"""
+    service = _make_service()
+    path = str(tmp_path / "closfabric.igsnap")
+    write_snapshot(service, path)
+    # lone surrogates cannot be encoded into the string table
+    service.get_networkx_graph().nodes["host.0.xpu.0"]["label"] = "\ud800"
+    with pytest.raises(UnicodeEncodeError):
+        write_snapshot(service, path)
+    assert os.listdir(tmp_path) == ["closfabric.igsnap"]
+    with GraphSnapshot(path) as snapshot:
+        assert "label" not in snapshot.node_attributes(snapshot.node_index("host.0.xpu.0"))
+        assert snapshot.node_attributes(snapshot.node_index("host.0.xpu.0"))["rank"] == "0"
+
+
+@pytest.mark.asyncio
+async def test_snapshot_rejects_other_files(tmp_path):
+    """Files that are not snapshots of a supported version raise GraphError"""
+    path = tmp_path / "not_a_snapshot"
+    path.write_bytes(b"IGNX\x01" + b"\0" * 32)
+    with pytest.raises(GraphError):
+        GraphSnapshot(str(path))
+    path.write_bytes(b"IGSNAP\x63\x00" + b"\0" * 16)
+    with pytest.raises(GraphError):
+        GraphSnapshot(str(path))
+
+
+if __name__ == "__main__":
+    pytest.main(["-s", __file__])
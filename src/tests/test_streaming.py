@@ -0,0 +1,158 @@
+import grpc
+import pytest
+from google.protobuf import json_format
+from infragraph import *
+from infragraph import infragraph_pb2 as pb2
+from infragraph import infragraph_pb2_grpc as pb2_grpc
+from infragraph.blueprints.fabrics.closfabric import ClosFabric
+from infragraph.infragraph_service import InfraGraphService
+from infragraph.server import ANNOTATION_BATCH_SIZE, create_server
+from infragraph.streaming import (
+    MessageFieldReader,
+    StreamingGraphBuilder,
+    annotation_chunks,
+    infrastructure_chunks,
+    iter_annotation_batches,
+)
+
+
+def _edges(graph):
+    return {frozenset((ep1, ep2)): data for ep1, ep2, data in graph.edges(data=True)}
+
+
+@pytest.mark.asyncio
+async def test_streamed_graph_matches_set_graph():
+    """Records split at arbitrary byte offsets build the same graph as set_graph"""
+    infrastructure = ClosFabric()
+    data = b"".join(chunk.datum for chunk in infrastructure_chunks(infrastructure, records_per_chunk=3))
+    message = pb2.Infrastructure.FromString(data)
+    expected = InfraGraphService()
+    expected.set_graph(Infrastructure().deserialize(json_format.MessageToDict(message, preserving_proto_field_name=True)))
+
+    builder = StreamingGraphBuilder()
+    for offset in range(0, len(data), 7):
+        builder.feed(data[offset : offset + 7])
+    infrastructure, graph, device_data = builder.finish()
+    assert infrastructure.name == "closfabric"
+    assert dict(graph.nodes(data=True)) == dict(expected.get_networkx_graph().nodes(data=True))
+    assert _edges(graph) == _edges(expected.get_networkx_graph())
+    assert graph.graph == expected.get_networkx_graph().graph
+
+
+@pytest.mark.asyncio
+async def test_instances_wait_for_their_devices():
+    """Instances and edges sent before their devices and links are expanded once those arrive"""
+    infrastructure = ClosFabric()
+    builder = StreamingGraphBuilder()
+    for edge in infrastructure.edges:
+        builder.add_edge(edge)
+    for instance in infrastructure.instances:
+        builder.add_instance(instance)
+    assert builder._builder._graph.number_of_nodes() == 0
+    for device in infrastructure.devices:
+        builder.add_device(device)
+    assert builder._pending_instances == []
+    assert len(builder._pending_edges) == len(infrastructure.edges)
+    for link in infrastructure.links:
+        builder.add_link(link)
+    assert builder._pending_edges == []
+    _, graph, _ = builder.finish()
+
+    expected = InfraGraphService()
+    expected.set_graph(ClosFabric())
+    assert _edges(graph) == _edges(expected.get_networkx_graph())
+
+
+@pytest.mark.asyncio
+async def test_truncated_stream():
+    """A stream that ends inside a record raises a ValueError"""
+    data = b"".join(chunk.datum for chunk in infrastructure_chunks(ClosFabric()))
+    reader = MessageFieldReader()
+    fields = reader.feed(data[:-1])
+    assert [number for number, _ in fields][:2] == [1, 2]
+    with pytest.raises(ValueError):
+        reader.close()
+    with pytest.raises(ValueError):
+        list(iter_annotation_batches([data[:3]]))
+
+
+@pytest.mark.asyncio
+async def test_grpc_stream_set_and_annotate():
+    """streamSetGraph and streamAnnotateGraph accept whole record chunks and apply annotation batches"""
+    server, servicer, port = create_server(address="localhost:0", max_workers=2)
+    try:
+        annotation = Annotation()
+        xpus = [f"host.{host}.xpu.{xpu}" for host in range(4) for xpu in range(2)]
+        for rank, xpu in enumerate(xpus):
+            annotation.nodes.add(name=xpu).attributes.add(attribute="rank", value=str(rank))
+        annotation.graph.add(attribute="job", value="allreduce")
+        batches = list(
+            iter_annotation_batches((chunk.datum for chunk in annotation_chunks(annotation, records_per_chunk=2)), 4)
+        )
+        assert [len(batch.nodes) + len(batch.graph) for batch in batches] == [4, 4, 1]
+
+        with grpc.insecure_channel(f"localhost:{port}") as channel:
+            stub = pb2_grpc.OpenapiStub(channel)
+            stub.streamSetGraph(infrastructure_chunks(ClosFabric(), records_per_chunk=2))
+            stub.streamAnnotateGraph(annotation_chunks(annotation, records_per_chunk=3))
+        service = servicer.service
+        assert service.infrastructure.name == "closfabric"
+        assert service.get_endpoints("rank") == xpus
+        assert service.get_networkx_graph().graph["job"] == "allreduce"
+    finally:
+        server.stop(grace=None)
+
+
+@pytest.mark.asyncio
+async def test_annotate_batches_applies_batches_as_they_arrive():
+    """Each batch is staged when it is yielded and the batches are published together"""
+    service = InfraGraphService()
+    service.set_graph(ClosFabric())
+    before = service.snapshot()
+    staged = []
+
+    def batches():
+        for rank in range(3):
+            annotation = Annotation()
+            annotation.nodes.add(name=f"host.{rank}.xpu.0").attributes.add(attribute="rank", value=str(rank))
+            yield annotation
+            staged.append(len(service.get_endpoints("rank")))
+
+    service.annotate_batches(batches())
+    assert staged == [1, 2, 3]
+    assert before.get_endpoints("rank") == []
+    assert service.snapshot().get_endpoints("rank") == ["host.0.xpu.0", "host.1.xpu.0", "host.2.xpu.0"]
+
+    def failing():
+        yield from batches()
+        raise ValueError("stream closed")
+
+    with pytest.raises(ValueError):
+        service.annotate_batches(failing())
+    assert service.snapshot().get_endpoints("rank") == ["host.0.xpu.0", "host.1.xpu.0", "host.2.xpu.0"]
+
+
+
+@pytest.mark.asyncio
+async def test_grpc_stream_annotate_failure_applies_nothing():
+    """A streamed annotation that fails in a later batch leaves the graph unchanged"""
+    server, servicer, port = create_server(address="localhost:0", max_workers=2)
+    try:
+        servicer.service.set_graph(ClosFabric())
+        annotation = Annotation()
+        for rank in range(ANNOTATION_BATCH_SIZE + 1):
+            annotation.nodes.add(name="host.0.xpu.0").attributes.add(attribute="rank", value=str(rank))
+        annotation.nodes.add(name="host.99.xpu.0").attributes.add(attribute="rank", value="0")
+
+        with grpc.insecure_channel(f"localhost:{port}") as channel:
+            stub = pb2_grpc.OpenapiStub(channel)
+            with pytest.raises(grpc.RpcError) as error:
+                stub.streamAnnotateGraph(annotation_chunks(annotation, records_per_chunk=512))
+        assert error.value.code() == grpc.StatusCode.INVALID_ARGUMENT
+        assert servicer.service.get_endpoints("rank") == []
+    finally:
+        server.stop(grace=None)
+
+
+if __name__ == "__main__":
+    pytest.main(["-s", __file__])